@@ -0,0 +1,93 @@
+"""
+Re-filtering cost of the vectorized analytics engine.
+
+Times summarize() for random date ranges, i.e. what moving the
+Analytics date pickers costs, through the real facts caches. By default
+the facts are built from synthetic rows (no database), so reloads only
+cost the array build; --database loads them from the configured
+database instead (seed it with benchmarks/seed.py first). --write-every
+bumps the bookings data version like a live booking write would, which
+reloads the today-and-later window but not the history.
+
+    python -m benchmarks.analytics_bench --bookings 200000 --ranges 200 --write-every 5
+    python -m benchmarks.analytics_bench --database --ranges 50 --write-every 5
+"""
+import argparse
+import bisect
+import random
+import time
+from datetime import date, timedelta
+import src.analytics as analytics
+from src.analytics import BookingFacts, summarize
+from src.cache import bump_data_version
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def synthetic_loader(bookings, games, days, rng):
+    """
+    load_booking_facts() replacement over synthetic rows from `days` ago
+    to FACTS_FUTURE_DAYS ahead.
+    """
+    today = date.today()
+    first_day = (today - timedelta(days=days) - analytics.EPOCH).days
+    last_day = (today - analytics.EPOCH).days + analytics.FACTS_FUTURE_DAYS
+    booking_rows = sorted((
+        (rng.randint(1, games), rng.randint(1, 5000), rng.randint(0, len(analytics.STATUSES) - 1),
+         rng.randint(first_day, last_day), rng.randint(10, 21), rng.randint(1, 4), rng.uniform(100, 1000))
+        for _ in range(bookings)
+    ), key=lambda row: row[3])
+    slot_rows = [
+        (game, day, hour, 20)
+        for day in range(first_day, last_day + 1) for game in range(1, games + 1) for hour in range(10, 22)
+    ]
+    booking_days = [row[3] for row in booking_rows]
+    slot_days = [row[1] for row in slot_rows]
+
+    def load(start, end):
+        lo, hi = (start - analytics.EPOCH).days, (end - analytics.EPOCH).days + 1
+        return BookingFacts(
+            start, end,
+            booking_rows[bisect.bisect_left(booking_days, lo):bisect.bisect_left(booking_days, hi)],
+            slot_rows[bisect.bisect_left(slot_days, lo):bisect.bisect_left(slot_days, hi)],
+            {},
+        )
+    return load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=200000)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--ranges", type=int, default=200)
+    parser.add_argument("--database", action="store_true", help="Load facts from the database")
+    parser.add_argument("--write-every", type=int, default=0, help="Simulate a booking write every N ranges")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if not args.database:
+        t0 = time.perf_counter()
+        analytics.load_booking_facts = synthetic_loader(args.bookings, args.games, args.days, rng)
+        print(f"rows       {(time.perf_counter() - t0) * 1000:.0f} ms for {args.bookings} synthetic bookings")
+
+    today = date.today()
+    latencies = []
+    for i in range(args.ranges):
+        if args.write_every and i and i % args.write_every == 0:
+            bump_data_version('bookings')
+        end = today + timedelta(days=rng.randint(-args.days // 2, 30))
+        start = max(today - timedelta(days=args.days), end - timedelta(days=rng.randint(1, args.days // 2)))
+        t0 = time.perf_counter()
+        summarize(start, end)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    first, latencies = latencies[0], sorted(latencies[1:])
+    print(f"first      {first:.0f} ms (history load)")
+    print(f"summarize  p50 {percentile(latencies, 50):.2f} ms   p95 {percentile(latencies, 95):.2f} ms   max {latencies[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Concurrent-user load simulator that drives main.py headlessly.
+
+Each simulated session is a Streamlit AppTest of main.py running in its
+own thread, so reruns go through the real login form, dashboards,
+caches and connection handling:
+
+    user   logs in, browses categories, books a slot, cancels it
+    staff  logs in and checks in today's bookings
+    admin  logs in and reloads the dashboard
+
+Reports rerun latency percentiles per role and action, connections
+opened and statements run by the process, the peak number of server
+connections, and the sessions an error aborted (charged to the action
+in progress). Uses a tagged data set from benchmarks/seed.py.
+
+    python -m benchmarks.app_load --sessions 20 --staff 2 --admins 1 --rounds 3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from streamlit.testing.v1 import AppTest
+from src.database import connect_db
+from src.metrics import get_totals
+from benchmarks.seed import seed, cleanup, add_volume_arguments, volumes_from_args, CATEGORIES
+
+APP_FILE = "main.py"
+RERUN_TIMEOUT = 120
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Session:
+    """
+    One simulated browser session; times every rerun it triggers.
+    """
+
+    def __init__(self, role, recorder):
+        self.role = role
+        self.recorder = recorder
+        # Action in progress, charged with the error if the session aborts
+        self.action = "start"
+        self.app = AppTest.from_file(APP_FILE, default_timeout=RERUN_TIMEOUT)
+
+    def rerun(self, action, interact=None):
+        """
+        Applies interact(app), which finds and changes widgets and returns
+        the one that triggers the rerun, then times the rerun.
+        """
+        self.action = action
+        widget = interact(self.app) if interact else self.app
+        t0 = time.perf_counter()
+        widget.run()
+        self.recorder.record(self.role, action, (time.perf_counter() - t0) * 1000, self.app.exception)
+
+    def find(self, kind, label):
+        widget = next((w for w in getattr(self.app, kind) if w.label == label), None)
+        if widget is None:
+            raise LookupError(f"No {kind} labelled {label!r}")
+        return widget
+
+    def login(self, username, password):
+        def submit(app):
+            self.find("text_input", "Username").input(username)
+            self.find("text_input", "Password").input(password)
+            return self.find("button", "Login").click()
+
+        self.rerun("load")
+        self.rerun("login", submit)
+        # login_user_session() reruns on success; settle on the dashboard
+        self.rerun("dashboard")
+        if any(b.label == "Login" for b in self.app.button):
+            self.action = "login"
+            raise RuntimeError(f"Login failed for {username}")
+
+
+def run_user(session, data, username, rounds, rng):
+    session.login(username, data['password'])
+    app = session.app
+    for _ in range(rounds):
+        category = rng.choice(CATEGORIES)
+        session.rerun("browse_category", lambda app: app.button(key=f"btn_cat_{category}").click())
+        session.rerun("browse_all", lambda app: app.button(key="btn_cat_All").click())
+
+        booking_buttons = [b for b in app.button if b.key and b.key.startswith("book_")]
+        if not booking_buttons:
+            continue
+        game_key = rng.choice(booking_buttons).key[len("book_"):]
+        target = date.today() + timedelta(days=rng.randint(1, 7))
+        session.rerun("pick_date", lambda app: app.date_input(key=f"date_{game_key}").set_value(target))
+        book_button = next((b for b in app.button if b.key == f"book_{game_key}"), None)
+        if book_button is None:
+            continue
+        session.rerun("book", lambda app: book_button.click())
+
+        cancel_buttons = [b for b in app.button if b.key and b.key.startswith("user_cancel_")]
+        if cancel_buttons:
+            cancel_button = rng.choice(cancel_buttons)
+            session.rerun("cancel", lambda app: cancel_button.click())
+
+
+def run_staff(session, data, qr_codes, rounds):
+    def scan(code):
+        session.find("text_input", "Scan QR Code (Simulate by entering code)").input(code)
+        return session.find("button", "Check-in").click()
+
+    session.login(data['staff_username'], data['password'])
+    for code in qr_codes[:rounds]:
+        session.rerun("check_in", lambda app: scan(code))
+
+
+def run_admin(session, data, rounds):
+    session.login(data['admin_username'], data['password'])
+    for _ in range(rounds):
+        session.rerun("dashboard")
+
+
+def run_session(role, recorder, target, *args):
+    """
+    Thread body: runs target(session, *args), recording an exception as an
+    error of the action in progress and the session as aborted.
+    """
+    session = None
+    try:
+        session = Session(role, recorder)
+        target(session, *args)
+    except Exception as e:
+        recorder.abort(role, session.action if session else "start", e)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.aborted = []
+        self.lock = threading.Lock()
+
+    def record(self, role, action, ms, exceptions):
+        with self.lock:
+            self.latencies[(role, action)].append(ms)
+            if exceptions:
+                self.errors[(role, action)] += 1
+
+    def abort(self, role, action, error):
+        with self.lock:
+            self.errors[(role, action)] += 1
+            self.aborted.append({'role': role, 'action': action, 'error': f"{type(error).__name__}: {error}"})
+
+    def report(self):
+        rows = {}
+        for role, action in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[(role, action)])
+            rows[f"{role}.{action}"] = {
+                'reruns': len(values),
+                'errors': self.errors[(role, action)],
+                'p50_ms': round(percentile(values, 50), 1),
+                'p95_ms': round(percentile(values, 95), 1),
+                'p99_ms': round(percentile(values, 99), 1),
+                'max_ms': round(values[-1], 1) if values else None,
+            }
+        return rows
+
+
+class BackendSampler(threading.Thread):
+    """
+    Polls pg_stat_activity for the number of connections to the database.
+    """
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = connect_db()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            while not self.stopped.wait(self.interval):
+                cur.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+                self.peak = max(self.peak, cur.fetchone()[0])
+        finally:
+            conn.close()
+
+
+def todays_booked_codes(data, count):
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT b.qr_code
+            FROM bookings b
+            JOIN slots s ON s.slot_id = b.slot_id
+            WHERE s.game_id = ANY(%s) AND s.slot_date = CURRENT_DATE AND b.status = 'booked'
+            LIMIT %s
+        """, (data['game_ids'], count))
+        codes = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_volume_arguments(parser)
+    parser.add_argument("--sessions", type=int, default=20, help="Simulated users")
+    parser.add_argument("--staff", type=int, default=2)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=3, help="Actions per session")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded data")
+    args = parser.parse_args()
+
+    data = seed(volumes_from_args(args))
+    rng = random.Random(42)
+    recorder = Recorder()
+    qr_codes = todays_booked_codes(data, args.staff * args.rounds)
+
+    threads = []
+    for i in range(args.sessions):
+        username = f"bench_{data['tag']}_{1 + i}"
+        threads.append(threading.Thread(target=run_session, args=('user', recorder, run_user, data, username, args.rounds, random.Random(rng.random()))))
+    for i in range(args.staff):
+        threads.append(threading.Thread(target=run_session, args=('staff', recorder, run_staff, data, qr_codes[i::args.staff], args.rounds)))
+    for _ in range(args.admins):
+        threads.append(threading.Thread(target=run_session, args=('admin', recorder, run_admin, data, args.rounds)))
+
+    sampler = BackendSampler()
+    sampler.start()
+    totals_before = get_totals()
+    started = time.perf_counter()
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sampler.stopped.set()
+        if not args.keep:
+            cleanup(data['tag'])
+    duration = time.perf_counter() - started
+    totals_after = get_totals()
+
+    reruns = sum(len(v) for v in recorder.latencies.values())
+    connections = totals_after['connections'] - totals_before['connections']
+    statements = totals_after['statements'] - totals_before['statements']
+    report = {
+        'sessions': {'user': args.sessions, 'staff': args.staff, 'admin': args.admins},
+        'duration_s': round(duration, 1),
+        'reruns': reruns,
+        'connections_opened': connections,
+        'connections_per_rerun': round(connections / reruns, 2) if reruns else None,
+        'statements': statements,
+        'statements_per_rerun': round(statements / reruns, 1) if reruns else None,
+        'peak_server_connections': sampler.peak,
+        'aborted_sessions': recorder.aborted,
+        'actions': recorder.report(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Load test for the staff QR check-in path.
+
+Seeds a throwaway game, one slot for today and one booking per scan,
+then replays the QR codes through check_in_user() from several scanner
+threads at a fixed arrival rate and reports latency percentiles.
+
+Run from the project root against a development database:
+
+    python -m benchmarks.checkin_load --scans 600 --per-minute 300 --scanners 4
+"""
+import argparse
+import queue
+import threading
+import time
+import uuid
+from datetime import date, time as dt_time
+from src.database import get_db_connection
+from src.bookings import check_in_user
+
+
+def seed(scans):
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute("SELECT user_id FROM users WHERE username = 'admin'")
+    user_id = cur.fetchone()[0]
+
+    cur.execute("""
+        INSERT INTO games (name, description, duration_minutes, base_price, category, is_active)
+        VALUES (%s, 'Check-in load test', 60, 100, 'General', FALSE)
+        RETURNING game_id
+    """, (f"Load Test {uuid.uuid4().hex[:8]}",))
+    game_id = cur.fetchone()[0]
+
+    cur.execute("""
+        INSERT INTO slots (game_id, slot_date, start_time, end_time, max_players, price, is_active)
+        VALUES (%s, %s, %s, %s, %s, 100, FALSE)
+        RETURNING slot_id
+    """, (game_id, date.today(), dt_time(0, 0), dt_time(23, 59), scans))
+    slot_id = cur.fetchone()[0]
+
+    qr_codes = [f"BOOKING:{uuid.uuid4()}" for _ in range(scans)]
+    cur.execute("""
+        WITH new_bookings AS (
+            INSERT INTO bookings (user_id, slot_id, number_of_players, qr_code, status)
+            SELECT %s, %s, 1, code, 'booked' FROM UNNEST(%s::text[]) AS code
+            RETURNING booking_id
+        )
+        INSERT INTO payments (booking_id, amount, payment_status, payment_method)
+        SELECT booking_id, 100, 'pending', 'online' FROM new_bookings
+    """, (user_id, slot_id, qr_codes))
+
+    conn.commit()
+    cur.close()
+    conn.close()
+    return game_id, user_id, qr_codes
+
+
+def cleanup(game_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    booking_ids = "SELECT b.booking_id FROM bookings b JOIN slots s ON b.slot_id = s.slot_id WHERE s.game_id = %s"
+    cur.execute(f"DELETE FROM qr_checkins WHERE booking_id IN ({booking_ids})", (game_id,))
+    cur.execute(f"DELETE FROM payments WHERE booking_id IN ({booking_ids})", (game_id,))
+    cur.execute(f"DELETE FROM bookings WHERE booking_id IN ({booking_ids})", (game_id,))
+    cur.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(qr_codes, staff_id, per_minute, scanners):
+    interval = 60.0 / per_minute
+    work = queue.Queue()
+    for code in qr_codes:
+        work.put(code)
+
+    latencies = []
+    failures = []
+    results_lock = threading.Lock()
+    start = time.perf_counter()
+    counter = iter(range(len(qr_codes)))
+    counter_lock = threading.Lock()
+
+    def scanner():
+        while True:
+            try:
+                code = work.get_nowait()
+            except queue.Empty:
+                return
+            with counter_lock:
+                due = start + next(counter) * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            t0 = time.perf_counter()
+            success, msg = check_in_user(code, staff_id)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            with results_lock:
+                latencies.append(elapsed_ms)
+                if not success:
+                    failures.append(msg)
+
+    threads = [threading.Thread(target=scanner) for _ in range(scanners)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    duration = time.perf_counter() - start
+    return sorted(latencies), failures, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=600)
+    parser.add_argument("--per-minute", type=float, default=300)
+    parser.add_argument("--scanners", type=int, default=4)
+    args = parser.parse_args()
+
+    game_id, staff_id, qr_codes = seed(args.scans)
+    try:
+        latencies, failures, duration = run(qr_codes, staff_id, args.per_minute, args.scanners)
+    finally:
+        cleanup(game_id)
+
+    print(f"scans:      {len(latencies)} in {duration:.1f}s ({len(latencies) / duration * 60:.0f}/min)")
+    print(f"failures:   {len(failures)}")
+    for pct in (50, 95, 99):
+        print(f"p{pct}:        {percentile(latencies, pct):.2f} ms")
+    print(f"max:        {latencies[-1] if latencies else 0:.2f} ms")
+    if failures:
+        print(f"first failure: {failures[0]}")
+
+
+if __name__ == "__main__":
+    main()
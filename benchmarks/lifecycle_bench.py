@@ -0,0 +1,194 @@
+"""
+End-to-end benchmark of the booking lifecycle against seeded data.
+
+Seeds a tagged data set (benchmarks/seed.py), then times the real src/
+functions (browse, book, check in, admin listings, analytics,
+announcements, login) and writes one JSON document with latency
+percentiles and DB round trips per call, so runs can be diffed over time.
+
+    python -m benchmarks.lifecycle_bench --bookings 50000 --output bench.json
+    python -m benchmarks.lifecycle_bench --output new.json --compare bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from src.database import connect_db
+from src.metrics import tally_statements
+from src.slots import get_available_slots
+from src.bookings import (
+    create_booking, check_in_user, get_all_bookings, get_revenue_stats, get_cancellation_stats,
+    get_active_users_count, get_peak_hour_insights,
+)
+from src.announcements import get_announcements_for_role
+from src.auth import login_user
+from benchmarks.seed import seed, cleanup, add_volume_arguments, volumes_from_args
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(run, iterations, warmup):
+    """
+    Calls run(i) warmup + iterations times; returns latency stats of the
+    timed calls plus statements per call and the size of the last result.
+    """
+    for i in range(warmup):
+        run(i)
+    latencies = []
+    result = None
+    with tally_statements() as tally:
+        for i in range(warmup, warmup + iterations):
+            t0 = time.perf_counter()
+            result = run(i)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'statements_per_call': round(tally.statements / iterations, 2),
+        'result_size': len(result) if isinstance(result, (list, dict)) else None,
+    }
+
+
+def fixtures(data, count):
+    """
+    Picks targets from the seeded set: future slots with room for
+    create_booking and today's booked codes for check_in_user.
+    """
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT s.slot_id
+            FROM slots s
+            LEFT JOIN bookings b ON b.slot_id = s.slot_id AND b.status != 'cancelled'
+            WHERE s.game_id = ANY(%s) AND s.slot_date > CURRENT_DATE
+            GROUP BY s.slot_id
+            HAVING s.max_players - COALESCE(SUM(b.number_of_players), 0) >= 1
+            ORDER BY s.max_players - COALESCE(SUM(b.number_of_players), 0) DESC
+            LIMIT %s
+        """, (data['game_ids'], count))
+        open_slots = [row[0] for row in cur.fetchall()]
+        cur.execute("""
+            SELECT b.qr_code
+            FROM bookings b
+            JOIN slots s ON s.slot_id = b.slot_id
+            WHERE s.game_id = ANY(%s) AND s.slot_date = CURRENT_DATE AND b.status = 'booked'
+            LIMIT %s
+        """, (data['game_ids'], count))
+        qr_codes = [row[0] for row in cur.fetchall()]
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+    return open_slots, qr_codes
+
+
+def run_benchmarks(data, iterations, login_iterations, warmup):
+    today = date.today()
+    start = today - timedelta(days=data['volumes']['past_days'])
+    month_ago = today - timedelta(days=30)
+    game_ids = data['game_ids']
+    user_ids = data['user_ids']
+    open_slots, qr_codes = fixtures(data, iterations + warmup)
+
+    cases = {
+        'get_available_slots': (lambda i: get_available_slots(game_ids[i % len(game_ids)], today + timedelta(days=1 + i % 7)), iterations),
+        'get_all_bookings_30d': (lambda i: get_all_bookings(month_ago, today), iterations),
+        'get_revenue_stats': (lambda i: get_revenue_stats(start, today), iterations),
+        'get_cancellation_stats': (lambda i: get_cancellation_stats(start, today), iterations),
+        'get_active_users_count': (lambda i: get_active_users_count(start, today), iterations),
+        'get_peak_hour_insights': (lambda i: get_peak_hour_insights(start, today), iterations),
+        'get_announcements_for_role': (lambda i: get_announcements_for_role('user', user_ids[i % len(user_ids)]), iterations),
+        'login_user': (lambda i: login_user(f"bench_{data['tag']}_{1 + i % len(user_ids)}", data['password']), login_iterations),
+    }
+    # Writes last, each call consumes one fixture
+    if len(open_slots) >= iterations + warmup:
+        cases['create_booking'] = (lambda i: create_booking(user_ids[i % len(user_ids)], open_slots[i], 1), iterations)
+    if len(qr_codes) >= iterations + warmup:
+        cases['check_in_user'] = (lambda i: check_in_user(qr_codes[i], data['staff_id']), iterations)
+
+    results = {}
+    for name, (run, count) in cases.items():
+        results[name] = measure(run, count, min(warmup, count))
+        r = results[name]
+        print(f"{name:28s} p50 {r['p50_ms']:9.2f} ms   p95 {r['p95_ms']:9.2f} ms   "
+              f"{r['statements_per_call']:5.1f} stmts/call", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'function':28s} {'p50 old':>9s} {'p50 new':>9s} {'change':>8s}", file=sys.stderr)
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old or not old['p50_ms']:
+            continue
+        change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        print(f"{name:28s} {old['p50_ms']:9.2f} {r['p50_ms']:9.2f} {change:+7.1f}%", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_volume_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--login-iterations", type=int, default=20, help="login_user is dominated by bcrypt")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Print p50 changes against an earlier report")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded data")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    data = seed(volumes_from_args(args))
+    seed_seconds = time.perf_counter() - t0
+    print(f"Seeded {data['tag']} in {seed_seconds:.1f}s", file=sys.stderr)
+    try:
+        results = run_benchmarks(data, args.iterations, args.login_iterations, args.warmup)
+    finally:
+        if not args.keep:
+            cleanup(data['tag'])
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'volumes': data['volumes'],
+            'seed_seconds': round(seed_seconds, 2),
+            'tag': data['tag'] if args.keep else None,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Per-call latency of the availability query, ad hoc versus prepared.
+
+Runs the same get_available_slots() query on one pooled connection,
+first as a plain parameterised statement (parsed and planned on every
+call), then through execute_prepared(), and reports the mean and p95.
+
+    python -m benchmarks.prepared_bench --calls 2000
+"""
+import argparse
+import time
+from datetime import date
+from src.database import get_pooled_connection, release_connection, execute_prepared, _prepared_statements
+from src.slots import AVAILABLE_SLOTS_STATEMENT
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timed_calls(calls, run):
+    latencies = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = get_pooled_connection()
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute("SELECT game_id FROM games ORDER BY game_id LIMIT 1")
+        row = cur.fetchone()
+        if not row:
+            print("No games found; seed some data first.")
+            return
+        params = (row[0], date.today(), True)
+
+        # Same SQL with psycopg2 placeholders instead of $n
+        adhoc_sql = _prepared_statements[AVAILABLE_SLOTS_STATEMENT]
+        for n in (1, 2, 3):
+            adhoc_sql = adhoc_sql.replace(f"${n}", "%s")
+
+        def adhoc():
+            cur.execute(adhoc_sql, params)
+            cur.fetchall()
+
+        def prepared():
+            execute_prepared(cur, AVAILABLE_SLOTS_STATEMENT, params)
+            cur.fetchall()
+
+        # Warm up caches and the connection's prepared statement
+        timed_calls(50, adhoc)
+        timed_calls(50, prepared)
+
+        for label, run in (("ad hoc", adhoc), ("prepared", prepared)):
+            latencies = timed_calls(args.calls, run)
+            mean = sum(latencies) / len(latencies)
+            print(f"{label:9s} mean {mean:.3f} ms   p50 {percentile(latencies, 50):.3f} ms   p95 {percentile(latencies, 95):.3f} ms")
+        cur.close()
+    finally:
+        conn.autocommit = False
+        release_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
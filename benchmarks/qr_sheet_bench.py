@@ -0,0 +1,45 @@
+"""
+Throughput benchmark for batch QR sheet rendering.
+
+Renders synthetic booking codes serially and on the process pool in
+src/qr_sheet.py, then lays them out as a PDF, and reports codes/sec.
+Needs no database.
+
+    python -m benchmarks.qr_sheet_bench --codes 2000
+"""
+import argparse
+import time
+import uuid
+from src import qr_sheet
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=2000)
+    args = parser.parse_args()
+
+    codes = [f"BOOKING:{uuid.uuid4()}" for _ in range(args.codes)]
+    items = [(code, f"#{i} Load Test\n2026-01-01 @ 10:00:00") for i, code in enumerate(codes)]
+
+    # Start the workers before timing so spawn cost isn't counted
+    qr_sheet.render_qr_batch(codes[:qr_sheet.POOL_WORKERS], parallel=True)
+
+    _, serial = timed(qr_sheet.render_qr_batch, codes, parallel=False)
+    _, pooled = timed(qr_sheet.render_qr_batch, codes, parallel=True)
+    pdf, sheet = timed(qr_sheet.build_qr_sheet, items, fmt="PDF")
+    qr_sheet.shutdown_pool()
+
+    print(f"workers:    {qr_sheet.POOL_WORKERS}")
+    print(f"serial:     {args.codes / serial:.0f} codes/s")
+    print(f"pool:       {args.codes / pooled:.0f} codes/s ({serial / pooled:.1f}x)")
+    print(f"pdf sheet:  {args.codes / sheet:.0f} codes/s, {len(pdf) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
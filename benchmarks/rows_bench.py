@@ -0,0 +1,71 @@
+"""
+Memory and throughput of Row mappings versus dict(zip(columns, row)).
+
+Materializes synthetic rows shaped like get_all_bookings() results and
+reports the memory held by the result list and rows/sec for both
+approaches. Needs no database.
+
+    python -m benchmarks.rows_bench --rows 100000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from src.rows import row_class
+
+COLUMNS = (
+    'booking_id', 'user_id', 'slot_id', 'number_of_players', 'qr_code', 'status', 'booking_time',
+    'username', 'game_id', 'game_name', 'slot_date', 'start_time', 'end_time', 'amount', 'payment_status',
+)
+
+
+def make_tuples(count):
+    now = datetime.now()
+    today = date.today()
+    return [
+        (i, i % 500, i % 2000, 2, f"BOOKING:{i:036d}", 'booked', now,
+         f"user{i % 500}", i % 20, "Laser Tag", today, dt_time(10), dt_time(11), Decimal("236.00"), 'paid')
+        for i in range(count)
+    ]
+
+
+def as_dicts(tuples):
+    columns = list(COLUMNS)
+    return [dict(zip(columns, row)) for row in tuples]
+
+
+def as_rows(tuples):
+    cls = row_class(COLUMNS)
+    return [cls(row) for row in tuples]
+
+
+def measure(build, tuples):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = build(tuples)
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Touch a column per row, as the views do
+    t1 = time.perf_counter()
+    total = sum(r['number_of_players'] for r in result)
+    access = time.perf_counter() - t1
+    return elapsed, size, access, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    # Tuples stand in for what psycopg2 already returned; only the wrapping is measured
+    tuples = make_tuples(args.rows)
+    for label, build in (("dict(zip)", as_dicts), ("Row", as_rows)):
+        elapsed, size, access, _ = measure(build, tuples)
+        print(f"{label:10s} build {args.rows / elapsed:>12,.0f} rows/s   "
+              f"memory {size / 1024 / 1024:7.1f} MiB   access {args.rows / access:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
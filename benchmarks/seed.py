@@ -0,0 +1,234 @@
+"""
+Bulk synthetic data for benchmarks and load tests.
+
+Generates games, slots (past and future days), users, bookings with
+payments, reviews, announcements and read receipts server-side with
+generate_series, so even large volumes load in seconds. Every row is
+tagged ("bench_<tag>" usernames, "Bench <tag>" game and announcement
+titles) and cleanup() removes exactly that data again.
+
+Run from the project root against a development database:
+
+    python -m benchmarks.seed --users 2000 --bookings 50000
+    python -m benchmarks.seed --cleanup <tag>
+"""
+import argparse
+import uuid
+from datetime import date, timedelta
+from src.database import connect_db
+from src.utils import hash_password
+
+BENCH_PASSWORD = "Bench@123"
+# The category buttons of the user dashboard
+CATEGORIES = ('Arcade', 'Bowling', 'VR', 'Sports', 'Adventure', 'Kids')
+
+DEFAULT_VOLUMES = {
+    'games': 20,
+    'past_days': 90,
+    'future_days': 14,
+    'slots_per_day': 8,
+    'max_players': 20,
+    'users': 2000,
+    'bookings': 50000,
+    'reviews': 5000,
+    'announcements': 200,
+    'read_ratio': 0.3,
+}
+
+
+def _ids(cur, query, params):
+    cur.execute(query, params)
+    return [row[0] for row in cur.fetchall()]
+
+
+def seed(volumes=None, tag=None, rng_seed=0.42):
+    """
+    Loads one tagged data set and returns {'tag', 'game_ids', 'user_ids',
+    'staff_id', 'staff_username', 'admin_username', 'password', 'volumes'}.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    tag = tag or uuid.uuid4().hex[:8]
+    today = date.today()
+    first_day = today - timedelta(days=volumes['past_days'])
+    last_day = today + timedelta(days=volumes['future_days'])
+    password_hash = hash_password(BENCH_PASSWORD)
+
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT setseed(%s)", (rng_seed,))
+
+        user_ids = _ids(cur, """
+            INSERT INTO users (username, password_hash, role)
+            SELECT 'bench_' || %(tag)s || '_' || g, %(hash)s, 'user'
+            FROM generate_series(1, %(users)s) g
+            RETURNING user_id
+        """, {'tag': tag, 'hash': password_hash, 'users': volumes['users']})
+        staff_id = _ids(cur, """
+            INSERT INTO users (username, password_hash, role)
+            VALUES ('bench_' || %(tag)s || '_staff', %(hash)s, 'staff'), ('bench_' || %(tag)s || '_admin', %(hash)s, 'admin')
+            RETURNING user_id
+        """, {'tag': tag, 'hash': password_hash})[0]
+
+        game_ids = _ids(cur, """
+            INSERT INTO games (name, description, duration_minutes, base_price, category, is_active)
+            SELECT 'Bench ' || %(tag)s || ' ' || g, 'Benchmark game', 60, 100 + (g %% 5) * 50,
+                   (%(categories)s::text[])[1 + g %% %(n_categories)s], TRUE
+            FROM generate_series(1, %(games)s) g
+            RETURNING game_id
+        """, {'tag': tag, 'categories': list(CATEGORIES), 'n_categories': len(CATEGORIES), 'games': volumes['games']})
+
+        cur.execute("""
+            INSERT INTO slots (game_id, slot_date, start_time, end_time, max_players, price, is_active)
+            SELECT g.game_id, d::date, make_time(10 + h, 0, 0), make_time(11 + h, 0, 0),
+                   %(max_players)s, g.base_price, TRUE
+            FROM games g
+            CROSS JOIN generate_series(%(first_day)s::date, %(last_day)s::date, interval '1 day') d
+            CROSS JOIN generate_series(0, %(slots_per_day)s - 1) h
+            WHERE g.game_id = ANY(%(game_ids)s)
+        """, {'max_players': volumes['max_players'], 'first_day': first_day, 'last_day': last_day,
+              'slots_per_day': volumes['slots_per_day'], 'game_ids': game_ids})
+        slot_ids = _ids(cur, "SELECT slot_id FROM slots WHERE game_id = ANY(%s) ORDER BY slot_id", (game_ids,))
+
+        # Past slots end up completed / cancelled / no_show, today and later booked / cancelled
+        cur.execute("""
+            WITH picks AS (
+                SELECT (%(slot_ids)s::int[])[1 + floor(random() * %(n_slots)s)::int] AS slot_id,
+                       (%(user_ids)s::int[])[1 + floor(random() * %(n_users)s)::int] AS user_id,
+                       1 + floor(random() * 4)::int AS players,
+                       random() AS r
+                FROM generate_series(1, %(bookings)s)
+            )
+            INSERT INTO bookings (user_id, slot_id, number_of_players, qr_code, status, booking_time)
+            SELECT p.user_id, p.slot_id, p.players, 'BOOKING:' || gen_random_uuid(),
+                   CASE WHEN s.slot_date < CURRENT_DATE THEN
+                            CASE WHEN p.r < 0.75 THEN 'completed' WHEN p.r < 0.9 THEN 'cancelled' ELSE 'no_show' END
+                        ELSE CASE WHEN p.r < 0.88 THEN 'booked' ELSE 'cancelled' END
+                   END,
+                   s.slot_date + s.start_time - random() * interval '14 days'
+            FROM picks p
+            JOIN slots s ON s.slot_id = p.slot_id
+        """, {'slot_ids': slot_ids, 'n_slots': len(slot_ids), 'user_ids': user_ids,
+              'n_users': len(user_ids), 'bookings': volumes['bookings']})
+
+        cur.execute("""
+            INSERT INTO payments (booking_id, amount, payment_status, payment_method, payment_time)
+            SELECT b.booking_id, s.price * b.number_of_players,
+                   CASE b.status WHEN 'cancelled' THEN 'refunded' WHEN 'booked' THEN 'pending' ELSE 'paid' END,
+                   'online', b.booking_time
+            FROM bookings b
+            JOIN slots s ON s.slot_id = b.slot_id
+            WHERE s.game_id = ANY(%s)
+        """, (game_ids,))
+
+        cur.execute("""
+            INSERT INTO reviews (user_id, game_id, booking_id, rating, feedback)
+            SELECT b.user_id, s.game_id, b.booking_id, 1 + floor(random() * 5)::int, 'Benchmark review'
+            FROM bookings b
+            JOIN slots s ON s.slot_id = b.slot_id
+            WHERE s.game_id = ANY(%s) AND b.status = 'completed'
+            ORDER BY random()
+            LIMIT %s
+        """, (game_ids, volumes['reviews']))
+
+        announcement_ids = _ids(cur, """
+            INSERT INTO announcements (title, content, target_role, is_pinned, expires_at)
+            SELECT 'Bench ' || %(tag)s || ' ' || g, 'Benchmark announcement ' || g,
+                   (ARRAY['all', 'user', 'staff', 'admin'])[1 + g %% 4], g %% 10 = 0,
+                   CASE WHEN g %% 3 = 0 THEN NULL ELSE CURRENT_DATE + 30 END
+            FROM generate_series(1, %(announcements)s) g
+            RETURNING announcement_id
+        """, {'tag': tag, 'announcements': volumes['announcements']})
+
+        cur.execute("""
+            INSERT INTO announcement_reads (announcement_id, user_id)
+            SELECT a, u
+            FROM unnest(%s::int[]) a
+            CROSS JOIN unnest(%s::int[]) u
+            WHERE random() < %s
+            ON CONFLICT DO NOTHING
+        """, (announcement_ids, user_ids, volumes['read_ratio']))
+
+        conn.commit()
+        cur.execute("ANALYZE")
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+    return {
+        'tag': tag,
+        'game_ids': game_ids,
+        'user_ids': user_ids,
+        'staff_id': staff_id,
+        'staff_username': f"bench_{tag}_staff",
+        'admin_username': f"bench_{tag}_admin",
+        'password': BENCH_PASSWORD,
+        'volumes': volumes,
+    }
+
+
+def cleanup(tag):
+    """
+    Deletes everything seed() created for tag.
+    """
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        game_ids = _ids(cur, "SELECT game_id FROM games WHERE name LIKE %s", (f"Bench {tag} %",))
+        booking_ids = """
+            SELECT b.booking_id FROM bookings b JOIN slots s ON b.slot_id = s.slot_id WHERE s.game_id = ANY(%(game_ids)s)
+        """
+        # Bookings the retention job has moved since (src/retention.py)
+        archived_booking_ids = "SELECT booking_id FROM bookings_archive WHERE game_id = ANY(%(game_ids)s)"
+        users = "SELECT user_id FROM users WHERE username LIKE %(users)s"
+        params = {'game_ids': game_ids, 'users': f"bench\\_{tag}\\_%", 'titles': f"Bench {tag} %"}
+        cur.execute(f"DELETE FROM qr_checkins WHERE booking_id IN ({booking_ids})", params)
+        cur.execute(f"DELETE FROM payments WHERE booking_id IN ({booking_ids})", params)
+        cur.execute(f"DELETE FROM reviews WHERE game_id = ANY(%(game_ids)s) OR user_id IN ({users})", params)
+        cur.execute(f"DELETE FROM bookings WHERE booking_id IN ({booking_ids})", params)
+        cur.execute(f"DELETE FROM qr_checkins_archive WHERE booking_id IN ({archived_booking_ids})", params)
+        cur.execute(f"DELETE FROM payments_archive WHERE booking_id IN ({archived_booking_ids})", params)
+        cur.execute("DELETE FROM bookings_archive WHERE game_id = ANY(%(game_ids)s)", params)
+        cur.execute("DELETE FROM slots_archive WHERE game_id = ANY(%(game_ids)s)", params)
+        cur.execute("DELETE FROM slots WHERE game_id = ANY(%(game_ids)s)", params)
+        # Derived rows (src/occupancy.py, src/forecasting.py)
+        cur.execute("DELETE FROM slot_occupancy_daily WHERE game_id = ANY(%(game_ids)s)", params)
+        cur.execute("DELETE FROM demand_forecasts WHERE game_id = ANY(%(game_ids)s)", params)
+        cur.execute("DELETE FROM games WHERE game_id = ANY(%(game_ids)s)", params)
+        cur.execute("DELETE FROM announcements WHERE title LIKE %(titles)s", params)
+        cur.execute("DELETE FROM announcements_archive WHERE title LIKE %(titles)s", params)
+        cur.execute(f"DELETE FROM users WHERE user_id IN ({users})", params)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def add_volume_arguments(parser):
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+
+
+def volumes_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_VOLUMES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_volume_arguments(parser)
+    parser.add_argument("--tag", help="Tag for the generated rows (random by default)")
+    parser.add_argument("--cleanup", metavar="TAG", help="Delete a previously seeded data set instead")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup(args.cleanup)
+        print(f"Removed benchmark data {args.cleanup}")
+        return
+    data = seed(volumes_from_args(args), args.tag)
+    print(f"Seeded benchmark data {data['tag']}: {data['volumes']}")
+    print(f"Log in as {data['admin_username']} / {data['password']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
 import streamlit as st
 import time
-from src.database import init_db
+from src.database import init_db, is_database_available
+from src.events import start_event_bridge
+from src.scheduler import start_scheduler
 from src.auth import login_user, register_user, check_username_availability, update_password
 from src.utils import validate_password, validate_phone, apply_role_style
 from src.otp import generate_otp, validate_otp
 from src.session import init_session, login_user_session, get_current_user, logout_user_session
+from src.profiler import profile_rerun, profile_section, render_waterfall
 from views.admin import show_admin_dashboard
-from views.staff import show_staff_dashboard
+from views.staff import show_staff_dashboard, show_offline_checkin
 from views.user import show_user_dashboard
 
 # Page Config
@@ -187,11 +190,18 @@ def show_verify_otp():
         st.session_state.page = 'signup'
         st.rerun()
 
-def main():
+def render_page(current_user):
+    # Keep the entrance scanner working while the database is unreachable
+    if current_user and current_user['role'] == 'staff' and not current_user.get('must_change_password'):
+        if not is_database_available():
+            apply_role_style('staff')
+            show_offline_checkin()
+            return
+
     # Initialize Database
     init_db()
-    
-    current_user = get_current_user()
+    start_event_bridge()
+    start_scheduler()
 
     if current_user:
         # Check for forced password reset
@@ -200,14 +210,18 @@ def main():
         else:
             # User is logged in, show role-specific dashboard
             role = current_user['role']
-            apply_role_style(role)
+            with profile_section("apply_role_style"):
+                apply_role_style(role)
             
             if role == 'admin':
-                show_admin_dashboard()
+                with profile_section("Admin dashboard"):
+                    show_admin_dashboard()
             elif role == 'staff':
-                show_staff_dashboard()
+                with profile_section("Staff dashboard"):
+                    show_staff_dashboard()
             elif role == 'user':
-                show_user_dashboard()
+                with profile_section("User dashboard"):
+                    show_user_dashboard()
             else:
                 st.error("Unknown role.")
     else:
@@ -221,5 +235,13 @@ def main():
         elif st.session_state.page == 'verify_otp':
             show_verify_otp()
 
+def main():
+    current_user = get_current_user()
+    role = current_user['role'] if current_user else 'anonymous'
+    with profile_rerun(role) as profile:
+        render_page(current_user)
+    if profile is not None and role == 'admin':
+        render_waterfall(profile)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,310 @@
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+import streamlit as st
+from src.database import get_pooled_connection, release_connection
+from src.metrics import instrumented
+from src.retention import archive_horizon
+from src.cache import get_data_version
+
+EPOCH = date(1970, 1, 1)
+STATUSES = ('booked', 'checked_in', 'completed', 'cancelled', 'no_show')
+REVENUE_STATUSES = ('booked', 'checked_in', 'completed')
+# Loaded windows reach at least this far back (and FACTS_FUTURE_DAYS ahead),
+# so moving the date pickers inside them is served from memory
+FACTS_WINDOW_DAYS = 365
+FACTS_FUTURE_DAYS = 60
+FACTS_CACHE_SIZE = 4
+# Days before today are cached for this long instead of per data version,
+# so booking writes don't reload them (late changes such as the no-show
+# sweep show up after at most this delay)
+PAST_FACTS_TTL_SECONDS = 900
+# User id stored for bookings without a user (ids start at 1)
+NO_USER = 0
+ROLLING_WINDOW_DAYS = 7
+
+# Everything is converted in SQL to numbers, so a fetch becomes one float
+# matrix: day = days since EPOCH, status = index into STATUSES.
+BOOKING_FACTS_QUERY = """
+    SELECT f.game_id, COALESCE(f.user_id, %(no_user)s),
+           COALESCE(array_position(%(statuses)s::text[], f.status::text), 1) - 1,
+           f.slot_date - DATE '1970-01-01',
+           EXTRACT(HOUR FROM f.start_time)::int,
+           f.number_of_players,
+           COALESCE(f.amount, 0)::float8
+    FROM (
+        SELECT s.game_id, b.user_id, b.status, s.slot_date, s.start_time, b.number_of_players, p.amount
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.slot_id
+        LEFT JOIN payments p ON b.booking_id = p.booking_id
+        WHERE s.slot_date BETWEEN %(start)s AND %(end)s
+        {archived}
+    ) f
+"""
+
+ARCHIVED_FACTS = """
+        UNION ALL
+        SELECT a.game_id, a.user_id, a.status, a.slot_date, a.start_time, a.number_of_players, pa.amount
+        FROM bookings_archive a
+        LEFT JOIN payments_archive pa ON a.booking_id = pa.booking_id
+        WHERE a.slot_date BETWEEN %(start)s AND %(end)s
+"""
+
+SLOT_FACTS_QUERY = """
+    SELECT s.game_id, s.slot_date - DATE '1970-01-01', EXTRACT(HOUR FROM s.start_time)::int, s.max_players
+    FROM slots s
+    WHERE s.slot_date BETWEEN %(start)s AND %(end)s
+    {archived}
+"""
+
+ARCHIVED_SLOTS = """
+    UNION ALL
+    SELECT a.game_id, a.slot_date - DATE '1970-01-01', EXTRACT(HOUR FROM a.start_time)::int, a.max_players
+    FROM slots_archive a
+    WHERE a.slot_date BETWEEN %(start)s AND %(end)s
+"""
+
+
+def _day(value):
+    return (value - EPOCH).days
+
+def _date(day):
+    return EPOCH + timedelta(days=int(day))
+
+def _columns(rows, width):
+    if not rows:
+        return np.empty((0, width))
+    return np.array(rows, dtype=np.float64)
+
+
+class BookingFacts:
+    """
+    Columnar booking and slot facts for one date window, sorted by day.
+    Bookings: game (dense index into game_ids), user (dense index into
+    user_ids), status, day, hour, weekday (Monday = 0), players, amount.
+    Slots: game, day, hour, weekday, capacity.
+    """
+
+    def __init__(self, start, end, booking_rows, slot_rows, game_names):
+        self.start = start
+        self.end = end
+        self.game_names = game_names
+
+        # Sorted by day, so any date range is a contiguous slice
+        bookings = _columns(booking_rows, 7)
+        bookings = bookings[np.argsort(bookings[:, 3], kind='stable')]
+        slots = _columns(slot_rows, 4)
+        slots = slots[np.argsort(slots[:, 1], kind='stable')]
+
+        self.game_ids, game_index = np.unique(
+            np.concatenate([bookings[:, 0], slots[:, 0]]).astype(np.int64), return_inverse=True
+        )
+        self.game = game_index[:len(bookings)].astype(np.intp)
+        self.user_ids, user_index = np.unique(bookings[:, 1].astype(np.int64), return_inverse=True)
+        self.user = user_index.astype(np.intp)
+        self.status = bookings[:, 2].astype(np.intp)
+        self.day = bookings[:, 3].astype(np.intp)
+        self.hour = bookings[:, 4].astype(np.intp)
+        self.weekday = (self.day + 3) % 7
+        self.players = bookings[:, 5]
+        self.amount = bookings[:, 6]
+
+        self.slot_game = game_index[len(bookings):].astype(np.intp)
+        self.slot_day = slots[:, 1].astype(np.intp)
+        self.slot_hour = slots[:, 2].astype(np.intp)
+        self.slot_weekday = (self.slot_day + 3) % 7
+        self.capacity = slots[:, 3]
+
+        self.revenue_status = np.isin(self.status, [STATUSES.index(s) for s in REVENUE_STATUSES])
+        self.cancelled = self.status == STATUSES.index('cancelled')
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def bookings_between(self, first_day, last_day):
+        """
+        Slice of the booking arrays for days first_day..last_day.
+        """
+        return slice(*np.searchsorted(self.day, [first_day, last_day + 1]))
+
+    def slots_between(self, first_day, last_day):
+        return slice(*np.searchsorted(self.slot_day, [first_day, last_day + 1]))
+
+
+@instrumented
+def load_booking_facts(start, end):
+    """
+    Fetches the facts for [start, end] in three round trips. The archive
+    tables are only read when the window reaches past the retention horizon.
+    Returns None if they can't be read.
+    """
+    conn = get_pooled_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        include_archive = start < archive_horizon()
+        params = {'start': start, 'end': end, 'statuses': list(STATUSES), 'no_user': NO_USER}
+        cur.execute(BOOKING_FACTS_QUERY.format(archived=ARCHIVED_FACTS if include_archive else ""), params)
+        booking_rows = cur.fetchall()
+        cur.execute(SLOT_FACTS_QUERY.format(archived=ARCHIVED_SLOTS if include_archive else ""), params)
+        slot_rows = cur.fetchall()
+        cur.execute("SELECT game_id, name FROM games")
+        game_names = dict(cur.fetchall())
+        cur.close()
+    except Exception as e:
+        st.error(f"Error loading booking analytics: {e}")
+        return None
+    finally:
+        release_connection(conn)
+    return BookingFacts(start, end, booking_rows, slot_rows, game_names)
+
+
+# (start, end) -> (stamp, BookingFacts), shared by all sessions. Past
+# windows are stamped with their load time, today-and-later windows with
+# the data versions they were loaded at.
+_past_facts_cache = {}
+_live_facts_cache = {}
+_facts_cache_lock = threading.Lock()
+
+def _versions():
+    return tuple(get_data_version(scope) for scope in ('bookings', 'slots', 'games'))
+
+def _cached_facts(cache, start, end, is_current, load):
+    with _facts_cache_lock:
+        for stamp, facts in cache.values():
+            if is_current(stamp) and facts.covers(start, end):
+                return facts
+
+    stamp, facts = load()
+    if facts is None:
+        # Failed loads are not cached, the next call retries
+        return None
+    with _facts_cache_lock:
+        stale = [key for key, (cached_stamp, _) in cache.items() if not is_current(cached_stamp)]
+        for key in stale:
+            del cache[key]
+        while len(cache) >= FACTS_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[(facts.start, facts.end)] = (stamp, facts)
+    return facts
+
+def _past_facts(start_date, yesterday):
+    now = time.monotonic()
+    window_start = min(start_date, yesterday - timedelta(days=FACTS_WINDOW_DAYS - 1))
+    return _cached_facts(
+        _past_facts_cache, start_date, yesterday,
+        lambda loaded_at: now - loaded_at < PAST_FACTS_TTL_SECONDS,
+        lambda: (now, load_booking_facts(window_start, yesterday)),
+    )
+
+def _live_facts(today, end_date):
+    versions = _versions()
+    window_end = max(end_date, today + timedelta(days=FACTS_FUTURE_DAYS))
+    return _cached_facts(
+        _live_facts_cache, today, end_date,
+        lambda cached_versions: cached_versions == versions,
+        lambda: (versions, load_booking_facts(today, window_end)),
+    )
+
+def get_booking_facts(start_date, end_date):
+    """
+    Cached facts for [start_date, end_date] as a list of (BookingFacts,
+    first, last) parts. Days before today come from a window of at least
+    FACTS_WINDOW_DAYS that expires after PAST_FACTS_TTL_SECONDS; today and
+    later come from a short window reloaded after any write to bookings,
+    slots or games, so a write never reloads the history. Empty if the
+    facts could not be loaded.
+    """
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    parts = []
+    if start_date <= yesterday:
+        parts.append((_past_facts(start_date, yesterday), start_date, min(end_date, yesterday)))
+    if end_date >= today:
+        parts.append((_live_facts(today, end_date), max(start_date, today), end_date))
+    if any(facts is None for facts, _, _ in parts):
+        return []
+    return parts
+
+def rolling_average(values, window=ROLLING_WINDOW_DAYS):
+    """
+    Trailing mean over up to window values (shorter at the start).
+    """
+    if len(values) == 0:
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+def summarize(start_date, end_date):
+    """
+    Dashboard aggregates for [start_date, end_date]: revenue by day (with
+    rolling average), game and hour, cancellations, active users, peak
+    hours and utilization (booked players / slot capacity). Each part of
+    the range is a slice of day-sorted cached arrays; everything else is
+    bincounts, summed over the parts. All zero if the facts could not be
+    loaded.
+    """
+    parts = get_booking_facts(start_date, end_date)
+    first, last = _day(start_date), _day(end_date)
+    n_days = last - first + 1
+    game_ids = np.unique(np.concatenate([facts.game_ids for facts, _, _ in parts] or [np.empty(0, dtype=np.int64)]))
+    n_games = len(game_ids)
+
+    daily = np.zeros(n_days)
+    by_game = np.zeros(n_games)
+    by_hour = np.zeros(24)
+    bookings_by_hour = np.zeros(24, dtype=np.int64)
+    booked_players = np.zeros(n_games)
+    capacity = np.zeros(n_games)
+    total = cancelled_count = 0
+    users = [np.empty(0, dtype=np.int64)]
+    game_names = {}
+    for facts, part_start, part_end in parts:
+        b = facts.bookings_between(_day(part_start), _day(part_end))
+        s = facts.slots_between(_day(part_start), _day(part_end))
+        # Part-local game indices -> indices into game_ids
+        to_global = np.searchsorted(game_ids, facts.game_ids)
+
+        game, hour, amount = to_global[facts.game[b]], facts.hour[b], facts.amount[b]
+        revenue_amount = np.where(facts.revenue_status[b], amount, 0.0)
+        cancelled = facts.cancelled[b]
+        active_players = np.where(cancelled, 0.0, facts.players[b])
+
+        daily += np.bincount(facts.day[b] - first, weights=revenue_amount, minlength=n_days)
+        by_game += np.bincount(game, weights=revenue_amount, minlength=n_games)
+        by_hour += np.bincount(hour, weights=revenue_amount, minlength=24)
+        bookings_by_hour += np.bincount(hour, minlength=24)
+        booked_players += np.bincount(game, weights=active_players, minlength=n_games)
+        capacity += np.bincount(to_global[facts.slot_game[s]], weights=facts.capacity[s], minlength=n_games)
+
+        total += int(b.stop - b.start)
+        cancelled_count += int(np.count_nonzero(cancelled))
+        users.append(facts.user_ids[np.flatnonzero(np.bincount(facts.user[b], minlength=len(facts.user_ids)))])
+        game_names.update(facts.game_names)
+
+    total_capacity = capacity.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        game_utilization = np.where(capacity > 0, booked_players / capacity * 100, 0.0)
+    active_users = np.setdiff1d(np.concatenate(users), [NO_USER])
+
+    days = [_date(day) for day in range(first, last + 1)]
+    labels = [game_names.get(int(game_id), f"Game {game_id}") for game_id in game_ids]
+    peak = np.argsort(-bookings_by_hour, kind='stable')
+    return {
+        'total_revenue': float(daily.sum()),
+        'daily_revenue': {'date': days, 'revenue': daily, 'rolling': rolling_average(daily)},
+        'revenue_by_game': {labels[i]: float(by_game[i]) for i in np.flatnonzero(by_game)},
+        'revenue_by_hour': {int(h): float(by_hour[h]) for h in np.flatnonzero(by_hour)},
+        'total_bookings': total,
+        'cancelled_bookings': cancelled_count,
+        'cancellation_rate': round(cancelled_count / total * 100, 2) if total else 0,
+        'active_users': len(active_users),
+        'peak_hours': [{'hour': int(h), 'count': int(bookings_by_hour[h])} for h in peak if bookings_by_hour[h]],
+        'utilization': round(float(booked_players.sum() / total_capacity * 100), 2) if total_capacity else 0,
+        'utilization_by_game': {labels[i]: round(float(game_utilization[i]), 2) for i in np.flatnonzero(capacity)},
+    }
@@ -1,7 +1,28 @@
 import streamlit as st
-from src.database import get_db_connection
-from datetime import date, datetime
+import atexit
+import logging
+import threading
+import time
+import psycopg2
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left, insort
+from src.database import get_db_connection, connect_db
+from src.metrics import instrumented
+from src.rows import fetch_rows, stream_rows, STREAM_ITERSIZE
+from src.events import publish, subscribe, ANNOUNCEMENT_CREATED, ANNOUNCEMENT_READ, ANNOUNCEMENT_EXPIRED, EVENTS_MISSED
+from datetime import date, datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+# How often buffered read receipts are written to the database
+READ_RECEIPT_FLUSH_SECONDS = 3.0
+
+# Inactive announcements older than this move to announcements_archive
+ANNOUNCEMENT_ARCHIVE_DAYS = 90
+ANNOUNCEMENT_ARCHIVE_BATCH_SIZE = 500
+
+@instrumented
 def create_announcement(title, content, target_role, is_pinned=False, expires_at=None):
     """
     Creates a new announcement.
@@ -18,49 +39,191 @@ def create_announcement(title, content, target_role, is_pinned=False, expires_at
         """, (title, content, target_role, is_pinned, expires_at))
         
         conn.commit()
+        publish(ANNOUNCEMENT_CREATED, target_role=target_role)
         cur.close()
         conn.close()
         return True, "Announcement created successfully!"
     except Exception as e:
         return False, f"Error creating announcement: {e}"
 
-def get_announcements_for_role(role, user_id=None):
+# Active announcements per role, reloaded when one is created or the day changes
+_feed_cache = {}
+_feed_generation = 0
+_feed_lock = threading.Lock()
+
+# Announcement ids each user has read: user_id -> (loaded at, read set),
+# least recently used first. Reloaded after READ_SET_TTL_SECONDS.
+READ_SET_CACHE_SIZE = 1000
+READ_SET_TTL_SECONDS = 300
+_read_sets = OrderedDict()
+# user_id -> lists collecting the ids read while a load for that user runs
+_read_set_loads = {}
+_read_sets_lock = threading.Lock()
+
+
+class AnnouncementReadSet:
     """
-    Fetches active announcements for a specific role.
-    Sorts by Pinned first, then Created At desc.
-    If user_id is provided, also returns read status.
+    Sorted array of the announcement ids one user has read.
     """
+
+    def __init__(self, announcement_ids=()):
+        self._ids = array('i', sorted(set(announcement_ids)))
+
+    def __contains__(self, announcement_id):
+        index = bisect_left(self._ids, announcement_id)
+        return index < len(self._ids) and self._ids[index] == announcement_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, announcement_id):
+        if announcement_id not in self:
+            insort(self._ids, announcement_id)
+
+
+def _on_announcements_changed(event):
+    global _feed_generation
+    with _feed_lock:
+        _feed_generation += 1
+        _feed_cache.clear()
+
+def _on_announcement_read(event):
+    _record_read(event.payload.get('user_id'), event.payload.get('announcement_id'))
+
+def _record_read(user_id, announcement_id):
+    with _read_sets_lock:
+        entry = _read_sets.get(user_id)
+        if entry is not None:
+            entry[1].add(announcement_id)
+        for pending in _read_set_loads.get(user_id, ()):
+            pending.append(announcement_id)
+
+def _forget_read_sets(user_ids):
+    with _read_sets_lock:
+        for user_id in user_ids:
+            _read_sets.pop(user_id, None)
+
+def _on_events_missed(event):
+    _on_announcements_changed(event)
+    with _read_sets_lock:
+        _read_sets.clear()
+
+subscribe(ANNOUNCEMENT_CREATED, _on_announcements_changed)
+subscribe(ANNOUNCEMENT_EXPIRED, _on_announcements_changed)
+subscribe(ANNOUNCEMENT_READ, _on_announcement_read)
+subscribe(EVENTS_MISSED, _on_events_missed)
+
+@instrumented
+def get_active_announcements(role):
+    """
+    Returns the active, unexpired announcements for a role.
+    Sorted by Pinned first, then Created At desc. Cached per role.
+    """
+    today = date.today()
+    with _feed_lock:
+        entry = _feed_cache.get(role)
+        generation = _feed_generation
+    if entry is not None and entry[0] == today:
+        return entry[1]
+
     conn = get_db_connection()
     if not conn:
         return []
-        
+
     try:
         cur = conn.cursor()
-        
-        query = """
-            SELECT a.*, 
-                   CASE WHEN ar.read_at IS NOT NULL THEN TRUE ELSE FALSE END as is_read,
-                   ar.read_at
-            FROM announcements a
-            LEFT JOIN announcement_reads ar ON a.announcement_id = ar.announcement_id AND ar.user_id = %s
-            WHERE (a.target_role = 'all' OR a.target_role = %s)
-            AND a.is_active = TRUE
-            AND (a.expires_at IS NULL OR a.expires_at >= CURRENT_DATE)
-            ORDER BY a.is_pinned DESC, a.created_at DESC
-        """
-        
-        cur.execute(query, (user_id, role))
-        
-        columns = [desc[0] for desc in cur.description]
-        announcements = [dict(zip(columns, row)) for row in cur.fetchall()]
-        
+        cur.execute("""
+            SELECT *
+            FROM announcements
+            WHERE (target_role = 'all' OR target_role = %s)
+            AND is_active = TRUE
+            ORDER BY is_pinned DESC, created_at DESC
+        """, (role,))
+
+        # Rows past expires_at are deactivated by expire_announcements(); this
+        # only hides the ones that expired since its last run.
+        announcements = [
+            a for a in fetch_rows(cur)
+            if a['expires_at'] is None or a['expires_at'] >= today
+        ]
+
         cur.close()
         conn.close()
-        return announcements
     except Exception as e:
         st.error(f"Error fetching announcements: {e}")
         return []
 
+    with _feed_lock:
+        # Skip storing if an announcement was created while we were loading
+        if generation == _feed_generation:
+            _feed_cache[role] = (today, announcements)
+    return announcements
+
+@instrumented
+def get_read_set(user_id):
+    """
+    Returns the AnnouncementReadSet of a user, loading it on first use or
+    once it is older than READ_SET_TTL_SECONDS. Reads announced while the
+    load runs are applied to the loaded set before it is cached.
+    """
+    now = time.monotonic()
+    pending = []
+    with _read_sets_lock:
+        entry = _read_sets.get(user_id)
+        if entry is not None and now - entry[0] < READ_SET_TTL_SECONDS:
+            _read_sets.move_to_end(user_id)
+            return entry[1]
+        _read_set_loads.setdefault(user_id, []).append(pending)
+
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return AnnouncementReadSet()
+
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT announcement_id FROM announcement_reads WHERE user_id = %s", (user_id,))
+            loaded = AnnouncementReadSet(row[0] for row in cur.fetchall())
+            cur.close()
+            conn.close()
+        except Exception as e:
+            st.error(f"Error fetching read announcements: {e}")
+            return AnnouncementReadSet()
+
+        with _read_sets_lock:
+            for announcement_id in pending:
+                loaded.add(announcement_id)
+            _read_sets[user_id] = (now, loaded)
+            _read_sets.move_to_end(user_id)
+            while len(_read_sets) > READ_SET_CACHE_SIZE:
+                _read_sets.popitem(last=False)
+        return loaded
+    finally:
+        with _read_sets_lock:
+            loads = [load for load in _read_set_loads[user_id] if load is not pending]
+            if loads:
+                _read_set_loads[user_id] = loads
+            else:
+                del _read_set_loads[user_id]
+
+def get_announcements_for_role(role, user_id=None):
+    """
+    Fetches active announcements for a specific role.
+    Sorts by Pinned first, then Created At desc.
+    If user_id is provided, also returns read status.
+    Served from the per-role feed cache and the user's read set, so no
+    join against announcement_reads is needed.
+    """
+    read_set = get_read_set(user_id) if user_id else None
+
+    announcements = []
+    for ann in get_active_announcements(role):
+        item = dict(ann)
+        item['is_read'] = read_set is not None and ann['announcement_id'] in read_set
+        announcements.append(item)
+    return announcements
+
+@instrumented
 def mark_announcement_as_read(announcement_id, user_id):
     """
     Marks an announcement as read for a specific user.
@@ -80,6 +243,38 @@ def mark_announcement_as_read(announcement_id, user_id):
         """, (announcement_id, user_id))
         
         conn.commit()
+        publish(ANNOUNCEMENT_READ, announcement_id=announcement_id, user_id=user_id)
+        cur.close()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error marking as read: {e}")
+        return False
+
+@instrumented
+def mark_announcements_as_read(announcement_ids, user_id):
+    """
+    Marks several announcements as read for a user in one INSERT.
+    """
+    announcement_ids = list(announcement_ids)
+    if not announcement_ids:
+        return True
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO announcement_reads (announcement_id, user_id)
+            SELECT UNNEST(%s::int[]), %s
+            ON CONFLICT (announcement_id, user_id) DO NOTHING
+        """, (announcement_ids, user_id))
+
+        conn.commit()
+        for announcement_id in announcement_ids:
+            publish(ANNOUNCEMENT_READ, announcement_id=announcement_id, user_id=user_id)
         cur.close()
         conn.close()
         return True
@@ -87,6 +282,134 @@ def mark_announcement_as_read(announcement_id, user_id):
         st.error(f"Error marking as read: {e}")
         return False
 
+
+class ReadReceiptBuffer:
+    """
+    Write-behind buffer for read receipts.
+    Receipts from every session are collected in memory and inserted in
+    one statement every flush_interval seconds (or once max_pending is
+    reached). Pending receipts are flushed on interpreter shutdown, and
+    kept for the next attempt if the database is unreachable.
+    """
+
+    def __init__(self, flush_interval=READ_RECEIPT_FLUSH_SECONDS, max_pending=500):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="read-receipt-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def add(self, announcement_id, user_id):
+        """
+        Queues a receipt. This process's read set is updated right away so
+        the next rerun already shows the announcement as read;
+        ANNOUNCEMENT_READ is published once the receipt is written.
+        """
+        with self._lock:
+            self._pending.add((announcement_id, user_id))
+            pending_count = len(self._pending)
+        _record_read(user_id, announcement_id)
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Writes all pending receipts and publishes ANNOUNCEMENT_READ for
+        each one stored. Returns the number of receipts stored.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = set()
+            if not batch:
+                return 0
+
+            announcement_ids = [announcement_id for announcement_id, _ in batch]
+            user_ids = [user_id for _, user_id in batch]
+            try:
+                conn = connect_db()
+                try:
+                    cur = conn.cursor()
+                    # Announcements archived or deleted since the click are skipped
+                    cur.execute("""
+                        INSERT INTO announcement_reads (announcement_id, user_id)
+                        SELECT r.announcement_id, r.user_id
+                        FROM UNNEST(%s::int[], %s::int[]) AS r(announcement_id, user_id)
+                        JOIN announcements a ON a.announcement_id = r.announcement_id
+                        JOIN users u ON u.user_id = r.user_id
+                        ON CONFLICT (announcement_id, user_id) DO NOTHING
+                        RETURNING announcement_id, user_id
+                    """, (announcement_ids, user_ids))
+                    written = set(cur.fetchall())
+                    conn.commit()
+                    cur.close()
+                finally:
+                    conn.close()
+            except psycopg2.OperationalError:
+                logger.exception("Flushing %d read receipts failed; will retry", len(batch))
+                with self._lock:
+                    self._pending |= batch
+                return 0
+            except psycopg2.Error:
+                # Retrying would fail the same way and block every later receipt
+                logger.exception("Dropping %d read receipts after a permanent error", len(batch))
+                _forget_read_sets({user_id for _, user_id in batch})
+                return 0
+
+            for announcement_id, user_id in written:
+                publish(ANNOUNCEMENT_READ, announcement_id=announcement_id, user_id=user_id)
+            # Skipped (unknown ids) or already stored: reload those users' sets
+            _forget_read_sets({user_id for _, user_id in batch - written})
+            return len(written)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_receipt_buffer = None
+_receipt_buffer_lock = threading.Lock()
+
+def get_read_receipt_buffer():
+    """
+    Returns the process-wide ReadReceiptBuffer, starting it on first use.
+    """
+    global _receipt_buffer
+    with _receipt_buffer_lock:
+        if _receipt_buffer is None:
+            _receipt_buffer = ReadReceiptBuffer()
+            _receipt_buffer.start()
+    return _receipt_buffer
+
+def queue_announcement_as_read(announcement_id, user_id):
+    """
+    Buffered variant of mark_announcement_as_read for high-volume clicks.
+    """
+    get_read_receipt_buffer().add(announcement_id, user_id)
+    return True
+
+@instrumented
 def get_all_announcements():
     """
     Fetches all announcements for admin management.
@@ -100,8 +423,7 @@ def get_all_announcements():
         cur.execute("""
             SELECT * FROM announcements ORDER BY created_at DESC
         """)
-        columns = [desc[0] for desc in cur.description]
-        announcements = [dict(zip(columns, row)) for row in cur.fetchall()]
+        announcements = fetch_rows(cur)
         cur.close()
         conn.close()
         return announcements
@@ -109,63 +431,257 @@ def get_all_announcements():
         st.error(f"Error fetching all announcements: {e}")
         return []
 
-def get_announcement_read_stats(announcement_id):
+@instrumented
+def iter_all_announcements(itersize=STREAM_ITERSIZE):
     """
-    Returns read stats for an announcement:
-    - List of users who read it
-    - List of users who haven't read it (filtered by target role)
+    Streaming variant of get_all_announcements on a server-side cursor.
+    """
+    try:
+        yield from stream_rows(get_db_connection, "SELECT * FROM announcements ORDER BY created_at DESC", None, itersize)
+    except psycopg2.Error as e:
+        st.error(f"Error fetching all announcements: {e}")
+
+@instrumented
+def expire_announcements(archive_days=ANNOUNCEMENT_ARCHIVE_DAYS, batch_size=ANNOUNCEMENT_ARCHIVE_BATCH_SIZE):
+    """
+    Deactivates every announcement past its expiry date in one UPDATE,
+    then moves inactive announcements older than archive_days to
+    announcements_archive in batches. Run periodically by the scheduler.
+    Returns {'expired': n, 'archived': m}.
+    """
+    cutoff = datetime.now() - timedelta(days=archive_days)
+    result = {'expired': 0, 'archived': 0}
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE announcements
+            SET is_active = FALSE
+            WHERE is_active = TRUE AND expires_at < CURRENT_DATE
+        """)
+        result['expired'] = cur.rowcount
+        conn.commit()
+
+        while True:
+            # Read receipts of archived rows go with them (ON DELETE CASCADE);
+            # the archive keeps their read_count. No ON CONFLICT: an id already
+            # archived fails the batch instead of being deleted unarchived.
+            cur.execute("""
+                WITH moved AS (
+                    DELETE FROM announcements
+                    WHERE announcement_id IN (
+                        SELECT announcement_id FROM announcements
+                        WHERE is_active = FALSE AND created_at < %s
+                        ORDER BY announcement_id
+                        LIMIT %s
+                    )
+                    RETURNING announcement_id, title, content, target_role, is_pinned,
+                              expires_at, created_at, read_count
+                ), archived AS (
+                    INSERT INTO announcements_archive (announcement_id, title, content, target_role,
+                                                       is_pinned, expires_at, created_at, read_count)
+                    SELECT * FROM moved
+                )
+                SELECT count(*) FROM moved
+            """, (cutoff, batch_size))
+            moved = cur.fetchone()[0]
+            conn.commit()
+            result['archived'] += moved
+            if moved < batch_size:
+                break
+        cur.close()
+    finally:
+        conn.close()
+
+    if result['expired'] or result['archived']:
+        publish(ANNOUNCEMENT_EXPIRED, **result)
+    return result
+
+@instrumented
+def get_archived_announcements(limit=20, offset=0):
+    """
+    Returns one page of archived announcements, newest first.
     """
     conn = get_db_connection()
     if not conn:
-        return {'read': [], 'unread': []}
-        
+        return []
+
     try:
         cur = conn.cursor()
-        
-        # Get target role first
-        cur.execute("SELECT target_role FROM announcements WHERE announcement_id = %s", (announcement_id,))
-        result = cur.fetchone()
-        if not result:
-            return {'read': [], 'unread': []}
-        
-        target_role = result[0]
-        
-        # Get readers
         cur.execute("""
+            SELECT * FROM announcements_archive
+            ORDER BY created_at DESC
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
+        announcements = fetch_rows(cur)
+        cur.close()
+        conn.close()
+        return announcements
+    except Exception as e:
+        st.error(f"Error fetching archived announcements: {e}")
+        return []
+
+@instrumented
+def count_archived_announcements():
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM announcements_archive")
+        count = cur.fetchone()[0]
+        cur.close()
+        conn.close()
+        return count
+    except Exception as e:
+        st.error(f"Error counting archived announcements: {e}")
+        return 0
+
+@instrumented
+def get_active_user_counts():
+    """
+    Returns the number of active users per role, e.g. {'user': 120, 'staff': 8}.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {}
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT role, COUNT(*) FROM users WHERE is_active = TRUE GROUP BY role")
+        counts = {role: count for role, count in cur.fetchall()}
+        cur.close()
+        conn.close()
+        return counts
+    except Exception as e:
+        st.error(f"Error fetching user counts: {e}")
+        return {}
+
+def get_announcement_read_counts(announcement, active_user_counts):
+    """
+    Returns {'read': n, 'unread': m} for an announcement row without
+    touching announcement_reads, using its read_count counter and the
+    output of get_active_user_counts().
+    """
+    if announcement['target_role'] == 'all':
+        audience = sum(active_user_counts.values())
+    else:
+        audience = active_user_counts.get(announcement['target_role'], 0)
+
+    read_count = announcement.get('read_count') or 0
+    return {'read': read_count, 'unread': max(audience - read_count, 0)}
+
+@instrumented
+def get_announcement_readers(announcement_id, limit=20, offset=0):
+    """
+    Returns one page of users who read an announcement, latest first.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        cur = conn.cursor()
+        query = """
             SELECT u.username, u.role, ar.read_at
             FROM announcement_reads ar
             JOIN users u ON ar.user_id = u.user_id
             WHERE ar.announcement_id = %s
-        """, (announcement_id,))
-        read_columns = [desc[0] for desc in cur.description]
-        read_users = [dict(zip(read_columns, row)) for row in cur.fetchall()]
-        
-        # Get unread users
-        # Filter users based on target_role
-        role_filter = ""
+            ORDER BY ar.read_at DESC
+        """
         params = [announcement_id]
-        
-        if target_role != 'all':
-            role_filter = "AND u.role = %s"
-            params.append(target_role)
-            
-        cur.execute(f"""
+
+        if limit:
+            query += " LIMIT %s OFFSET %s"
+            params.extend([limit, offset])
+
+        cur.execute(query, tuple(params))
+
+        readers = fetch_rows(cur)
+
+        cur.close()
+        conn.close()
+        return readers
+    except Exception as e:
+        st.error(f"Error fetching readers: {e}")
+        return []
+
+@instrumented
+def get_announcement_non_readers(announcement_id, target_role, limit=20, offset=0):
+    """
+    Returns one page of active users in the target audience who haven't
+    read an announcement. Uses a NOT EXISTS anti-join so PostgreSQL can
+    probe the (announcement_id, user_id) unique index per user.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        cur = conn.cursor()
+        query = """
             SELECT u.username, u.role
             FROM users u
-            WHERE u.user_id NOT IN (
-                SELECT user_id FROM announcement_reads WHERE announcement_id = %s
+            WHERE u.is_active = TRUE
+        """
+        params = []
+
+        if target_role != 'all':
+            query += " AND u.role = %s"
+            params.append(target_role)
+
+        query += """
+            AND NOT EXISTS (
+                SELECT 1 FROM announcement_reads ar
+                WHERE ar.announcement_id = %s AND ar.user_id = u.user_id
             )
-            {role_filter}
-            AND u.is_active = TRUE
-        """, tuple(params))
-        
-        unread_columns = [desc[0] for desc in cur.description]
-        unread_users = [dict(zip(unread_columns, row)) for row in cur.fetchall()]
-        
+            ORDER BY u.username
+        """
+        params.append(announcement_id)
+
+        if limit:
+            query += " LIMIT %s OFFSET %s"
+            params.extend([limit, offset])
+
+        cur.execute(query, tuple(params))
+
+        non_readers = fetch_rows(cur)
+
+        cur.close()
+        conn.close()
+        return non_readers
+    except Exception as e:
+        st.error(f"Error fetching pending readers: {e}")
+        return []
+
+@instrumented
+def get_announcement_read_stats(announcement_id):
+    """
+    Returns read stats for an announcement:
+    - List of users who read it
+    - List of users who haven't read it (filtered by target role)
+    Loads every user; prefer get_announcement_read_counts() plus the
+    paginated reader functions for large audiences.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {'read': [], 'unread': []}
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT target_role FROM announcements WHERE announcement_id = %s", (announcement_id,))
+        result = cur.fetchone()
         cur.close()
         conn.close()
-        return {'read': read_users, 'unread': unread_users}
-        
     except Exception as e:
         st.error(f"Error fetching stats: {e}")
         return {'read': [], 'unread': []}
+
+    if not result:
+        return {'read': [], 'unread': []}
+
+    return {
+        'read': get_announcement_readers(announcement_id, limit=None),
+        'unread': get_announcement_non_readers(announcement_id, result[0], limit=None),
+    }
@@ -1,8 +1,11 @@
 import streamlit as st
 import psycopg2
-from src.database import get_db_connection
+from src.database import get_db_connection, get_pooled_connection, release_connection, prepared_statement, execute_prepared
+from src.metrics import instrumented
+from src.events import publish, USER_CHANGED
 from src.utils import hash_password, check_password, validate_password, validate_phone
 
+@instrumented
 def check_username_availability(username):
     conn = get_db_connection()
     if not conn:
@@ -18,6 +21,7 @@ def check_username_availability(username):
         st.error(f"Error checking username: {e}")
         return False
 
+@instrumented
 def check_phone_availability(phone):
     conn = get_db_connection()
     if not conn:
@@ -33,6 +37,7 @@ def check_phone_availability(phone):
         st.error(f"Error checking phone: {e}")
         return False
 
+@instrumented
 def check_email_availability(email):
     conn = get_db_connection()
     if not conn:
@@ -48,6 +53,7 @@ def check_email_availability(email):
         st.error(f"Error checking email: {e}")
         return False
 
+@instrumented
 def add_staff_member(username, email, phone, role, temp_password):
     # Checks
     if not check_username_availability(username):
@@ -70,6 +76,7 @@ def add_staff_member(username, email, phone, role, temp_password):
             VALUES (%s, %s, %s, %s, %s, TRUE)
         """, (username, email, phone, role, hashed_pw))
         conn.commit()
+        publish(USER_CHANGED, username=username)
         cur.close()
         conn.close()
         return True, "Staff added successfully."
@@ -77,6 +84,7 @@ def add_staff_member(username, email, phone, role, temp_password):
         return False, f"Error adding staff: {e}"
 
 
+@instrumented
 def get_user_profile(user_id):
     conn = get_db_connection()
     if not conn:
@@ -101,6 +109,7 @@ def get_user_profile(user_id):
         return None
 
 
+@instrumented
 def update_user_profile(user_id, email, phone):
     conn = get_db_connection()
     if not conn:
@@ -158,12 +167,14 @@ def update_user_profile(user_id, email, phone):
             (email, phone, user_id),
         )
         conn.commit()
+        publish(USER_CHANGED, user_id=user_id)
         cur.close()
         conn.close()
         return True, "Profile updated successfully."
     except Exception as e:
         return False, f"Error updating profile: {e}"
 
+@instrumented
 def update_password(user_id, new_password):
     hashed_pw = hash_password(new_password)
     conn = get_db_connection()
@@ -177,12 +188,14 @@ def update_password(user_id, new_password):
             WHERE user_id = %s
         """, (hashed_pw, user_id))
         conn.commit()
+        publish(USER_CHANGED, user_id=user_id)
         cur.close()
         conn.close()
         return True, "Password updated successfully."
     except Exception as e:
         return False, f"Error updating password: {e}"
 
+@instrumented
 def register_user(username, password, phone, role):
     if not check_username_availability(username):
         return False, "Username already taken."
@@ -202,23 +215,33 @@ def register_user(username, password, phone, role):
             VALUES (%s, %s, %s, %s)
         """, (username, hashed_pw, phone, role))
         conn.commit()
+        publish(USER_CHANGED, username=username)
         cur.close()
         conn.close()
         return True, "Registration successful! Please login."
     except Exception as e:
         return False, f"Registration failed: {e}"
 
+LOGIN_STATEMENT = prepared_statement(
+    'login_user',
+    "SELECT user_id, username, password_hash, role, is_active, must_change_password FROM users WHERE username = $1",
+)
+
+@instrumented
 def login_user(username, password):
-    conn = get_db_connection()
+    conn = get_pooled_connection()
     if not conn:
         return None, "Database connection failed."
         
     try:
         cur = conn.cursor()
-        cur.execute("SELECT user_id, username, password_hash, role, is_active, must_change_password FROM users WHERE username = %s", (username,))
+        execute_prepared(cur, LOGIN_STATEMENT, (username,))
         user = cur.fetchone()
         cur.close()
-        conn.close()
+        conn.commit()
+        # Hand the connection back before the (slow) bcrypt check
+        release_connection(conn)
+        conn = None
         
         if user:
             # Check is_active status
@@ -236,3 +259,6 @@ def login_user(username, password):
         return None, "Invalid username or password"
     except Exception as e:
         return None, f"Login error: {e}"
+    finally:
+        if conn is not None:
+            release_connection(conn)
@@ -1,11 +1,86 @@
-from src.database import get_db_connection
+from src.database import get_db_connection, get_pooled_connection, release_connection, prepared_statement, execute_prepared
+from src.metrics import instrumented
+from src.profiler import profiled
+from src.rows import fetch_rows, stream_rows, STREAM_ITERSIZE
+from src.retention import archive_horizon
+from src.events import publish, BOOKING_CREATED, BOOKING_CANCELLED, BOOKING_RESCHEDULED, BOOKING_CHECKED_IN, BOOKING_STATUS_CHANGED
 import streamlit as st
+import psycopg2
 import qrcode
 from io import BytesIO
 import base64
+import csv
+import hashlib
+import hmac
+import os
+import struct
+import tempfile
 import uuid
-from datetime import datetime, timedelta
+from functools import lru_cache
+from datetime import date, datetime, timedelta
 
+LEGACY_QR_PREFIX = "BOOKING:"
+
+# Compact signed QR payloads: "MFZ1:" + base32(booking_id, slot day, HMAC).
+# Scanners can verify them without a database lookup. Enable by setting
+# MYFUNZONE_QR_SECRET; existing "BOOKING:<uuid>" codes keep working.
+SIGNED_QR_PREFIX = "MFZ1:"
+SIGNED_QR_SECRET = os.environ.get("MYFUNZONE_QR_SECRET", "")
+SIGNED_QR_CODES = bool(SIGNED_QR_SECRET)
+SIGNED_QR_EPOCH = date(2020, 1, 1)
+SIGNED_QR_MAC_BYTES = 8
+
+def _qr_signature(body):
+    return hmac.new(SIGNED_QR_SECRET.encode(), body, hashlib.sha256).digest()[:SIGNED_QR_MAC_BYTES]
+
+def encode_signed_qr(booking_id, slot_date):
+    """
+    Builds a signed QR payload. Uppercase base32 keeps it in the QR
+    alphanumeric mode, so it fits in a version 1 code.
+    """
+    body = struct.pack(">IH", booking_id, (slot_date - SIGNED_QR_EPOCH).days)
+    token = base64.b32encode(body + _qr_signature(body)).decode().rstrip("=")
+    return SIGNED_QR_PREFIX + token
+
+def decode_signed_qr(qr_code_data):
+    """
+    Returns (booking_id, slot_date) for an authentic signed payload, else None.
+    """
+    if not SIGNED_QR_SECRET or not qr_code_data.startswith(SIGNED_QR_PREFIX):
+        return None
+    token = qr_code_data[len(SIGNED_QR_PREFIX):]
+    try:
+        raw = base64.b32decode(token + "=" * (-len(token) % 8))
+    except ValueError:
+        return None
+    if len(raw) != 6 + SIGNED_QR_MAC_BYTES:
+        return None
+
+    body, signature = raw[:6], raw[6:]
+    if not hmac.compare_digest(signature, _qr_signature(body)):
+        return None
+    booking_id, day = struct.unpack(">IH", body)
+    return booking_id, SIGNED_QR_EPOCH + timedelta(days=day)
+
+def verify_qr_payload(qr_code_data):
+    """
+    Local pre-check of a scanned code. Returns (is_candidate, message).
+    Signed codes are authenticated and must be for today; legacy codes
+    are passed through to the database lookup.
+    """
+    if qr_code_data.startswith(LEGACY_QR_PREFIX):
+        return True, None
+    if qr_code_data.startswith(SIGNED_QR_PREFIX):
+        decoded = decode_signed_qr(qr_code_data)
+        if decoded is None:
+            return False, "Invalid QR Code"
+        if decoded[1] != date.today():
+            return False, f"Booking is for {decoded[1]}, not today"
+        return True, None
+    return False, "Invalid QR Code"
+
+@profiled("QR render")
+@lru_cache(maxsize=512)
 def generate_qr_code(data):
     qr = qrcode.QRCode(
         version=1,
@@ -22,6 +97,7 @@ def generate_qr_code(data):
     img_str = base64.b64encode(buffered.getvalue()).decode()
     return img_str
 
+@instrumented
 def cancel_booking(booking_id, user_role, user_id=None):
     """
     Cancel a booking based on role policies.
@@ -72,6 +148,7 @@ def cancel_booking(booking_id, user_role, user_id=None):
         cur.execute("UPDATE payments SET payment_status = 'refunded' WHERE booking_id = %s AND payment_status = 'paid'", (booking_id,))
         
         conn.commit()
+        publish(BOOKING_CANCELLED, booking_id=booking_id, user_id=b_user_id)
         cur.close()
         conn.close()
         return True, "Booking cancelled successfully"
@@ -80,6 +157,7 @@ def cancel_booking(booking_id, user_role, user_id=None):
             conn.rollback()
         return False, f"Error cancelling booking: {e}"
 
+@instrumented
 def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
     """
     Reschedule booking to a new slot.
@@ -93,7 +171,7 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
         
         # Get current booking
         cur.execute("""
-            SELECT b.user_id, b.status, b.number_of_players, s.price
+            SELECT b.user_id, b.status, b.number_of_players, s.price, b.qr_code
             FROM bookings b
             JOIN slots s ON b.slot_id = s.slot_id
             WHERE b.booking_id = %s
@@ -103,7 +181,7 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
         if not booking:
             return False, "Booking not found"
             
-        b_user_id, status, num_players, old_price = booking
+        b_user_id, status, num_players, old_price, qr_code = booking
         
         if status != 'booked':
             return False, "Only active bookings can be rescheduled"
@@ -113,7 +191,7 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
              
         # Check new slot availability
         cur.execute("""
-            SELECT s.max_players, s.price,
+            SELECT s.max_players, s.price, s.slot_date,
                    (s.max_players - COALESCE(SUM(b.number_of_players), 0)) as available_spots
             FROM slots s
             LEFT JOIN bookings b ON s.slot_id = b.slot_id AND b.status IN ('booked', 'checked_in')
@@ -125,14 +203,17 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
         if not new_slot:
             return False, "New slot not found"
             
-        max_players, new_price, available_spots = new_slot
+        max_players, new_price, new_slot_date, available_spots = new_slot
         
         if available_spots < num_players:
             return False, "Not enough spots in new slot"
             
      
         
-        cur.execute("UPDATE bookings SET slot_id = %s WHERE booking_id = %s", (new_slot_id, booking_id))
+        # Signed codes carry the slot date, so they are re-issued for the new one
+        if qr_code and qr_code.startswith(SIGNED_QR_PREFIX):
+            qr_code = encode_signed_qr(booking_id, new_slot_date)
+        cur.execute("UPDATE bookings SET slot_id = %s, qr_code = %s WHERE booking_id = %s", (new_slot_id, qr_code, booking_id))
         
         # Update payment amount if price changed?
         if new_price != old_price:
@@ -140,6 +221,7 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
              cur.execute("UPDATE payments SET amount = %s WHERE booking_id = %s", (new_total, booking_id))
         
         conn.commit()
+        publish(BOOKING_RESCHEDULED, booking_id=booking_id, user_id=b_user_id, slot_id=new_slot_id)
         cur.close()
         conn.close()
         return True, "Booking rescheduled successfully"
@@ -148,8 +230,29 @@ def reschedule_booking(booking_id, new_slot_id, user_role, user_id=None):
             conn.rollback()
         return False, f"Error rescheduling: {e}"
 
+SLOT_CAPACITY_STATEMENT = prepared_statement('slot_capacity', """
+    SELECT s.max_players, s.price, s.slot_date,
+           (s.max_players - COALESCE(SUM(b.number_of_players), 0)) as available_spots
+    FROM slots s
+    LEFT JOIN bookings b ON s.slot_id = b.slot_id AND b.status IN ('booked', 'checked_in')
+    WHERE s.slot_id = $1
+    GROUP BY s.slot_id
+""")
+
+BOOKING_INSERT_STATEMENT = prepared_statement('booking_insert', """
+    INSERT INTO bookings (user_id, slot_id, number_of_players, qr_code, status)
+    VALUES ($1, $2, $3, $4, 'booked')
+    RETURNING booking_id
+""")
+
+PAYMENT_INSERT_STATEMENT = prepared_statement('payment_insert', """
+    INSERT INTO payments (booking_id, amount, payment_status, payment_method)
+    VALUES ($1, $2, 'pending', 'online')
+""")
+
+@instrumented
 def create_booking(user_id, slot_id, number_of_players):
-    conn = get_db_connection()
+    conn = get_pooled_connection()
     if not conn:
         return False, "Database connection failed"
     
@@ -157,20 +260,13 @@ def create_booking(user_id, slot_id, number_of_players):
         cur = conn.cursor()
         
         # Verify slot availability again
-        cur.execute("""
-            SELECT s.max_players, s.price,
-                   (s.max_players - COALESCE(SUM(b.number_of_players), 0)) as available_spots
-            FROM slots s
-            LEFT JOIN bookings b ON s.slot_id = b.slot_id AND b.status IN ('booked', 'checked_in')
-            WHERE s.slot_id = %s
-            GROUP BY s.slot_id
-        """, (slot_id,))
+        execute_prepared(cur, SLOT_CAPACITY_STATEMENT, (slot_id,))
         
         slot_data = cur.fetchone()
         if not slot_data:
             return False, "Slot not found"
             
-        max_players, price, available_spots = slot_data
+        max_players, price, slot_date, available_spots = slot_data
         
         if available_spots < number_of_players:
             return False, "Not enough spots available"
@@ -180,30 +276,43 @@ def create_booking(user_id, slot_id, number_of_players):
         qr_code_data = f"BOOKING:{unique_code}"
         
         # Create booking
-        cur.execute("""
-            INSERT INTO bookings (user_id, slot_id, number_of_players, qr_code, status)
-            VALUES (%s, %s, %s, %s, 'booked')
-            RETURNING booking_id
-        """, (user_id, slot_id, number_of_players, qr_code_data))
+        execute_prepared(cur, BOOKING_INSERT_STATEMENT, (user_id, slot_id, number_of_players, qr_code_data))
         
         booking_id = cur.fetchone()[0]
         
+        # Swap in the compact signed payload now that the id is known
+        if SIGNED_QR_CODES:
+            cur.execute(
+                "UPDATE bookings SET qr_code = %s WHERE booking_id = %s",
+                (encode_signed_qr(booking_id, slot_date), booking_id),
+            )
+        
         # Create payment record (pending)
         total_amount = price * number_of_players
-        cur.execute("""
-            INSERT INTO payments (booking_id, amount, payment_status, payment_method)
-            VALUES (%s, %s, 'pending', 'online')
-        """, (booking_id, total_amount))
+        execute_prepared(cur, PAYMENT_INSERT_STATEMENT, (booking_id, total_amount))
         
         conn.commit()
+        publish(BOOKING_CREATED, booking_id=booking_id, user_id=user_id, slot_id=slot_id)
         cur.close()
-        conn.close()
         return True, booking_id
     except Exception as e:
         if conn:
             conn.rollback()
         return False, f"Error creating booking: {e}"
+    finally:
+        release_connection(conn)
 
+USER_BOOKINGS_QUERY = """
+    SELECT b.*, g.game_id as game_id, g.name as game_name, s.slot_date, s.start_time, s.end_time, p.amount, p.payment_status
+    FROM bookings b
+    JOIN slots s ON b.slot_id = s.slot_id
+    JOIN games g ON s.game_id = g.game_id
+    LEFT JOIN payments p ON b.booking_id = p.booking_id
+    WHERE b.user_id = %s
+    ORDER BY b.booking_time DESC
+"""
+
+@instrumented
 def get_user_bookings(user_id):
     conn = get_db_connection()
     if not conn:
@@ -211,20 +320,9 @@ def get_user_bookings(user_id):
     
     try:
         cur = conn.cursor()
-        cur.execute("""
-            SELECT b.*, g.game_id as game_id, g.name as game_name, s.slot_date, s.start_time, s.end_time, p.amount, p.payment_status
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
-            JOIN games g ON s.game_id = g.game_id
-            LEFT JOIN payments p ON b.booking_id = p.booking_id
-            WHERE b.user_id = %s
-            ORDER BY b.booking_time DESC
-        """, (user_id,))
-        
-        bookings = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            bookings.append(dict(zip(columns, row)))
+        cur.execute(USER_BOOKINGS_QUERY, (user_id,))
+        
+        bookings = fetch_rows(cur)
             
         cur.close()
         conn.close()
@@ -233,6 +331,66 @@ def get_user_bookings(user_id):
         st.error(f"Error fetching bookings: {e}")
         return []
 
+@instrumented
+def iter_user_bookings(user_id, itersize=STREAM_ITERSIZE):
+    """
+    Streaming variant of get_user_bookings on a server-side cursor.
+    """
+    try:
+        yield from stream_rows(get_db_connection, USER_BOOKINGS_QUERY, (user_id,), itersize)
+    except psycopg2.Error as e:
+        st.error(f"Error fetching bookings: {e}")
+
+ALL_BOOKINGS_HOT = """
+    SELECT b.booking_id, b.user_id, b.slot_id, b.number_of_players, b.qr_code, b.status, b.booking_time,
+           u.username, g.game_id as game_id, g.name as game_name, s.slot_date, s.start_time, s.end_time,
+           p.amount, p.payment_status
+    FROM bookings b
+    JOIN users u ON b.user_id = u.user_id
+    JOIN slots s ON b.slot_id = s.slot_id
+    JOIN games g ON s.game_id = g.game_id
+    LEFT JOIN payments p ON b.booking_id = p.booking_id
+"""
+
+# Same columns from the archive tables (src/retention.py); the slot may
+# still be in slots if other bookings kept it there
+ALL_BOOKINGS_ARCHIVED = """
+    SELECT a.booking_id, a.user_id, a.slot_id, a.number_of_players, a.qr_code, a.status, a.booking_time,
+           u.username, a.game_id, g.name, a.slot_date, a.start_time, COALESCE(sa.end_time, s.end_time),
+           pa.amount, pa.payment_status
+    FROM bookings_archive a
+    LEFT JOIN users u ON a.user_id = u.user_id
+    LEFT JOIN games g ON a.game_id = g.game_id
+    LEFT JOIN slots_archive sa ON a.slot_id = sa.slot_id
+    LEFT JOIN slots s ON a.slot_id = s.slot_id
+    LEFT JOIN payments_archive pa ON a.booking_id = pa.booking_id
+"""
+
+def _all_bookings_query(start_date=None, end_date=None):
+    """
+    Bookings query for a slot date range (or one day if only start_date is
+    given), reading the archive tables too when the range reaches past the
+    retention horizon or is unbounded.
+    """
+    if start_date and start_date >= archive_horizon():
+        source = ALL_BOOKINGS_HOT
+    else:
+        source = f"{ALL_BOOKINGS_HOT} UNION ALL {ALL_BOOKINGS_ARCHIVED}"
+    query = f"SELECT * FROM ({source}) f"
+    params = []
+    
+    if start_date and end_date:
+        query += " WHERE f.slot_date BETWEEN %s AND %s"
+        params.append(start_date)
+        params.append(end_date)
+    elif start_date:
+        query += " WHERE f.slot_date = %s"
+        params.append(start_date)
+        
+    query += " ORDER BY f.booking_time DESC"
+    return query, tuple(params)
+
+@instrumented
 def get_all_bookings(start_date=None, end_date=None):
     conn = get_db_connection()
     if not conn:
@@ -240,32 +398,9 @@ def get_all_bookings(start_date=None, end_date=None):
     
     try:
         cur = conn.cursor()
-        query = """
-            SELECT b.*, u.username, g.game_id as game_id, g.name as game_name, s.slot_date, s.start_time, s.end_time, p.amount, p.payment_status
-            FROM bookings b
-            JOIN users u ON b.user_id = u.user_id
-            JOIN slots s ON b.slot_id = s.slot_id
-            JOIN games g ON s.game_id = g.game_id
-            LEFT JOIN payments p ON b.booking_id = p.booking_id
-        """
-        params = []
+        cur.execute(*_all_bookings_query(start_date, end_date))
         
-        if start_date and end_date:
-            query += " WHERE s.slot_date BETWEEN %s AND %s"
-            params.append(start_date)
-            params.append(end_date)
-        elif start_date:
-             query += " WHERE s.slot_date = %s"
-             params.append(start_date)
-            
-        query += " ORDER BY b.booking_time DESC"
-        
-        cur.execute(query, tuple(params))
-        
-        bookings = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            bookings.append(dict(zip(columns, row)))
+        bookings = fetch_rows(cur)
             
         cur.close()
         conn.close()
@@ -274,6 +409,65 @@ def get_all_bookings(start_date=None, end_date=None):
         st.error(f"Error fetching all bookings: {e}")
         return []
 
+@instrumented
+def iter_all_bookings(start_date=None, end_date=None, itersize=STREAM_ITERSIZE):
+    """
+    Streaming variant of get_all_bookings for exports and large ranges.
+    Yields rows itersize at a time from a server-side cursor.
+    """
+    query, params = _all_bookings_query(start_date, end_date)
+    try:
+        yield from stream_rows(get_db_connection, query, params, itersize)
+    except psycopg2.Error as e:
+        st.error(f"Error fetching all bookings: {e}")
+
+BOOKING_EXPORT_COLUMNS = (
+    'booking_id', 'slot_date', 'start_time', 'end_time', 'game_name', 'username',
+    'number_of_players', 'status', 'amount', 'payment_status', 'booking_time',
+)
+
+@instrumented
+def export_bookings_csv(start_date=None, end_date=None):
+    """
+    Writes the bookings of a date range to a temporary CSV file, row by row
+    from a server-side cursor, and returns its path (None on error). The
+    caller owns the file.
+    """
+    fd, path = tempfile.mkstemp(prefix="bookings_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="") as output:
+            writer = csv.writer(output)
+            writer.writerow(BOOKING_EXPORT_COLUMNS)
+            for booking in stream_rows(get_db_connection, *_all_bookings_query(start_date, end_date)):
+                writer.writerow([booking[column] for column in BOOKING_EXPORT_COLUMNS])
+        return path
+    except psycopg2.Error as e:
+        os.remove(path)
+        st.error(f"Error exporting bookings: {e}")
+        return None
+
+# Booking rows for the analytics queries. The archive tables (src/retention.py)
+# are only scanned when the requested range reaches back past the horizon.
+HOT_BOOKING_FACTS = """
+    SELECT b.booking_id, b.user_id, b.status, s.slot_date, s.start_time, p.amount
+    FROM bookings b
+    JOIN slots s ON b.slot_id = s.slot_id
+    LEFT JOIN payments p ON b.booking_id = p.booking_id
+"""
+
+ARCHIVED_BOOKING_FACTS = """
+    SELECT a.booking_id, a.user_id, a.status, a.slot_date, a.start_time, pa.amount
+    FROM bookings_archive a
+    LEFT JOIN payments_archive pa ON a.booking_id = pa.booking_id
+"""
+
+def _booking_facts(start_date=None, end_date=None):
+    # Without both bounds the queries apply no date filter at all
+    if start_date and end_date and start_date >= archive_horizon():
+        return f"({HOT_BOOKING_FACTS}) f"
+    return f"({HOT_BOOKING_FACTS} UNION ALL {ARCHIVED_BOOKING_FACTS}) f"
+
+@instrumented
 def get_revenue_stats(start_date=None, end_date=None):
     """
     Returns total revenue and revenue over time.
@@ -285,19 +479,17 @@ def get_revenue_stats(start_date=None, end_date=None):
     try:
         cur = conn.cursor()
         
-        where_clause = " WHERE b.status IN ('booked', 'checked_in', 'completed') "
+        where_clause = " WHERE f.status IN ('booked', 'checked_in', 'completed') "
         params = []
         
         if start_date and end_date:
-            where_clause += " AND s.slot_date BETWEEN %s AND %s"
+            where_clause += " AND f.slot_date BETWEEN %s AND %s"
             params.extend([start_date, end_date])
             
         # Total Revenue
         query_total = f"""
-            SELECT COALESCE(SUM(p.amount), 0)
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
-            LEFT JOIN payments p ON b.booking_id = p.booking_id
+            SELECT COALESCE(SUM(f.amount), 0)
+            FROM {_booking_facts(start_date, end_date)}
             {where_clause}
         """
         cur.execute(query_total, tuple(params))
@@ -305,13 +497,11 @@ def get_revenue_stats(start_date=None, end_date=None):
         
         # Daily Revenue
         query_daily = f"""
-            SELECT s.slot_date, COALESCE(SUM(p.amount), 0) as daily_total
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
-            LEFT JOIN payments p ON b.booking_id = p.booking_id
+            SELECT f.slot_date, COALESCE(SUM(f.amount), 0) as daily_total
+            FROM {_booking_facts(start_date, end_date)}
             {where_clause}
-            GROUP BY s.slot_date
-            ORDER BY s.slot_date
+            GROUP BY f.slot_date
+            ORDER BY f.slot_date
         """
         cur.execute(query_daily, tuple(params))
         
@@ -326,6 +516,7 @@ def get_revenue_stats(start_date=None, end_date=None):
         st.error(f"Error fetching revenue stats: {e}")
         return {'total_revenue': 0, 'daily_revenue': []}
 
+@instrumented
 def get_cancellation_stats(start_date=None, end_date=None):
     """
     Returns cancellation statistics.
@@ -341,15 +532,14 @@ def get_cancellation_stats(start_date=None, end_date=None):
         params = []
         
         if start_date and end_date:
-            where_clause = " WHERE s.slot_date BETWEEN %s AND %s"
+            where_clause = " WHERE f.slot_date BETWEEN %s AND %s"
             params.extend([start_date, end_date])
             
         query = f"""
             SELECT 
                 COUNT(*) as total,
-                SUM(CASE WHEN b.status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
+                SUM(CASE WHEN f.status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
+            FROM {_booking_facts(start_date, end_date)}
             {where_clause}
         """
         
@@ -371,6 +561,7 @@ def get_cancellation_stats(start_date=None, end_date=None):
         st.error(f"Error fetching cancellation stats: {e}")
         return {'total_bookings': 0, 'cancelled_bookings': 0, 'cancellation_rate': 0}
 
+@instrumented
 def get_active_users_count(start_date=None, end_date=None):
     """
     Returns the count of distinct users who have made at least one booking
@@ -387,13 +578,12 @@ def get_active_users_count(start_date=None, end_date=None):
         params = []
         
         if start_date and end_date:
-            where_clause = " WHERE s.slot_date BETWEEN %s AND %s"
+            where_clause = " WHERE f.slot_date BETWEEN %s AND %s"
             params.extend([start_date, end_date])
             
         query = f"""
-            SELECT COUNT(DISTINCT b.user_id)
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
+            SELECT COUNT(DISTINCT f.user_id)
+            FROM {_booking_facts(start_date, end_date)}
             {where_clause}
         """
         
@@ -407,6 +597,7 @@ def get_active_users_count(start_date=None, end_date=None):
         st.error(f"Error fetching active users count: {e}")
         return 0
 
+@instrumented
 def get_peak_hour_insights(start_date=None, end_date=None):
     """
     Returns the number of bookings per hour to identify peak times.
@@ -422,17 +613,16 @@ def get_peak_hour_insights(start_date=None, end_date=None):
         params = []
         
         if start_date and end_date:
-            where_clause = " WHERE s.slot_date BETWEEN %s AND %s"
+            where_clause = " WHERE f.slot_date BETWEEN %s AND %s"
             params.extend([start_date, end_date])
             
         # Extract hour from start_time. 
-        # PostgreSQL: EXTRACT(HOUR FROM s.start_time)
+        # PostgreSQL: EXTRACT(HOUR FROM f.start_time)
         query = f"""
             SELECT 
-                EXTRACT(HOUR FROM s.start_time) as hour,
+                EXTRACT(HOUR FROM f.start_time) as hour,
                 COUNT(*) as booking_count
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.slot_id
+            FROM {_booking_facts(start_date, end_date)}
             {where_clause}
             GROUP BY hour
             ORDER BY booking_count DESC
@@ -451,52 +641,74 @@ def get_peak_hour_insights(start_date=None, end_date=None):
         st.error(f"Error fetching peak hour insights: {e}")
         return []
 
+# Locks the booking, then checks it in, records the scan and marks the
+# payment paid in one atomic statement (one round trip in autocommit mode).
+CHECK_IN_STATEMENT = prepared_statement('check_in', """
+    WITH target AS (
+        SELECT booking_id, status
+        FROM bookings
+        WHERE qr_code = $1
+        FOR UPDATE
+    ), checked_in AS (
+        UPDATE bookings b
+        SET status = 'checked_in'
+        FROM target t
+        WHERE b.booking_id = t.booking_id
+          AND b.status NOT IN ('checked_in', 'cancelled', 'completed')
+        RETURNING b.booking_id
+    ), scan AS (
+        INSERT INTO qr_checkins (booking_id, staff_id)
+        SELECT booking_id, $2::integer FROM checked_in
+    ), paid AS (
+        UPDATE payments p
+        SET payment_status = 'paid'
+        FROM checked_in c
+        WHERE p.booking_id = c.booking_id
+    )
+    SELECT t.booking_id, t.status, EXISTS (SELECT 1 FROM checked_in)
+    FROM target t
+""")
+
+CHECK_IN_REJECTIONS = {
+    'checked_in': "Booking already checked in",
+    'cancelled': "Booking is cancelled",
+    'completed': "Booking already completed",
+}
+
+@instrumented
 def check_in_user(qr_code_data, staff_id):
-    conn = get_db_connection()
+    is_candidate, message = verify_qr_payload(qr_code_data)
+    if not is_candidate:
+        return False, message
+
+    conn = get_pooled_connection()
     if not conn:
         return False, "Database connection failed"
     
     try:
+        conn.autocommit = True
         cur = conn.cursor()
-        
-        # Find booking by QR code
-        cur.execute("""
-            SELECT booking_id, status FROM bookings WHERE qr_code = %s
-        """, (qr_code_data,))
-        
-        booking = cur.fetchone()
-        if not booking:
-            return False, "Invalid QR Code"
-            
-        booking_id, status = booking
-        
-        if status == 'checked_in':
-            return False, "Booking already checked in"
-        if status == 'cancelled':
-            return False, "Booking is cancelled"
-        if status == 'completed':
-            return False, "Booking already completed"
-            
-        # Update status and record check-in
-        cur.execute("UPDATE bookings SET status = 'checked_in' WHERE booking_id = %s", (booking_id,))
-        
-        cur.execute("""
-            INSERT INTO qr_checkins (booking_id, staff_id)
-            VALUES (%s, %s)
-        """, (booking_id, staff_id))
-
-        # Update payment status to 'paid'
-        cur.execute("UPDATE payments SET payment_status = 'paid' WHERE booking_id = %s", (booking_id,))
-        
-        conn.commit()
+        execute_prepared(cur, CHECK_IN_STATEMENT, (qr_code_data, staff_id))
+        result = cur.fetchone()
         cur.close()
-        conn.close()
-        return True, "Check-in successful"
     except Exception as e:
-        if conn:
-            conn.rollback()
         return False, f"Error processing check-in: {e}"
+    finally:
+        if not conn.closed:
+            conn.autocommit = False
+        release_connection(conn)
+
+    if not result:
+        return False, "Invalid QR Code"
+
+    booking_id, status, checked_in = result
+    if not checked_in:
+        return False, CHECK_IN_REJECTIONS.get(status, "Booking cannot be checked in")
+
+    publish(BOOKING_CHECKED_IN, booking_id=booking_id, staff_id=staff_id)
+    return True, "Check-in successful"
 
+@instrumented
 def update_booking_status(booking_id, new_status):
     conn = get_db_connection()
     if not conn:
@@ -506,6 +718,7 @@ def update_booking_status(booking_id, new_status):
         cur = conn.cursor()
         cur.execute("UPDATE bookings SET status = %s WHERE booking_id = %s", (new_status, booking_id))
         conn.commit()
+        publish(BOOKING_STATUS_CHANGED, booking_id=booking_id, status=new_status)
         cur.close()
         conn.close()
         return True, "Status updated successfully"
@@ -0,0 +1,114 @@
+import threading
+import streamlit as st
+from src import events
+from src.auth import get_user_profile
+from src.announcements import get_announcements_for_role
+from src.games import get_all_games
+from src.bookings import get_user_bookings
+from src.reviews import get_user_reviews
+
+SESSION_CACHE_KEY = 'data_cache'
+
+# Data scopes invalidated by each write event
+EVENT_SCOPES = {
+    events.USER_CHANGED: ('users',),
+    events.GAME_CHANGED: ('games',),
+    events.SLOT_CHANGED: ('slots',),
+    events.BOOKING_CREATED: ('bookings',),
+    events.BOOKING_CANCELLED: ('bookings',),
+    events.BOOKING_RESCHEDULED: ('bookings',),
+    events.BOOKING_CHECKED_IN: ('bookings',),
+    events.BOOKING_STATUS_CHANGED: ('bookings',),
+    events.REVIEW_ADDED: ('reviews',),
+    events.ISSUE_REPORTED: ('issues',),
+    events.ISSUE_STATUS_CHANGED: ('issues',),
+    events.ANNOUNCEMENT_CREATED: ('announcements',),
+    events.ANNOUNCEMENT_READ: ('announcement_reads',),
+    events.ANNOUNCEMENT_EXPIRED: ('announcements',),
+}
+# Writes from other workers may have been missed: everything is stale
+EVENT_SCOPES[events.EVENTS_MISSED] = tuple(sorted({scope for scopes in EVENT_SCOPES.values() for scope in scopes}))
+
+# Data versions shared by every session in this process (and, through the
+# event bridge, bumped by writes in other workers too).
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+
+def bump_data_version(*scopes):
+    """
+    Marks the given data scopes (e.g. 'bookings', 'games') as changed.
+    """
+    with _data_versions_lock:
+        for scope in scopes:
+            _data_versions[scope] = _data_versions.get(scope, 0) + 1
+
+def get_data_version(scope):
+    """
+    Returns the current version number of a data scope.
+    """
+    return _data_versions.get(scope, 0)
+
+def _on_write_event(event):
+    bump_data_version(*EVENT_SCOPES.get(event.type, ()))
+
+events.subscribe(events.ALL_EVENTS, _on_write_event)
+
+def session_cached(key, scopes, loader):
+    """
+    Returns loader() memoized in the current session.
+    The stored value is reused across reruns until one of the data
+    scopes it depends on is bumped by a write (from any session).
+    """
+    cache = st.session_state.setdefault(SESSION_CACHE_KEY, {})
+    versions = tuple(get_data_version(scope) for scope in scopes)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+
+    value = loader()
+    # Failed lookups return None; don't pin them for the whole session.
+    if value is not None:
+        cache[key] = (versions, value)
+    return value
+
+def clear_session_cache():
+    """
+    Drops every memoized value of the current session.
+    """
+    st.session_state.pop(SESSION_CACHE_KEY, None)
+
+def cached_user_profile(user_id):
+    return session_cached(
+        ('user_profile', user_id),
+        ('users',),
+        lambda: get_user_profile(user_id),
+    )
+
+def cached_announcements_for_role(role, user_id=None):
+    return session_cached(
+        ('announcements', role, user_id),
+        ('announcements', 'announcement_reads'),
+        lambda: get_announcements_for_role(role, user_id),
+    )
+
+def cached_all_games(active_only=True, category=None):
+    return session_cached(
+        ('games', active_only, category),
+        ('games',),
+        lambda: get_all_games(active_only=active_only, category=category),
+    )
+
+def cached_user_bookings(user_id):
+    return session_cached(
+        ('user_bookings', user_id),
+        ('bookings', 'slots', 'games'),
+        lambda: get_user_bookings(user_id),
+    )
+
+def cached_user_reviews(user_id):
+    return session_cached(
+        ('user_reviews', user_id),
+        ('reviews', 'games'),
+        lambda: get_user_reviews(user_id),
+    )
@@ -0,0 +1,325 @@
+import os
+import sqlite3
+import uuid
+import psycopg2
+from datetime import date, datetime
+from src.database import connect_db
+from src.metrics import instrumented
+from src.bookings import get_all_bookings
+from src.cache import get_data_version
+from src.events import publish, BOOKING_CHECKED_IN
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local durable journal used by the staff scanner when PostgreSQL is unreachable
+JOURNAL_PATH = os.path.join(PROJECT_ROOT, "checkin_journal.sqlite3")
+
+REPLAY_BATCH_SIZE = 50
+# pg_try_advisory_lock key, so only one session (in any worker) replays at a time
+REPLAY_LOCK_ID = 0x4D465A02
+# The scanner re-downloads the manifest at least this often, and whenever
+# a booking write was seen since the last download
+MANIFEST_REFRESH_SECONDS = 300
+
+# Bookings data version of this process's last manifest download
+_manifest_version = None
+
+# Same writes as check_in_user, keyed by the scan's scan_ref so a scan that
+# was already applied (e.g. before a crash) is recognised instead of redone.
+REPLAY_QUERY = """
+    WITH already AS (
+        SELECT 1 FROM qr_checkins WHERE scan_ref = %(scan_ref)s
+    ), target AS (
+        SELECT booking_id, status
+        FROM bookings
+        WHERE qr_code = %(qr_code)s
+        FOR UPDATE
+    ), checked_in AS (
+        UPDATE bookings b
+        SET status = 'checked_in'
+        FROM target t
+        WHERE b.booking_id = t.booking_id
+          AND b.status NOT IN ('checked_in', 'cancelled', 'completed')
+          AND NOT EXISTS (SELECT 1 FROM already)
+        RETURNING b.booking_id
+    ), scan AS (
+        INSERT INTO qr_checkins (booking_id, staff_id, checkin_time, scan_ref)
+        SELECT booking_id, %(staff_id)s, %(scanned_at)s, %(scan_ref)s FROM checked_in
+    ), paid AS (
+        UPDATE payments p
+        SET payment_status = 'paid'
+        FROM checked_in c
+        WHERE p.booking_id = c.booking_id
+    )
+    SELECT t.booking_id, t.status,
+           EXISTS (SELECT 1 FROM checked_in),
+           EXISTS (SELECT 1 FROM already)
+    FROM target t
+"""
+
+
+def _open_journal():
+    conn = sqlite3.connect(JOURNAL_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS manifest (
+            qr_code TEXT PRIMARY KEY,
+            booking_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            slot_date TEXT NOT NULL,
+            start_time TEXT,
+            game_name TEXT,
+            username TEXT,
+            number_of_players INTEGER,
+            downloaded_at TEXT NOT NULL
+        )
+    """)
+    # One row describing the last download, so an empty manifest still counts
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS manifest_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            slot_date TEXT NOT NULL,
+            bookings INTEGER NOT NULL,
+            downloaded_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scans (
+            scan_ref TEXT PRIMARY KEY,
+            qr_code TEXT NOT NULL,
+            booking_id INTEGER,
+            staff_id INTEGER NOT NULL,
+            scanned_at TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending' CHECK (state IN ('pending', 'applied', 'conflict')),
+            message TEXT
+        )
+    """)
+    return conn
+
+@instrumented
+def download_manifest(target_date=None):
+    """
+    Stores the bookings of the given day (today by default) in the local
+    journal so scans can be validated while the database is down.
+    Returns the number of bookings saved.
+    """
+    global _manifest_version
+    if target_date is None:
+        target_date = date.today()
+
+    version = get_data_version('bookings')
+    bookings = [b for b in get_all_bookings(target_date) if b['qr_code']]
+    downloaded_at = datetime.now().isoformat(timespec='seconds')
+
+    conn = _open_journal()
+    with conn:
+        conn.execute("DELETE FROM manifest")
+        conn.executemany("""
+            INSERT INTO manifest (qr_code, booking_id, status, slot_date, start_time,
+                                  game_name, username, number_of_players, downloaded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (b['qr_code'], b['booking_id'], b['status'], str(b['slot_date']), str(b['start_time']),
+             b['game_name'], b['username'], b['number_of_players'], downloaded_at)
+            for b in bookings
+        ])
+        conn.execute("""
+            INSERT OR REPLACE INTO manifest_info (id, slot_date, bookings, downloaded_at)
+            VALUES (1, ?, ?, ?)
+        """, (str(target_date), len(bookings), downloaded_at))
+    conn.close()
+    _manifest_version = version
+    return len(bookings)
+
+def get_manifest_info():
+    """
+    Returns {'bookings': n, 'slot_date': ..., 'downloaded_at': ...} for the
+    stored manifest, or None if none was downloaded.
+    """
+    conn = _open_journal()
+    row = conn.execute("SELECT bookings, slot_date, downloaded_at FROM manifest_info WHERE id = 1").fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {'bookings': row[0], 'slot_date': row[1], 'downloaded_at': row[2]}
+
+def manifest_is_stale(info):
+    """
+    True if the manifest is missing, for another day, older than
+    MANIFEST_REFRESH_SECONDS, or predates a booking write seen here.
+    """
+    if info is None or info['slot_date'] != str(date.today()):
+        return True
+    if _manifest_version != get_data_version('bookings'):
+        return True
+    age = datetime.now() - datetime.fromisoformat(info['downloaded_at'])
+    return age.total_seconds() > MANIFEST_REFRESH_SECONDS
+
+def mark_manifest_checked_in(qr_code_data):
+    """
+    Records an online check-in in the manifest, so the same code is
+    rejected if scanned again offline before the next download.
+    """
+    conn = _open_journal()
+    with conn:
+        conn.execute("UPDATE manifest SET status = 'checked_in' WHERE qr_code = ?", (qr_code_data,))
+    conn.close()
+
+def record_offline_scan(qr_code_data, staff_id):
+    """
+    Validates a scan against the local manifest and journals it for replay.
+    Returns (success, message) like check_in_user.
+    """
+    conn = _open_journal()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT booking_id, status, slot_date FROM manifest WHERE qr_code = ?",
+                (qr_code_data,),
+            ).fetchone()
+            if not row:
+                return False, "Invalid QR Code (not in today's offline manifest)"
+
+            booking_id, status, slot_date = row
+            if slot_date != str(date.today()):
+                return False, "Offline manifest is out of date; reconnect to refresh it"
+            if status == 'checked_in':
+                return False, "Booking already checked in"
+            if status == 'cancelled':
+                return False, "Booking is cancelled"
+            if status == 'completed':
+                return False, "Booking already completed"
+
+            conn.execute("""
+                INSERT INTO scans (scan_ref, qr_code, booking_id, staff_id, scanned_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (uuid.uuid4().hex, qr_code_data, booking_id, staff_id,
+                  datetime.now().isoformat(timespec='seconds')))
+            conn.execute("UPDATE manifest SET status = 'checked_in' WHERE qr_code = ?", (qr_code_data,))
+        return True, "Checked in offline; will sync when the database is back"
+    finally:
+        conn.close()
+
+def pending_scan_count():
+    conn = _open_journal()
+    count = conn.execute("SELECT COUNT(*) FROM scans WHERE state = 'pending'").fetchone()[0]
+    conn.close()
+    return count
+
+def retry_conflict(scan_ref):
+    """
+    Puts a conflicting scan back in the replay queue.
+    """
+    conn = _open_journal()
+    with conn:
+        conn.execute("UPDATE scans SET state = 'pending', message = NULL WHERE scan_ref = ? AND state = 'conflict'", (scan_ref,))
+    conn.close()
+
+def dismiss_conflict(scan_ref):
+    """
+    Removes a conflicting scan from the journal once staff have dealt with it.
+    """
+    conn = _open_journal()
+    with conn:
+        conn.execute("DELETE FROM scans WHERE scan_ref = ? AND state = 'conflict'", (scan_ref,))
+    conn.close()
+
+def get_conflicts():
+    """
+    Returns journaled scans that could not be applied, newest first.
+    """
+    conn = _open_journal()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT scan_ref, qr_code, booking_id, staff_id, scanned_at, message
+        FROM scans WHERE state = 'conflict'
+        ORDER BY scanned_at DESC
+    """).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+@instrumented
+def replay_journal(batch_size=REPLAY_BATCH_SIZE):
+    """
+    Applies pending offline scans to PostgreSQL, one transaction per batch.
+    Safe to run repeatedly: scans already applied are detected by scan_ref.
+    Returns at once if another session is already replaying.
+    Returns {'applied': n, 'conflicts': m, 'remaining': k}.
+    """
+    summary = {'applied': 0, 'conflicts': 0, 'remaining': pending_scan_count()}
+    if not summary['remaining']:
+        return summary
+
+    try:
+        pg_conn = connect_db()
+    except psycopg2.OperationalError:
+        return summary
+
+    # Held until the connection closes
+    try:
+        cur = pg_conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (REPLAY_LOCK_ID,))
+        locked = cur.fetchone()[0]
+        cur.close()
+        pg_conn.commit()
+    except psycopg2.Error:
+        locked = False
+    if not locked:
+        pg_conn.close()
+        return summary
+
+    journal = _open_journal()
+    try:
+        while True:
+            batch = journal.execute("""
+                SELECT scan_ref, qr_code, staff_id, scanned_at
+                FROM scans WHERE state = 'pending'
+                ORDER BY scanned_at
+                LIMIT ?
+            """, (batch_size,)).fetchall()
+            if not batch:
+                break
+
+            outcomes = []
+            cur = pg_conn.cursor()
+            for scan_ref, qr_code, staff_id, scanned_at in batch:
+                cur.execute(REPLAY_QUERY, {
+                    'scan_ref': scan_ref,
+                    'qr_code': qr_code,
+                    'staff_id': staff_id,
+                    'scanned_at': scanned_at,
+                })
+                result = cur.fetchone()
+                if not result:
+                    outcomes.append((scan_ref, None, 'conflict', "Booking no longer exists"))
+                    continue
+
+                booking_id, status, checked_in, already_applied = result
+                if checked_in or already_applied:
+                    outcomes.append((scan_ref, booking_id, 'applied', None))
+                else:
+                    outcomes.append((scan_ref, booking_id, 'conflict', f"Booking was {status} when replayed"))
+            cur.close()
+            pg_conn.commit()
+
+            with journal:
+                journal.executemany(
+                    "UPDATE scans SET state = ?, message = ? WHERE scan_ref = ?",
+                    [(state, message, scan_ref) for scan_ref, _, state, message in outcomes],
+                )
+
+            for scan_ref, booking_id, state, _ in outcomes:
+                if state == 'applied':
+                    summary['applied'] += 1
+                    publish(BOOKING_CHECKED_IN, booking_id=booking_id, scan_ref=scan_ref)
+                else:
+                    summary['conflicts'] += 1
+    except psycopg2.Error:
+        pg_conn.rollback()
+    finally:
+        pg_conn.close()
+        journal.close()
+
+    summary['remaining'] = pending_scan_count()
+    return summary
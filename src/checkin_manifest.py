@@ -0,0 +1,150 @@
+import threading
+from datetime import date
+from src.bookings import get_all_bookings, check_in_user, verify_qr_payload, CHECK_IN_REJECTIONS
+from src.events import (
+    subscribe,
+    BOOKING_CREATED,
+    BOOKING_CANCELLED,
+    BOOKING_RESCHEDULED,
+    BOOKING_CHECKED_IN,
+    BOOKING_STATUS_CHANGED,
+    EVENTS_MISSED,
+)
+
+class ManifestEntry:
+    __slots__ = ('booking_id', 'status', 'number_of_players', 'start_time', 'game_name', 'username')
+
+    def __init__(self, booking_id, status, number_of_players, start_time, game_name, username):
+        self.booking_id = booking_id
+        self.status = status
+        self.number_of_players = number_of_players
+        self.start_time = start_time
+        self.game_name = game_name
+        self.username = username
+
+
+class TodayManifest:
+    """
+    In-memory hash index of today's bookings (qr_code -> ManifestEntry).
+    Loaded once per day with get_all_bookings(today) and kept fresh by
+    booking events, so invalid scans are rejected without a DB round trip.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_qr = {}
+        self._qr_by_booking = {}
+        self._loaded_for = None
+        self._stale = True
+        self._loading = False
+
+    def _ensure_loaded(self):
+        today = date.today()
+        with self._lock:
+            if self._loaded_for == today and not self._stale:
+                return
+            self._stale = False
+            self._loading = True
+
+        bookings = get_all_bookings(today)
+        by_qr = {}
+        qr_by_booking = {}
+        for b in bookings:
+            if not b['qr_code']:
+                continue
+            by_qr[b['qr_code']] = ManifestEntry(
+                b['booking_id'], b['status'], b['number_of_players'],
+                b['start_time'], b['game_name'], b['username'],
+            )
+            qr_by_booking[b['booking_id']] = b['qr_code']
+
+        with self._lock:
+            # An event that arrived mid-load set _stale again; keep it set
+            self._loading = False
+            self._by_qr = by_qr
+            self._qr_by_booking = qr_by_booking
+            self._loaded_for = today
+
+    def lookup(self, qr_code):
+        """
+        Returns the ManifestEntry for a code booked today, or None.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_qr.get(qr_code)
+
+    def warm(self):
+        """
+        Loads today's bookings ahead of the first scan. Returns the entry count.
+        """
+        self._ensure_loaded()
+        return len(self)
+
+    def mark_stale(self):
+        with self._lock:
+            self._stale = True
+
+    def set_status(self, booking_id, status):
+        with self._lock:
+            qr_code = self._qr_by_booking.get(booking_id)
+            if qr_code is not None:
+                self._by_qr[qr_code].status = status
+            if self._loading:
+                # The snapshot being loaded may predate this change
+                self._stale = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_qr)
+
+
+_manifest = TodayManifest()
+
+def get_today_manifest():
+    return _manifest
+
+def _on_booking_added(event):
+    # New or moved bookings may land on today; reload on the next scan
+    _manifest.mark_stale()
+
+def _on_booking_status(event):
+    status = {
+        BOOKING_CANCELLED: 'cancelled',
+        BOOKING_CHECKED_IN: 'checked_in',
+    }.get(event.type, event.payload.get('status'))
+    _manifest.set_status(event.payload.get('booking_id'), status)
+
+subscribe(BOOKING_CREATED, _on_booking_added)
+subscribe(BOOKING_RESCHEDULED, _on_booking_added)
+subscribe(EVENTS_MISSED, _on_booking_added)
+subscribe(BOOKING_CANCELLED, _on_booking_status)
+subscribe(BOOKING_CHECKED_IN, _on_booking_status)
+subscribe(BOOKING_STATUS_CHANGED, _on_booking_status)
+
+def validate_scan(qr_code_data):
+    """
+    Checks a scanned code against today's manifest.
+    Returns (is_candidate, message): False means the scan can be rejected
+    without touching the database. Codes not booked for today are passed
+    through so the database stays the authority for other dates.
+    """
+    is_candidate, message = verify_qr_payload(qr_code_data)
+    if not is_candidate:
+        return False, message
+
+    entry = _manifest.lookup(qr_code_data)
+    if entry is None:
+        return True, None
+    if entry.status in CHECK_IN_REJECTIONS:
+        return False, CHECK_IN_REJECTIONS[entry.status]
+    return True, None
+
+def check_in_with_manifest(qr_code_data, staff_id):
+    """
+    check_in_user with invalid, cancelled or already checked-in codes
+    rejected from memory before any database work.
+    """
+    is_candidate, message = validate_scan(qr_code_data)
+    if not is_candidate:
+        return False, message
+    return check_in_user(qr_code_data, staff_id)
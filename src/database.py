@@ -1,7 +1,12 @@
 import psycopg2
+import threading
+import time
 from psycopg2 import OperationalError
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool
 import streamlit as st
 from src.utils import hash_password
+from src.metrics import InstrumentedCursor, count_connection
 
 # Database Configuration
 DB_NAME = "myfunzone"
@@ -10,24 +15,155 @@ DB_PASSWORD = "admin"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
+# Long-lived connections for hot paths (check-in, availability, login)
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+
+# Health checks used to switch the staff scanner to offline mode
+DB_HEALTH_CHECK_SECONDS = 5
+DB_HEALTH_CHECK_TIMEOUT = 2
+
+# Relay write events between worker processes via LISTEN/NOTIFY (src/events.py)
+EVENT_BRIDGE_ENABLED = False
+
+def connect_db(**kwargs):
+    """
+    Opens a new PostgreSQL connection, raising OperationalError on failure.
+    Cursors are instrumented (src/metrics.py) unless a cursor_factory is given.
+    """
+    kwargs.setdefault('cursor_factory', InstrumentedCursor)
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        **kwargs
+    )
+    count_connection()
+    return conn
+
 def get_db_connection():
     """
     Establishes a connection to the PostgreSQL database.
     """
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
+        conn = connect_db()
         return conn
     except OperationalError as e:
         st.error(f"Error connecting to the database: {e}")
         st.stop()
         return None
 
+# Result of the last health check: (checked_at, is_available)
+_db_health = (0.0, True)
+
+def is_database_available(max_age=DB_HEALTH_CHECK_SECONDS):
+    """
+    Returns whether PostgreSQL is reachable, without st.stop() on failure.
+    The answer is reused for max_age seconds so callers can check per scan.
+    """
+    global _db_health
+    checked_at, available = _db_health
+    now = time.monotonic()
+    if now - checked_at < max_age:
+        return available
+
+    try:
+        conn = connect_db(connect_timeout=DB_HEALTH_CHECK_TIMEOUT)
+        conn.close()
+        available = True
+    except OperationalError:
+        available = False
+    _db_health = (now, available)
+    return available
+
+# Fixed hot queries (name -> SQL with $n placeholders), PREPAREd once per
+# pooled connection so PostgreSQL parses and plans them only once.
+_prepared_statements = {}
+
+def prepared_statement(name, sql):
+    """
+    Registers a query for execute_prepared(). Returns its name.
+    """
+    _prepared_statements[name] = sql
+    return name
+
+class PreparingConnection(PgConnection):
+    """
+    Connection class of the pool; remembers which statements it has PREPAREd.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        count_connection()
+
+def execute_prepared(cur, name, params=()):
+    """
+    Runs a registered statement on a pooled connection's cursor, PREPAREing
+    it first if that connection hasn't yet. Prepared statements belong to
+    the session, so they survive commits and rollbacks and live as long as
+    the pooled connection.
+    """
+    prepared = cur.connection.prepared
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS {_prepared_statements[name]}")
+        prepared.add(name)
+
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+
+def get_connection_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    POOL_MIN_CONNECTIONS,
+                    POOL_MAX_CONNECTIONS,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    connection_factory=PreparingConnection,
+                    cursor_factory=InstrumentedCursor
+                )
+    return _pool
+
+def get_pooled_connection():
+    """
+    Borrows a long-lived connection from the pool, waiting if all are in use.
+    Must be handed back with release_connection().
+    """
+    _pool_slots.acquire()
+    try:
+        return get_connection_pool().getconn()
+    except OperationalError as e:
+        _pool_slots.release()
+        st.error(f"Error connecting to the database: {e}")
+        st.stop()
+        return None
+
+def release_connection(conn, close=False):
+    """
+    Returns a pooled connection. Open transactions are rolled back by the pool.
+    """
+    try:
+        get_connection_pool().putconn(conn, close=close or bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
 def init_db():
     """
     Initializes the database tables with the final, consolidated schema.
@@ -167,6 +303,179 @@ def init_db():
             );
         """)
         
+        # Per-announcement read counters, maintained by statement-level triggers
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'announcements' AND column_name = 'read_count'
+        """)
+        if not cur.fetchone():
+            cur.execute("ALTER TABLE announcements ADD COLUMN read_count INTEGER NOT NULL DEFAULT 0")
+            cur.execute("""
+                UPDATE announcements a
+                SET read_count = (
+                    SELECT COUNT(*) FROM announcement_reads ar
+                    WHERE ar.announcement_id = a.announcement_id
+                )
+            """)
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION announcement_reads_added() RETURNS TRIGGER AS $$
+                BEGIN
+                    UPDATE announcements a
+                    SET read_count = a.read_count + n.cnt
+                    FROM (SELECT announcement_id, COUNT(*) AS cnt FROM new_reads GROUP BY announcement_id) n
+                    WHERE a.announcement_id = n.announcement_id;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION announcement_reads_removed() RETURNS TRIGGER AS $$
+                BEGIN
+                    UPDATE announcements a
+                    SET read_count = GREATEST(a.read_count - o.cnt, 0)
+                    FROM (SELECT announcement_id, COUNT(*) AS cnt FROM old_reads GROUP BY announcement_id) o
+                    WHERE a.announcement_id = o.announcement_id;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            cur.execute("""
+                CREATE TRIGGER announcement_reads_count_insert
+                AFTER INSERT ON announcement_reads
+                REFERENCING NEW TABLE AS new_reads
+                FOR EACH STATEMENT EXECUTE FUNCTION announcement_reads_added();
+            """)
+            cur.execute("""
+                CREATE TRIGGER announcement_reads_count_delete
+                AFTER DELETE ON announcement_reads
+                REFERENCING OLD TABLE AS old_reads
+                FOR EACH STATEMENT EXECUTE FUNCTION announcement_reads_removed();
+            """)
+
+        # Expired announcements older than ANNOUNCEMENT_ARCHIVE_DAYS (src/announcements.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS announcements_archive (
+                announcement_id INTEGER PRIMARY KEY,
+                title VARCHAR(200) NOT NULL,
+                content TEXT NOT NULL,
+                target_role VARCHAR(50) NOT NULL,
+                is_pinned BOOLEAN DEFAULT FALSE,
+                expires_at DATE,
+                created_at TIMESTAMP,
+                read_count INTEGER NOT NULL DEFAULT 0,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # Finished bookings past BOOKING_RETENTION_DAYS (src/retention.py).
+        # No foreign keys, so old slots and users can be cleaned up independently.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS bookings_archive (
+                booking_id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                slot_id INTEGER,
+                number_of_players INTEGER NOT NULL,
+                qr_code VARCHAR(255),
+                status VARCHAR(20),
+                booking_time TIMESTAMP,
+                slot_date DATE NOT NULL,
+                start_time TIME,
+                game_id INTEGER,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS slots_archive (
+                slot_id INTEGER PRIMARY KEY,
+                game_id INTEGER,
+                slot_date DATE NOT NULL,
+                start_time TIME NOT NULL,
+                end_time TIME NOT NULL,
+                max_players INTEGER NOT NULL,
+                price DECIMAL(10, 2),
+                is_active BOOLEAN,
+                created_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS payments_archive (
+                payment_id INTEGER PRIMARY KEY,
+                booking_id INTEGER,
+                amount DECIMAL(10, 2) NOT NULL,
+                payment_status VARCHAR(20),
+                payment_method VARCHAR(20),
+                payment_time TIMESTAMP
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS qr_checkins_archive (
+                checkin_id INTEGER PRIMARY KEY,
+                booking_id INTEGER,
+                staff_id INTEGER,
+                checkin_time TIMESTAMP,
+                scan_ref VARCHAR(64)
+            );
+        """)
+
+        # Booked players versus capacity per game, day and start hour,
+        # rebuilt for recent and future days by src/occupancy.py
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS slot_occupancy_daily (
+                game_id INTEGER NOT NULL,
+                slot_date DATE NOT NULL,
+                hour SMALLINT NOT NULL,
+                weekday SMALLINT NOT NULL,
+                slots INTEGER NOT NULL,
+                capacity INTEGER NOT NULL,
+                booked_players INTEGER NOT NULL,
+                bookings INTEGER NOT NULL,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (game_id, slot_date, hour)
+            );
+        """)
+        # Last day up to which the rollup has been rebuilt without gaps, so an
+        # interrupted backfill resumes where it stopped
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS slot_occupancy_progress (
+                id SMALLINT PRIMARY KEY CHECK (id = 1),
+                rebuilt_through DATE NOT NULL
+            );
+        """)
+
+        # Predicted players per game, day and start hour (src/forecasting.py),
+        # replaced by the nightly demand_forecast job
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS demand_forecasts (
+                game_id INTEGER NOT NULL,
+                forecast_date DATE NOT NULL,
+                hour SMALLINT NOT NULL,
+                predicted_players REAL NOT NULL,
+                generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (game_id, forecast_date, hour)
+            );
+        """)
+
+        # Client-generated id of each scan, so offline check-ins replay idempotently
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'qr_checkins' AND column_name = 'scan_ref'
+        """)
+        if not cur.fetchone():
+            cur.execute("ALTER TABLE qr_checkins ADD COLUMN scan_ref VARCHAR(64) UNIQUE")
+
+        # Indexes for read receipts and audience lookups
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_announcement_reads_user ON announcement_reads (user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_announcement_reads_read_at ON announcement_reads (announcement_id, read_at DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_active_role ON users (role, username) WHERE is_active = TRUE")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_announcements_archive_created ON announcements_archive (created_at DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_archive_slot_date ON bookings_archive (slot_date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_archive_user ON bookings_archive (user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_archive_booking ON payments_archive (booking_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_slots_game_date ON slots (game_id, slot_date, start_time)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_slot_occupancy_date ON slot_occupancy_daily (slot_date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_open_slot ON bookings (slot_id) WHERE status IN ('booked', 'checked_in')")
+
         cur.execute("SELECT user_id FROM users WHERE username = %s", ('admin',))
         admin = cur.fetchone()
         if not admin:
@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+import psycopg2
+from psycopg2 import OperationalError
+from src.database import connect_db, EVENT_BRIDGE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Event types emitted by the write functions in src/
+USER_CHANGED = 'user_changed'
+GAME_CHANGED = 'game_changed'
+SLOT_CHANGED = 'slot_changed'
+BOOKING_CREATED = 'booking_created'
+BOOKING_CANCELLED = 'booking_cancelled'
+BOOKING_RESCHEDULED = 'booking_rescheduled'
+BOOKING_CHECKED_IN = 'booking_checked_in'
+BOOKING_STATUS_CHANGED = 'booking_status_changed'
+REVIEW_ADDED = 'review_added'
+ISSUE_REPORTED = 'issue_reported'
+ISSUE_STATUS_CHANGED = 'issue_status_changed'
+ANNOUNCEMENT_CREATED = 'announcement_created'
+ANNOUNCEMENT_READ = 'announcement_read'
+ANNOUNCEMENT_EXPIRED = 'announcement_expired'
+# Dispatched locally (never published) when the bridge reconnects:
+# notifications sent while it was down are lost, so caches must reload
+EVENTS_MISSED = 'events_missed'
+
+ALL_EVENTS = '*'
+
+NOTIFY_CHANNEL = 'myfunzone_events'
+
+# Identifies this process so the bridge can skip its own notifications.
+PROCESS_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class Event:
+    def __init__(self, event_type, payload=None, origin=PROCESS_ID):
+        self.type = event_type
+        self.payload = payload or {}
+        self.origin = origin
+
+    def is_remote(self):
+        return self.origin != PROCESS_ID
+
+    def __repr__(self):
+        return f"Event({self.type!r}, {self.payload!r})"
+
+
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+
+def subscribe(event_type, handler):
+    """
+    Registers handler(event) for an event type, or ALL_EVENTS for every type.
+    Registering the same handler twice is a no-op.
+    """
+    with _subscribers_lock:
+        handlers = _subscribers.setdefault(event_type, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+def unsubscribe(event_type, handler):
+    with _subscribers_lock:
+        handlers = _subscribers.get(event_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+def dispatch(event):
+    """
+    Delivers an event to local subscribers only.
+    A failing handler is logged and never breaks the write that emitted it.
+    """
+    with _subscribers_lock:
+        handlers = list(_subscribers.get(event.type, [])) + list(_subscribers.get(ALL_EVENTS, []))
+    for handler in handlers:
+        try:
+            handler(event)
+        except Exception:
+            logger.exception("Event handler %r failed for %r", handler, event)
+
+def publish(event_type, **payload):
+    """
+    Emits an event to this process and, when the bridge is running,
+    to every other worker through PostgreSQL NOTIFY.
+    """
+    event = Event(event_type, payload)
+    dispatch(event)
+    if _bridge is not None:
+        _bridge.notify(event)
+    return event
+
+
+class PgEventBridge:
+    """
+    Relays events between worker processes with LISTEN/NOTIFY.
+    Uses two dedicated autocommit connections: one blocks on LISTEN in a
+    daemon thread, the other sends notifications from publishing threads.
+    Lost connections are re-opened, the listener with backoff.
+    """
+
+    def __init__(self, channel=NOTIFY_CHANNEL, poll_timeout=5.0, max_backoff=60.0):
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._listen_conn = None
+        self._send_conn = None
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._listen_conn = self._connect_listener()
+        self._send_conn = connect_db()
+        self._send_conn.autocommit = True
+
+        self._thread = threading.Thread(target=self._listen_loop, name="pg-event-bridge", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_timeout + 1)
+        for conn in (self._listen_conn, self._send_conn):
+            self._close(conn)
+
+    def notify(self, event):
+        message = json.dumps(
+            {'origin': event.origin, 'type': event.type, 'payload': event.payload},
+            default=str,
+        )
+        with self._send_lock:
+            try:
+                if self._send_conn is None or self._send_conn.closed:
+                    self._send_conn = connect_db()
+                    self._send_conn.autocommit = True
+                cur = self._send_conn.cursor()
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, message))
+                cur.close()
+            except (OperationalError, psycopg2.InterfaceError):
+                # Reconnect on the next event
+                logger.exception("Could not forward %r to other workers", event)
+                self._close(self._send_conn)
+                self._send_conn = None
+            except psycopg2.Error:
+                logger.exception("Could not forward %r to other workers", event)
+
+    def _connect_listener(self):
+        conn = connect_db()
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {self.channel}")
+        cur.close()
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            if conn is not None and not conn.closed:
+                conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _listen_loop(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                if self._listen_conn is None:
+                    self._listen_conn = self._connect_listener()
+                    backoff = 1.0
+                    logger.info("Event bridge reconnected")
+                    dispatch(Event(EVENTS_MISSED))
+                conn = self._listen_conn
+                if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                conn.poll()
+            except (OperationalError, psycopg2.InterfaceError):
+                logger.exception("Event bridge lost its connection; retrying in %.0fs", backoff)
+                self._close(self._listen_conn)
+                self._listen_conn = None
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            while conn.notifies:
+                notification = conn.notifies.pop(0)
+                try:
+                    data = json.loads(notification.payload)
+                except ValueError:
+                    continue
+                if data.get('origin') == PROCESS_ID:
+                    continue
+                dispatch(Event(data.get('type'), data.get('payload'), origin=data.get('origin')))
+
+
+_bridge = None
+_bridge_lock = threading.Lock()
+
+def start_event_bridge():
+    """
+    Starts the LISTEN/NOTIFY bridge once per process when enabled in
+    src/database.py. Safe to call on every Streamlit rerun.
+    """
+    global _bridge
+    if not EVENT_BRIDGE_ENABLED or _bridge is not None:
+        return _bridge
+    with _bridge_lock:
+        if _bridge is None:
+            bridge = PgEventBridge()
+            try:
+                bridge.start()
+            except OperationalError:
+                logger.exception("Event bridge disabled: could not connect")
+                bridge.stop()
+                return None
+            _bridge = bridge
+    return _bridge
+
+def stop_event_bridge():
+    global _bridge
+    with _bridge_lock:
+        if _bridge is not None:
+            _bridge.stop()
+            _bridge = None
@@ -0,0 +1,211 @@
+import logging
+import math
+from datetime import date, datetime, timedelta
+import numpy as np
+from src.database import connect_db, get_db_connection
+from src.metrics import instrumented
+from src.slots import create_slots_bulk
+
+logger = logging.getLogger(__name__)
+
+FORECAST_HISTORY_WEEKS = 26
+FORECAST_WEEKS = 4
+FORECAST_INTERVAL_SECONDS = 86400
+# Cells (game x weekday x hour) need this many observed weeks to be forecast
+MIN_OBSERVATIONS = 3
+
+# Damped-trend (Holt) smoothing per game x weekday x hour: the weekday and
+# hour index carries the weekly seasonality, the level and trend follow it
+# from week to week.
+ALPHA = 0.3
+BETA = 0.1
+PHI = 0.9
+
+# Suggestions size slots so predicted demand fills this share of them
+TARGET_UTILIZATION = 0.8
+MIN_SUGGESTED_PLAYERS = 1.0
+PLAYER_STEP = 2
+
+CELLS_PER_GAME = 7 * 24
+
+
+def smooth_forecast(history, horizon, alpha=ALPHA, beta=BETA, phi=PHI):
+    """
+    history: (cells, weeks) array of weekly observations, NaN where a cell
+    had no slot that week. Returns ((cells, horizon) forecasts, observed
+    weeks per cell). Every cell is smoothed at once, one step per week.
+    """
+    cells, weeks = history.shape
+    level = np.zeros(cells)
+    trend = np.zeros(cells)
+    started = np.zeros(cells, dtype=bool)
+    for week in range(weeks):
+        y = history[:, week]
+        seen = ~np.isnan(y)
+        prior = level + phi * trend
+        new_level = np.where(started, alpha * y + (1 - alpha) * prior, y)
+        new_trend = np.where(started, beta * (new_level - level) + (1 - beta) * phi * trend, 0.0)
+        level = np.where(seen, new_level, level)
+        trend = np.where(seen, new_trend, trend)
+        started |= seen
+
+    damping = np.cumsum(phi ** np.arange(1, horizon + 1))
+    forecast = np.maximum(level[:, None] + damping[None, :] * trend[:, None], 0.0)
+    return forecast, np.count_nonzero(~np.isnan(history), axis=1)
+
+
+def _load_history(cur, first_day, last_day):
+    """
+    Weekly booked players per game x weekday x hour from the occupancy
+    rollup, as a (games * 168, weeks) array (weeks end on last_day).
+    """
+    cur.execute("""
+        SELECT game_id, slot_date, hour, booked_players
+        FROM slot_occupancy_daily
+        WHERE slot_date BETWEEN %s AND %s
+    """, (first_day, last_day))
+    rows = cur.fetchall()
+    weeks = ((last_day - first_day).days + 1) // 7
+    game_ids = sorted({row[0] for row in rows})
+    if not rows:
+        return game_ids, np.empty((0, weeks))
+
+    game_index = {game_id: i for i, game_id in enumerate(game_ids)}
+    games = np.fromiter((game_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+    offsets = np.fromiter(((row[1] - first_day).days for row in rows), dtype=np.intp, count=len(rows))
+    weekdays = np.fromiter((row[1].weekday() for row in rows), dtype=np.intp, count=len(rows))
+    hours = np.fromiter((row[2] for row in rows), dtype=np.intp, count=len(rows))
+
+    history = np.full((len(game_ids) * CELLS_PER_GAME, weeks), np.nan)
+    history[games * CELLS_PER_GAME + weekdays * 24 + hours, offsets // 7] = [row[3] for row in rows]
+    return game_ids, history
+
+
+@instrumented
+def run_forecast(today=None):
+    """
+    Fits the smoothing model on the last FORECAST_HISTORY_WEEKS weeks of
+    the occupancy rollup and replaces demand_forecasts with predictions
+    for the next FORECAST_WEEKS weeks, for every game at once. Also
+    backtests the previous week. Returns {'games', 'rows', 'mae'}.
+    """
+    today = today or date.today()
+    last_day = today - timedelta(days=1)
+    first_day = today - timedelta(weeks=FORECAST_HISTORY_WEEKS)
+    horizon_days = FORECAST_WEEKS * 7
+
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        game_ids, history = _load_history(cur, first_day, last_day)
+
+        forecast, observed = smooth_forecast(history, FORECAST_WEEKS)
+        # Last week's error when fitting on the weeks before it
+        backtest, trained = smooth_forecast(history[:, :-1], 1)
+        actual = history[:, -1]
+        checked = ~np.isnan(actual) & (trained >= MIN_OBSERVATIONS)
+        mae = float(np.abs(backtest[checked, 0] - actual[checked]).mean()) if checked.any() else None
+
+        # Day i of the horizon falls in forecast week i // 7 and on the
+        # weekday of today + i
+        days = np.arange(horizon_days)
+        weekdays = (today.weekday() + days) % 7
+        game_rows, day_rows, hour_rows = np.meshgrid(
+            np.arange(len(game_ids)), days, np.arange(24), indexing='ij'
+        )
+        cells = game_rows * CELLS_PER_GAME + weekdays[day_rows] * 24 + hour_rows
+        keep = observed[cells] >= MIN_OBSERVATIONS
+        predicted = forecast[cells[keep], day_rows[keep] // 7]
+
+        out_games = np.asarray(game_ids, dtype=np.int64)[game_rows[keep]]
+        out_dates = [today + timedelta(days=int(d)) for d in day_rows[keep]]
+        cur.execute("DELETE FROM demand_forecasts")
+        cur.execute("""
+            INSERT INTO demand_forecasts (game_id, forecast_date, hour, predicted_players)
+            SELECT * FROM unnest(%s::int[], %s::date[], %s::smallint[], %s::real[])
+        """, (out_games.tolist(), out_dates, hour_rows[keep].tolist(), predicted.round(2).tolist()))
+        rows = cur.rowcount
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+    result = {'games': len(game_ids), 'rows': rows, 'mae': round(mae, 2) if mae is not None else None}
+    logger.info("Demand forecast: %s", result)
+    return result
+
+
+@instrumented
+def get_forecast(game_id, start_date, end_date):
+    """
+    Cached predictions for a game, as {(date, hour): players}, plus the
+    time they were generated (None if no forecast exists).
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT forecast_date, hour, predicted_players, generated_at
+            FROM demand_forecasts
+            WHERE game_id = %s AND forecast_date BETWEEN %s AND %s
+        """, (game_id, start_date, end_date))
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+    return {(row[0], row[1]): row[2] for row in rows}, max((row[3] for row in rows), default=None)
+
+@instrumented
+def suggest_slots(game, start_date, end_date, target_utilization=TARGET_UTILIZATION):
+    """
+    Slot suggestions for a game row from its forecast: one slot per day
+    and hour with at least MIN_SUGGESTED_PLAYERS predicted, sized so the
+    prediction fills target_utilization of it, rounded up to PLAYER_STEP.
+    Hours that already have a slot that day are flagged as existing.
+    """
+    predictions, generated_at = get_forecast(game['game_id'], start_date, end_date)
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT DISTINCT slot_date, EXTRACT(HOUR FROM start_time)::int
+            FROM slots
+            WHERE game_id = %s AND slot_date BETWEEN %s AND %s
+        """, (game['game_id'], start_date, end_date))
+        existing = set(cur.fetchall())
+        cur.close()
+    finally:
+        conn.close()
+
+    duration = timedelta(minutes=game.get('duration_minutes') or 60)
+    suggestions = []
+    for (slot_date, hour), players in sorted(predictions.items()):
+        if players < MIN_SUGGESTED_PLAYERS:
+            continue
+        start = datetime.combine(slot_date, datetime.min.time()) + timedelta(hours=hour)
+        max_players = max(PLAYER_STEP, math.ceil(players / target_utilization / PLAYER_STEP) * PLAYER_STEP)
+        suggestions.append({
+            'slot_date': slot_date,
+            'start_time': start.time(),
+            'end_time': (start + duration).time(),
+            'predicted_players': round(players, 1),
+            'max_players': max_players,
+            'exists': (slot_date, hour) in existing,
+        })
+    return suggestions, generated_at
+
+def apply_suggestions(game, suggestions, price=None):
+    """
+    Creates the suggested slots that don't exist yet, all in one
+    create_slots_bulk() statement. Returns (created, errors).
+    """
+    price = float(game['base_price']) if price is None else price
+    new = [
+        (s['slot_date'], s['start_time'], s['end_time'], s['max_players'])
+        for s in suggestions if not s['exists']
+    ]
+    if not new:
+        return 0, []
+    success, msg = create_slots_bulk(game['game_id'], new, price)
+    return (len(new), []) if success else (0, [msg])
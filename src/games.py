@@ -1,6 +1,10 @@
 from src.database import get_db_connection
+from src.metrics import instrumented
+from src.rows import fetch_rows
+from src.events import publish, GAME_CHANGED
 import streamlit as st
 
+@instrumented
 def add_game(name, description, image_url, duration_minutes, base_price, category='General'):
     conn = get_db_connection()
     if not conn:
@@ -13,12 +17,14 @@ def add_game(name, description, image_url, duration_minutes, base_price, categor
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (name, description, image_url, duration_minutes, base_price, category))
         conn.commit()
+        publish(GAME_CHANGED)
         cur.close()
         conn.close()
         return True, "Game added successfully"
     except Exception as e:
         return False, f"Error adding game: {e}"
 
+@instrumented
 def get_all_games(active_only=True, category=None):
     conn = get_db_connection()
     if not conn:
@@ -40,10 +46,7 @@ def get_all_games(active_only=True, category=None):
         
         cur.execute(query, tuple(params))
         
-        games = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            games.append(dict(zip(columns, row)))
+        games = fetch_rows(cur)
             
         cur.close()
         conn.close()
@@ -52,6 +55,7 @@ def get_all_games(active_only=True, category=None):
         st.error(f"Error fetching games: {e}")
         return []
 
+@instrumented
 def update_game(game_id, name, description, image_url, duration_minutes, base_price, is_active, category):
     conn = get_db_connection()
     if not conn:
@@ -65,12 +69,14 @@ def update_game(game_id, name, description, image_url, duration_minutes, base_pr
             WHERE game_id=%s
         """, (name, description, image_url, duration_minutes, base_price, is_active, category, game_id))
         conn.commit()
+        publish(GAME_CHANGED, game_id=game_id)
         cur.close()
         conn.close()
         return True, "Game updated successfully"
     except Exception as e:
         return False, f"Error updating game: {e}"
 
+@instrumented
 def deactivate_game(game_id):
     conn = get_db_connection()
     if not conn:
@@ -80,12 +86,14 @@ def deactivate_game(game_id):
         cur = conn.cursor()
         cur.execute("UPDATE games SET is_active = FALSE WHERE game_id = %s", (game_id,))
         conn.commit()
+        publish(GAME_CHANGED, game_id=game_id)
         cur.close()
         conn.close()
         return True, "Game deactivated successfully"
     except Exception as e:
         return False, f"Error deactivating game: {e}"
 
+@instrumented
 def activate_game(game_id):
     conn = get_db_connection()
     if not conn:
@@ -95,6 +103,7 @@ def activate_game(game_id):
         cur = conn.cursor()
         cur.execute("UPDATE games SET is_active = TRUE WHERE game_id = %s", (game_id,))
         conn.commit()
+        publish(GAME_CHANGED, game_id=game_id)
         cur.close()
         conn.close()
         return True, "Game activated successfully"
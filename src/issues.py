@@ -1,6 +1,11 @@
 from src.database import get_db_connection
+from src.metrics import instrumented
+from src.rows import fetch_rows, stream_rows, STREAM_ITERSIZE
+from src.events import publish, ISSUE_REPORTED, ISSUE_STATUS_CHANGED
 import streamlit as st
+import psycopg2
 
+@instrumented
 def create_issue_report(staff_id, game_id, description):
     conn = get_db_connection()
     if not conn:
@@ -14,12 +19,30 @@ def create_issue_report(staff_id, game_id, description):
         """, (staff_id, game_id, description))
         
         conn.commit()
+        publish(ISSUE_REPORTED, game_id=game_id)
         cur.close()
         conn.close()
         return True, "Issue reported successfully"
     except Exception as e:
         return False, f"Error reporting issue: {e}"
 
+def _issue_reports_query(status_filter=None):
+    query = """
+        SELECT r.*, u.username as staff_name, g.name as game_name
+        FROM issue_reports r
+        JOIN users u ON r.staff_id = u.user_id
+        LEFT JOIN games g ON r.game_id = g.game_id
+    """
+    params = []
+    
+    if status_filter:
+        query += " WHERE r.status = %s"
+        params.append(status_filter)
+        
+    query += " ORDER BY r.reported_at DESC"
+    return query, tuple(params)
+
+@instrumented
 def get_issue_reports(status_filter=None):
     conn = get_db_connection()
     if not conn:
@@ -27,26 +50,9 @@ def get_issue_reports(status_filter=None):
     
     try:
         cur = conn.cursor()
-        query = """
-            SELECT r.*, u.username as staff_name, g.name as game_name
-            FROM issue_reports r
-            JOIN users u ON r.staff_id = u.user_id
-            LEFT JOIN games g ON r.game_id = g.game_id
-        """
-        params = []
+        cur.execute(*_issue_reports_query(status_filter))
         
-        if status_filter:
-            query += " WHERE r.status = %s"
-            params.append(status_filter)
-            
-        query += " ORDER BY r.reported_at DESC"
-        
-        cur.execute(query, tuple(params))
-        
-        reports = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            reports.append(dict(zip(columns, row)))
+        reports = fetch_rows(cur)
             
         cur.close()
         conn.close()
@@ -55,6 +61,18 @@ def get_issue_reports(status_filter=None):
         st.error(f"Error fetching reports: {e}")
         return []
 
+@instrumented
+def iter_issue_reports(status_filter=None, itersize=STREAM_ITERSIZE):
+    """
+    Streaming variant of get_issue_reports on a server-side cursor.
+    """
+    query, params = _issue_reports_query(status_filter)
+    try:
+        yield from stream_rows(get_db_connection, query, params, itersize)
+    except psycopg2.Error as e:
+        st.error(f"Error fetching reports: {e}")
+
+@instrumented
 def update_issue_status(report_id, new_status):
     conn = get_db_connection()
     if not conn:
@@ -67,6 +85,7 @@ def update_issue_status(report_id, new_status):
         """, (new_status, report_id))
         
         conn.commit()
+        publish(ISSUE_STATUS_CHANGED, report_id=report_id, status=new_status)
         cur.close()
         conn.close()
         return True, "Status updated successfully"
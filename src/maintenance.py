@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import psycopg2
+from src.database import connect_db
+from src.metrics import instrumented
+from src.events import publish, BOOKING_STATUS_CHANGED
+
+logger = logging.getLogger(__name__)
+
+# Bookings still 'booked' this long after their slot ended become no-shows
+NO_SHOW_GRACE_MINUTES = 30
+SWEEP_INTERVAL_SECONDS = 300
+SWEEP_BATCH_SIZE = 500
+
+# pg_try_advisory_lock key, so only one worker sweeps at a time
+SWEEPER_LOCK_ID = 0x4D465A01
+
+# (from_status, to_status, extra grace after the slot end)
+SWEEP_TRANSITIONS = (
+    ('booked', 'no_show', timedelta(minutes=NO_SHOW_GRACE_MINUTES)),
+    ('checked_in', 'completed', timedelta(0)),
+)
+
+SWEEP_QUERY = """
+    WITH due AS (
+        SELECT b.booking_id
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.slot_id
+        WHERE b.status = %(from_status)s
+          AND s.slot_date + s.end_time < %(cutoff)s
+        ORDER BY b.booking_id
+        LIMIT %(batch_size)s
+        FOR UPDATE OF b SKIP LOCKED
+    )
+    UPDATE bookings b
+    SET status = %(to_status)s
+    FROM due
+    WHERE b.booking_id = due.booking_id
+    RETURNING b.booking_id
+"""
+
+_sweep_stats = {
+    'runs': 0,
+    'skipped': 0,
+    'last_run': None,
+    'last_duration_ms': None,
+    'last_counts': {},
+    'totals': {},
+    'last_error': None,
+}
+_sweep_stats_lock = threading.Lock()
+
+def get_sweep_stats():
+    """
+    Returns a snapshot of the sweeper metrics of this process.
+    """
+    with _sweep_stats_lock:
+        stats = dict(_sweep_stats)
+        stats['last_counts'] = dict(stats['last_counts'])
+        stats['totals'] = dict(stats['totals'])
+    return stats
+
+def _record_sweep(counts, duration_ms, skipped=False, error=None):
+    with _sweep_stats_lock:
+        if skipped:
+            _sweep_stats['skipped'] += 1
+            return
+        _sweep_stats['runs'] += 1
+        _sweep_stats['last_run'] = datetime.now()
+        _sweep_stats['last_duration_ms'] = duration_ms
+        _sweep_stats['last_counts'] = counts
+        _sweep_stats['last_error'] = error
+        for status, count in counts.items():
+            _sweep_stats['totals'][status] = _sweep_stats['totals'].get(status, 0) + count
+
+@instrumented
+def sweep_bookings(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Moves past bookings to their final status in set-based batches:
+    booked -> no_show after the slot end plus NO_SHOW_GRACE_MINUTES,
+    checked_in -> completed after the slot end.
+    Returns {to_status: count}, or None if another worker holds the lock.
+    """
+    if now is None:
+        now = datetime.now()
+
+    started = time.perf_counter()
+    counts = {to_status: 0 for _, to_status, _ in SWEEP_TRANSITIONS}
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (SWEEPER_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            _record_sweep(counts, 0, skipped=True)
+            return None
+
+        try:
+            for from_status, to_status, grace in SWEEP_TRANSITIONS:
+                params = {
+                    'from_status': from_status,
+                    'to_status': to_status,
+                    'cutoff': now - grace,
+                    'batch_size': batch_size,
+                }
+                while True:
+                    cur.execute(SWEEP_QUERY, params)
+                    booking_ids = [row[0] for row in cur.fetchall()]
+                    conn.commit()
+                    for booking_id in booking_ids:
+                        publish(BOOKING_STATUS_CHANGED, booking_id=booking_id, status=to_status)
+                    counts[to_status] += len(booking_ids)
+                    if len(booking_ids) < batch_size:
+                        break
+        finally:
+            conn.rollback()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (SWEEPER_LOCK_ID,))
+            conn.commit()
+            cur.close()
+    except psycopg2.Error as e:
+        duration_ms = (time.perf_counter() - started) * 1000
+        _record_sweep(counts, duration_ms, error=str(e))
+        raise
+    finally:
+        conn.close()
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    _record_sweep(counts, duration_ms)
+    if any(counts.values()):
+        logger.info("Booking sweep: %s in %.0f ms", counts, duration_ms)
+    return counts
+
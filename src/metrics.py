@@ -0,0 +1,343 @@
+import contextvars
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from psycopg2.extensions import cursor as PgCursor
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Statements slower than this are kept (SQL and parameter shape) for the admin page
+SLOW_QUERY_MS = 200
+SLOW_QUERY_HISTORY = 100
+
+# Directory for Prometheus textfile-collector output (one file per worker);
+# unset disables the export
+METRICS_DIR = os.environ.get("MYFUNZONE_METRICS_DIR", "")
+
+_current_function = contextvars.ContextVar('instrumented_function', default=None)
+_statement_tally = contextvars.ContextVar('statement_tally', default=None)
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'total', 'sum_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, pct):
+        """
+        Upper bound of the bucket holding the pct-th percentile, in ms.
+        """
+        if not self.total:
+            return None
+        rank = pct / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float('inf')
+        return float('inf')
+
+
+class FunctionStats:
+    __slots__ = ('calls', 'errors', 'rows', 'queries', 'query_errors', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.queries = 0
+        self.query_errors = 0
+        self.latency = LatencyHistogram()
+
+
+_stats = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+# Process-wide counters, attributed or not
+_totals = {'connections': 0, 'statements': 0}
+_stats_lock = threading.Lock()
+
+def _function_stats(name):
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats.setdefault(name, FunctionStats())
+    return stats
+
+class StatementTally:
+    __slots__ = ('statements', 'ms')
+
+    def __init__(self):
+        self.statements = 0
+        self.ms = 0.0
+
+
+@contextmanager
+def tally_statements():
+    """
+    Counts the statements (DB round trips) and their time run in the
+    current context, e.g. one Streamlit rerun (see src/profiler.py).
+    """
+    tally = StatementTally()
+    token = _statement_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        _statement_tally.reset(token)
+
+def instrumented(func):
+    """
+    Records call count, latency, errors and rows for a data-access function.
+    Statements run by its cursors are attributed to it (see InstrumentedCursor).
+    Generator functions are recorded when the generator finishes or is
+    closed, with the time spent inside it as latency.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            gen = func(*args, **kwargs)
+            elapsed_ms = 0.0
+            try:
+                while True:
+                    # Only attribute statements while the generator runs,
+                    # not while the caller consumes its rows
+                    token = _current_function.set(name)
+                    t0 = time.perf_counter()
+                    try:
+                        value = next(gen)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed_ms += (time.perf_counter() - t0) * 1000
+                        _current_function.reset(token)
+                    yield value
+            except Exception:
+                with _stats_lock:
+                    _function_stats(name).errors += 1
+                raise
+            finally:
+                token = _current_function.set(name)
+                try:
+                    gen.close()
+                finally:
+                    _current_function.reset(token)
+                with _stats_lock:
+                    stats = _function_stats(name)
+                    stats.calls += 1
+                    stats.latency.observe(elapsed_ms)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_function.set(name)
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with _stats_lock:
+                _function_stats(name).errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            _current_function.reset(token)
+            with _stats_lock:
+                stats = _function_stats(name)
+                stats.calls += 1
+                stats.latency.observe(elapsed_ms)
+
+    return wrapper
+
+
+def _params_shape(params):
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(
+        f"{type(value).__name__}[{len(value)}]" if isinstance(value, (list, tuple)) else type(value).__name__
+        for value in params
+    ) + ")"
+
+def _compact_sql(query):
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    return re.sub(r"\s+", " ", str(query)).strip()[:500]
+
+
+class InstrumentedCursor(PgCursor):
+    """
+    Cursor class of every connection: attributes each statement's rows and
+    errors to the instrumented function running it, and keeps slow ones.
+    Failed statements count as query_errors even when the function handles
+    them; errors counts exceptions that escaped the function.
+    Parameter values are never stored, only their types.
+    """
+
+    def execute(self, query, vars=None):
+        name = _current_function.get()
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception:
+            if name is not None:
+                with _stats_lock:
+                    _function_stats(name).query_errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            tally = _statement_tally.get()
+            if tally is not None:
+                tally.statements += 1
+                tally.ms += elapsed_ms
+            with _stats_lock:
+                _totals['statements'] += 1
+                if name is not None:
+                    stats = _function_stats(name)
+                    stats.queries += 1
+                    if self.rowcount > 0:
+                        stats.rows += self.rowcount
+                if elapsed_ms >= SLOW_QUERY_MS:
+                    _slow_queries.append(_slow_query(name, elapsed_ms, query, vars))
+
+
+def _slow_query(name, elapsed_ms, query, params):
+    return {
+        'at': datetime.now(),
+        'function': name or '-',
+        'duration_ms': round(elapsed_ms, 1),
+        'sql': _compact_sql(query),
+        'params': _params_shape(params),
+    }
+
+def current_function():
+    """
+    Name of the instrumented function running in this context, or None.
+    """
+    return _current_function.get()
+
+def record_stream(name, elapsed_ms, rows, query, params):
+    """
+    Called when a server-side cursor stream ends (see src/rows.py). Its
+    fetches bypass InstrumentedCursor.execute, so the rows it yielded are
+    attributed here, and a stream whose execute and fetch time adds up to
+    SLOW_QUERY_MS is logged here instead.
+    """
+    with _stats_lock:
+        if name is not None:
+            _function_stats(name).rows += rows
+        if elapsed_ms >= SLOW_QUERY_MS:
+            _slow_queries.append(_slow_query(name, elapsed_ms, query, params))
+
+
+def count_connection():
+    """
+    Called for every new database connection (see src/database.py).
+    """
+    with _stats_lock:
+        _totals['connections'] += 1
+
+def get_totals():
+    """
+    Connections opened and statements run by this process so far.
+    """
+    with _stats_lock:
+        return dict(_totals)
+
+def get_function_metrics():
+    """
+    Per-function metrics of this worker, slowest p95 first.
+    """
+    with _stats_lock:
+        metrics = [
+            {
+                'function': name,
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'queries': stats.queries,
+                'query_errors': stats.query_errors,
+                'rows': stats.rows,
+                'p50_ms': stats.latency.percentile(50),
+                'p95_ms': stats.latency.percentile(95),
+                'p99_ms': stats.latency.percentile(99),
+                'avg_ms': round(stats.latency.sum_ms / stats.latency.total, 2) if stats.latency.total else None,
+            }
+            for name, stats in _stats.items()
+        ]
+    return sorted(metrics, key=lambda m: (m['p95_ms'] or 0, m['calls']), reverse=True)
+
+def get_slow_queries():
+    """
+    Recent statements slower than SLOW_QUERY_MS, newest first.
+    """
+    with _stats_lock:
+        return list(reversed(_slow_queries))
+
+def reset_metrics():
+    with _stats_lock:
+        _stats.clear()
+        _slow_queries.clear()
+
+def render_prometheus():
+    """
+    Returns this worker's metrics in the Prometheus text exposition format.
+    """
+    worker = str(os.getpid())
+    lines = [
+        "# HELP myfunzone_function_calls_total Calls of instrumented data-access functions.",
+        "# TYPE myfunzone_function_calls_total counter",
+        "# HELP myfunzone_function_errors_total Calls that raised.",
+        "# TYPE myfunzone_function_errors_total counter",
+        "# HELP myfunzone_function_query_errors_total Failed statements, handled or not.",
+        "# TYPE myfunzone_function_query_errors_total counter",
+        "# HELP myfunzone_function_rows_total Rows returned or affected by the function's statements.",
+        "# TYPE myfunzone_function_rows_total counter",
+        "# HELP myfunzone_function_duration_ms Wall time per call in milliseconds.",
+        "# TYPE myfunzone_function_duration_ms histogram",
+    ]
+    with _stats_lock:
+        for name, stats in sorted(_stats.items()):
+            labels = f'function="{name}",worker="{worker}"'
+            lines.append(f"myfunzone_function_calls_total{{{labels}}} {stats.calls}")
+            lines.append(f"myfunzone_function_errors_total{{{labels}}} {stats.errors}")
+            lines.append(f"myfunzone_function_query_errors_total{{{labels}}} {stats.query_errors}")
+            lines.append(f"myfunzone_function_rows_total{{{labels}}} {stats.rows}")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS, stats.latency.counts):
+                cumulative += count
+                lines.append(f'myfunzone_function_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'myfunzone_function_duration_ms_bucket{{{labels},le="+Inf"}} {stats.latency.total}')
+            lines.append(f"myfunzone_function_duration_ms_sum{{{labels}}} {stats.latency.sum_ms:.3f}")
+            lines.append(f"myfunzone_function_duration_ms_count{{{labels}}} {stats.latency.total}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_file():
+    """
+    Writes render_prometheus() to METRICS_DIR atomically, for the node
+    exporter textfile collector. Returns the number of bytes written.
+    """
+    if not METRICS_DIR:
+        return 0
+    path = os.path.join(METRICS_DIR, f"myfunzone_{os.getpid()}.prom")
+    text = render_prometheus()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return len(text)
@@ -0,0 +1,157 @@
+import logging
+from datetime import date, timedelta
+import numpy as np
+from src.database import connect_db, get_db_connection
+from src.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Past days rebuilt on every refresh, for late status changes (sweeps, check-ins)
+OCCUPANCY_REFRESH_DAYS = 7
+OCCUPANCY_REFRESH_SECONDS = 900
+# Days rebuilt per transaction when backfilling history
+OCCUPANCY_BACKFILL_CHUNK_DAYS = 90
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# One row per game, day and start hour; cancelled bookings don't hold capacity.
+# Archived slots and bookings are included, so old ranges can be rebuilt.
+OCCUPANCY_ROLLUP_QUERY = """
+    WITH window_slots AS (
+        SELECT slot_id, game_id, slot_date, start_time, max_players
+        FROM slots
+        WHERE slot_date BETWEEN %(start)s AND %(end)s
+        UNION ALL
+        SELECT slot_id, game_id, slot_date, start_time, max_players
+        FROM slots_archive
+        WHERE slot_date BETWEEN %(start)s AND %(end)s
+    ), booked AS (
+        SELECT x.slot_id, SUM(x.number_of_players) AS players, COUNT(*) AS bookings
+        FROM (
+            SELECT b.slot_id, b.number_of_players
+            FROM bookings b
+            JOIN window_slots w ON w.slot_id = b.slot_id
+            WHERE b.status != 'cancelled'
+            UNION ALL
+            SELECT a.slot_id, a.number_of_players
+            FROM bookings_archive a
+            WHERE a.slot_date BETWEEN %(start)s AND %(end)s AND a.status != 'cancelled'
+        ) x
+        GROUP BY x.slot_id
+    )
+    INSERT INTO slot_occupancy_daily (game_id, slot_date, hour, weekday, slots, capacity, booked_players, bookings)
+    SELECT w.game_id, w.slot_date,
+           EXTRACT(HOUR FROM w.start_time)::smallint,
+           (EXTRACT(ISODOW FROM w.slot_date) - 1)::smallint,
+           COUNT(*), SUM(w.max_players), COALESCE(SUM(k.players), 0), COALESCE(SUM(k.bookings), 0)
+    FROM window_slots w
+    LEFT JOIN booked k ON k.slot_id = w.slot_id
+    GROUP BY 1, 2, 3, 4
+"""
+
+OCCUPANCY_MATRIX_QUERY = """
+    SELECT o.game_id, g.name, o.weekday, o.hour,
+           SUM(o.booked_players), SUM(o.capacity), MAX(o.refreshed_at)
+    FROM slot_occupancy_daily o
+    LEFT JOIN games g ON g.game_id = o.game_id
+    WHERE o.slot_date BETWEEN %s AND %s
+    GROUP BY o.game_id, g.name, o.weekday, o.hour
+"""
+
+@instrumented
+def refresh_occupancy(start_date=None, end_date=None):
+    """
+    Rebuilds slot_occupancy_daily for [start_date, end_date]. By default
+    that is the last OCCUPANCY_REFRESH_DAYS days plus every future slot,
+    starting earlier if the history has not been rebuilt that far yet:
+    the first run backfills from the earliest slot, and an interrupted
+    backfill resumes after the last committed chunk. Each chunk is
+    replaced in one transaction, so readers never see a partial day.
+    Returns {'days': n, 'rows': m}.
+    """
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT rebuilt_through FROM slot_occupancy_progress WHERE id = 1")
+        row = cur.fetchone()
+        rebuilt_through = row[0] if row else None
+        # Only a rebuild that continues the gapless history may extend it
+        extends_history = start_date is None or (
+            rebuilt_through is not None and start_date <= rebuilt_through + timedelta(days=1)
+        )
+        if start_date is None:
+            if rebuilt_through is not None:
+                start_date = min(rebuilt_through + timedelta(days=1), date.today() - timedelta(days=OCCUPANCY_REFRESH_DAYS))
+            else:
+                cur.execute("SELECT LEAST((SELECT MIN(slot_date) FROM slots), (SELECT MIN(slot_date) FROM slots_archive))")
+                start_date = cur.fetchone()[0] or date.today()
+        if end_date is None:
+            cur.execute("SELECT MAX(slot_date) FROM slots")
+            end_date = max(cur.fetchone()[0] or date.today(), date.today())
+
+        result = {'days': 0, 'rows': 0}
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=OCCUPANCY_BACKFILL_CHUNK_DAYS - 1), end_date)
+            params = {'start': chunk_start, 'end': chunk_end}
+            cur.execute("DELETE FROM slot_occupancy_daily WHERE slot_date BETWEEN %(start)s AND %(end)s", params)
+            cur.execute(OCCUPANCY_ROLLUP_QUERY, params)
+            result['rows'] += cur.rowcount
+            if extends_history:
+                cur.execute("""
+                    INSERT INTO slot_occupancy_progress (id, rebuilt_through) VALUES (1, %(end)s)
+                    ON CONFLICT (id) DO UPDATE
+                    SET rebuilt_through = GREATEST(slot_occupancy_progress.rebuilt_through, EXCLUDED.rebuilt_through)
+                """, params)
+            conn.commit()
+            result['days'] += (chunk_end - chunk_start).days + 1
+            chunk_start = chunk_end + timedelta(days=1)
+        cur.close()
+    finally:
+        conn.close()
+
+    logger.info("Occupancy rollup %s..%s: %s", start_date, end_date, result)
+    return result
+
+@instrumented
+def get_occupancy_matrix(start_date, end_date):
+    """
+    Booked players and capacity per game x weekday (Monday = 0) x start
+    hour for a date range, from the rollup in one query. Returns
+    {'game_ids', 'game_names', 'booked', 'capacity', 'refreshed_at'},
+    booked and capacity being dense (games, 7, 24) arrays.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(OCCUPANCY_MATRIX_QUERY, (start_date, end_date))
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+
+    game_ids = sorted({row[0] for row in rows})
+    game_index = {game_id: i for i, game_id in enumerate(game_ids)}
+    names = {row[0]: row[1] or f"Game {row[0]}" for row in rows}
+    booked = np.zeros((len(game_ids), 7, 24))
+    capacity = np.zeros((len(game_ids), 7, 24))
+    if rows:
+        games = np.fromiter((game_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+        weekdays = np.fromiter((row[2] for row in rows), dtype=np.intp, count=len(rows))
+        hours = np.fromiter((row[3] for row in rows), dtype=np.intp, count=len(rows))
+        booked[games, weekdays, hours] = [row[4] for row in rows]
+        capacity[games, weekdays, hours] = [row[5] for row in rows]
+    return {
+        'game_ids': game_ids,
+        'game_names': [names[game_id] for game_id in game_ids],
+        'booked': booked,
+        'capacity': capacity,
+        'refreshed_at': max((row[6] for row in rows if row[6]), default=None),
+    }
+
+def utilization(booked, capacity):
+    """
+    Element-wise booked / capacity in percent; NaN where there is no capacity.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(capacity > 0, booked / capacity * 100, np.nan)
@@ -0,0 +1,242 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import streamlit as st
+import streamlit.components.v1 as components
+from src.metrics import tally_statements
+
+# Profile every rerun of every session (otherwise admins opt in per session)
+PROFILE_ENABLED = os.environ.get("MYFUNZONE_PROFILE", "") not in ("", "0")
+# If set, each profiled rerun also writes a cProfile dump here
+PROFILE_DUMP_DIR = os.environ.get("MYFUNZONE_PROFILE_DIR", "")
+PROFILE_HISTORY = 20
+# Session state flag toggled from the admin System tab
+PROFILE_SESSION_KEY = 'profile_render'
+
+_active_profile = contextvars.ContextVar('render_profile', default=None)
+_recent_profiles = deque(maxlen=PROFILE_HISTORY)
+_recent_profiles_lock = threading.Lock()
+_emit_hooks_installed = False
+_emit_hooks_lock = threading.Lock()
+# cProfile hooks are interpreter-wide on 3.12+ (sys.monitoring), so only
+# one rerun at a time records a dump; overlapping ones skip it
+_dump_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('name', 'depth', 'start_ms', 'duration_ms', 'statements', 'db_ms', 'html_bytes')
+
+    def __init__(self, name, depth, start_ms):
+        self.name = name
+        self.depth = depth
+        self.start_ms = start_ms
+        self.duration_ms = 0.0
+        self.statements = 0
+        self.db_ms = 0.0
+        self.html_bytes = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RenderProfile:
+    """
+    Timings of one rerun: nested section spans in start order, plus
+    aggregated timers for hot helpers (QR rendering, base64 encoding).
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.at = datetime.now()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.timers = {}
+        self.depth = 0
+        self.html_bytes = 0
+        self.tally = None
+        self.total_ms = 0.0
+        self.dump_path = None
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def add_time(self, name, ms):
+        calls, total = self.timers.get(name, (0, 0.0))
+        self.timers[name] = (calls + 1, total + ms)
+
+    @property
+    def statements(self):
+        return self.tally.statements if self.tally else 0
+
+    @property
+    def db_ms(self):
+        return self.tally.ms if self.tally else 0.0
+
+
+def profiling_enabled():
+    if PROFILE_ENABLED:
+        return True
+    try:
+        return bool(st.session_state.get(PROFILE_SESSION_KEY))
+    except Exception:
+        return False
+
+def _count_emitted(func):
+    @functools.wraps(func)
+    def wrapper(body, *args, **kwargs):
+        profile = _active_profile.get()
+        if profile is not None and isinstance(body, str):
+            profile.html_bytes += len(body.encode())
+        return func(body, *args, **kwargs)
+    return wrapper
+
+def _install_emit_hooks():
+    """
+    Wraps st.markdown, st.html and components.html once per process so
+    profiled reruns can count the HTML/markdown bytes they send. The
+    wrappers only count while a profile is active in the calling context.
+    """
+    global _emit_hooks_installed
+    with _emit_hooks_lock:
+        if _emit_hooks_installed:
+            return
+        st.markdown = _count_emitted(st.markdown)
+        if hasattr(st, 'html'):
+            st.html = _count_emitted(st.html)
+        components.html = _count_emitted(components.html)
+        _emit_hooks_installed = True
+
+@contextmanager
+def profile_rerun(label):
+    """
+    Profiles one rerun when profiling is enabled, yielding the
+    RenderProfile (or None). Finished profiles are kept per process for
+    the admin waterfall.
+    """
+    if not profiling_enabled():
+        yield None
+        return
+
+    _install_emit_hooks()
+    profile = RenderProfile(label)
+    token = _active_profile.set(profile)
+    profiler = None
+    if PROFILE_DUMP_DIR and _dump_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+    try:
+        with tally_statements() as tally:
+            profile.tally = tally
+            if profiler:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Another profiling tool (e.g. a debugger) holds the hooks
+                    profiler = None
+                    _dump_lock.release()
+            try:
+                yield profile
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        _active_profile.reset(token)
+        profile.total_ms = profile.elapsed_ms()
+        if profiler:
+            profile.dump_path = os.path.join(
+                PROFILE_DUMP_DIR, f"rerun_{label}_{profile.at.strftime('%Y%m%d_%H%M%S_%f')}.prof"
+            )
+            try:
+                profiler.dump_stats(profile.dump_path)
+            finally:
+                _dump_lock.release()
+        with _recent_profiles_lock:
+            _recent_profiles.append(profile)
+
+@contextmanager
+def profile_section(name):
+    """
+    Records a span for a dashboard section or tab: wall time, statements
+    and HTML bytes emitted inside it. A no-op outside a profiled rerun.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+
+    span = Span(name, profile.depth, profile.elapsed_ms())
+    profile.spans.append(span)
+    statements, db_ms, html_bytes = profile.statements, profile.db_ms, profile.html_bytes
+    profile.depth += 1
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        span.duration_ms = profile.elapsed_ms() - span.start_ms
+        span.statements = profile.statements - statements
+        span.db_ms = profile.db_ms - db_ms
+        span.html_bytes = profile.html_bytes - html_bytes
+
+def profiled(name):
+    """
+    Decorator adding a helper's calls and time to the active profile's
+    timers. Costs one context variable lookup when not profiling.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _active_profile.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add_time(name, (time.perf_counter() - t0) * 1000)
+        return wrapper
+    return decorator
+
+def get_recent_profiles():
+    """
+    Finished rerun profiles of this worker, newest first.
+    """
+    with _recent_profiles_lock:
+        return list(reversed(_recent_profiles))
+
+def render_waterfall(profile):
+    """
+    Collapsible waterfall of a rerun's sections, for admins.
+    """
+    with st.expander(f"Render profile: {profile.total_ms:.0f} ms, {profile.statements} DB round trips, "
+                     f"{profile.html_bytes / 1024:.1f} KB HTML", expanded=False):
+        scale = max(profile.total_ms, 1.0)
+        st.dataframe(
+            [
+                {
+                    'section': ("  " * span.depth) + span.name,
+                    'start_ms': round(span.start_ms, 1),
+                    'duration_ms': round(span.duration_ms, 1),
+                    'timeline': (" " * int(span.start_ms / scale * 40)) + ("█" * max(int(span.duration_ms / scale * 40), 1)),
+                    'db_round_trips': span.statements,
+                    'db_ms': round(span.db_ms, 1),
+                    'html_kb': round(span.html_bytes / 1024, 1),
+                }
+                for span in profile.spans
+            ],
+            use_container_width=True,
+        )
+        if profile.timers:
+            st.dataframe(
+                [
+                    {'helper': name, 'calls': calls, 'total_ms': round(ms, 1)}
+                    for name, (calls, ms) in sorted(profile.timers.items(), key=lambda item: -item[1][1])
+                ],
+                use_container_width=True,
+            )
+        st.caption(f"DB time {profile.db_ms:.0f} ms of {profile.total_ms:.0f} ms total."
+                   + (f" cProfile dump: {profile.dump_path}" if profile.dump_path else ""))
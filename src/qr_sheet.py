@@ -0,0 +1,137 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import qrcode
+from PIL import Image, ImageDraw
+
+# Below this many codes the pool start-up costs more than it saves
+PARALLEL_THRESHOLD = 24
+
+QR_BOX_SIZE = 8
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+# A4 at 100 dpi
+PAGE_SIZE = (827, 1169)
+PAGE_MARGIN = 40
+LABEL_HEIGHT = 36
+
+POOL_WORKERS = os.cpu_count() or 1
+
+
+def render_qr_png(data, box_size=QR_BOX_SIZE):
+    """
+    Renders one QR code to PNG bytes. Runs inside pool workers, so it
+    only depends on qrcode and Pillow.
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=2,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded Streamlit server is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(shutdown_pool)
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def render_qr_batch(codes, parallel=None):
+    """
+    Renders many QR codes to PNG bytes, in input order.
+    Large batches are spread over a shared process pool.
+    """
+    codes = list(codes)
+    if parallel is None:
+        parallel = len(codes) >= PARALLEL_THRESHOLD and POOL_WORKERS > 1
+    if not parallel:
+        return [render_qr_png(code) for code in codes]
+
+    pool = _get_pool()
+    chunksize = max(1, len(codes) // (POOL_WORKERS * 4))
+    return list(pool.map(render_qr_png, codes, chunksize=chunksize))
+
+
+def _layout_pages(tiles, labels, columns, rows):
+    width, height = PAGE_SIZE
+    cell_w = (width - 2 * PAGE_MARGIN) // columns
+    cell_h = (height - 2 * PAGE_MARGIN) // rows
+    per_page = columns * rows
+
+    pages = []
+    for start in range(0, len(tiles), per_page):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for i, (png, label) in enumerate(zip(tiles[start:start + per_page], labels[start:start + per_page])):
+            tile = Image.open(BytesIO(png)).convert("RGB")
+            side = min(cell_w, cell_h - LABEL_HEIGHT) - 10
+            if tile.width > side:
+                tile = tile.resize((side, side), Image.NEAREST)
+
+            x = PAGE_MARGIN + (i % columns) * cell_w
+            y = PAGE_MARGIN + (i // columns) * cell_h
+            page.paste(tile, (x + (cell_w - tile.width) // 2, y))
+            for line_no, line in enumerate(label.splitlines()[:2]):
+                draw.text((x + 10, y + tile.height + 4 + line_no * 14), line, fill="black")
+        pages.append(page)
+    return pages
+
+def build_qr_sheet(items, fmt="PDF", columns=SHEET_COLUMNS, rows=SHEET_ROWS, parallel=None):
+    """
+    Lays out (qr_code, label) pairs on A4 pages.
+    fmt='PDF' returns a multi-page PDF; fmt='PNG' stacks the pages into
+    one tall image. Returns the file as bytes, or None for no items.
+    """
+    items = list(items)
+    if not items:
+        return None
+
+    tiles = render_qr_batch([code for code, _ in items], parallel=parallel)
+    pages = _layout_pages(tiles, [label for _, label in items], columns, rows)
+
+    buffered = BytesIO()
+    if fmt.upper() == "PDF":
+        pages[0].save(buffered, format="PDF", save_all=True, append_images=pages[1:], resolution=100.0)
+    else:
+        sheet = Image.new("RGB", (PAGE_SIZE[0], PAGE_SIZE[1] * len(pages)), "white")
+        for i, page in enumerate(pages):
+            sheet.paste(page, (0, i * PAGE_SIZE[1]))
+        sheet.save(buffered, format="PNG", optimize=False)
+    return buffered.getvalue()
+
+def booking_qr_items(bookings):
+    """
+    (qr_code, label) pairs for the bookings that still need a QR code.
+    """
+    return [
+        (b['qr_code'], f"#{b['booking_id']} {b['game_name']}\n{b['slot_date']} @ {b['start_time']}")
+        for b in bookings
+        if b['status'] == 'booked' and b['qr_code']
+    ]
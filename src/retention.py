@@ -0,0 +1,130 @@
+import logging
+from datetime import date, timedelta
+from src.database import connect_db
+from src.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Finished bookings whose slot is older than this move to the *_archive tables
+BOOKING_RETENTION_DAYS = 400
+RETENTION_BATCH_SIZE = 1000
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled', 'no_show')
+
+# Children first, so the bookings foreign keys are satisfied at every step
+ARCHIVE_CHECKINS_QUERY = """
+    WITH moved AS (
+        DELETE FROM qr_checkins
+        WHERE booking_id = ANY(%(booking_ids)s)
+        RETURNING checkin_id, booking_id, staff_id, checkin_time, scan_ref
+    )
+    INSERT INTO qr_checkins_archive (checkin_id, booking_id, staff_id, checkin_time, scan_ref)
+    SELECT * FROM moved
+"""
+
+ARCHIVE_PAYMENTS_QUERY = """
+    WITH moved AS (
+        DELETE FROM payments
+        WHERE booking_id = ANY(%(booking_ids)s)
+        RETURNING payment_id, booking_id, amount, payment_status, payment_method, payment_time
+    )
+    INSERT INTO payments_archive (payment_id, booking_id, amount, payment_status, payment_method, payment_time)
+    SELECT * FROM moved
+"""
+
+# Slot date, start time and game are copied in, so archived rows don't
+# depend on the slots table.
+ARCHIVE_BOOKINGS_QUERY = """
+    WITH moved AS (
+        DELETE FROM bookings b
+        USING slots s
+        WHERE b.slot_id = s.slot_id
+          AND b.booking_id = ANY(%(booking_ids)s)
+        RETURNING b.booking_id, b.user_id, b.slot_id, b.number_of_players, b.qr_code, b.status,
+                  b.booking_time, s.slot_date, s.start_time, s.game_id
+    )
+    INSERT INTO bookings_archive (booking_id, user_id, slot_id, number_of_players, qr_code, status,
+                                  booking_time, slot_date, start_time, game_id)
+    SELECT * FROM moved
+"""
+
+# Past slots no hot booking points at any more
+ARCHIVE_SLOTS_QUERY = """
+    WITH moved AS (
+        DELETE FROM slots
+        WHERE slot_id IN (
+            SELECT s.slot_id
+            FROM slots s
+            WHERE s.slot_date < %(horizon)s
+              AND NOT EXISTS (SELECT 1 FROM bookings b WHERE b.slot_id = s.slot_id)
+            ORDER BY s.slot_id
+            LIMIT %(batch_size)s
+        )
+        RETURNING slot_id, game_id, slot_date, start_time, end_time, max_players, price, is_active, created_at
+    )
+    INSERT INTO slots_archive (slot_id, game_id, slot_date, start_time, end_time,
+                               max_players, price, is_active, created_at)
+    SELECT * FROM moved
+"""
+
+def archive_horizon(today=None):
+    """
+    Slot date before which finished bookings live in the archive tables.
+    """
+    return (today or date.today()) - timedelta(days=BOOKING_RETENTION_DAYS)
+
+@instrumented
+def archive_old_bookings(batch_size=RETENTION_BATCH_SIZE):
+    """
+    Moves finished bookings older than BOOKING_RETENTION_DAYS, with their
+    payments and check-ins, from the hot tables to the archive tables.
+    Past slots left without bookings follow, so slots only holds the
+    retention window plus the future. Each batch is one transaction.
+    Returns {'bookings': n, 'payments': m, 'checkins': k, 'slots': s}.
+    """
+    horizon = archive_horizon()
+    result = {'bookings': 0, 'payments': 0, 'checkins': 0, 'slots': 0}
+    conn = connect_db()
+    try:
+        cur = conn.cursor()
+        while True:
+            cur.execute("""
+                SELECT b.booking_id
+                FROM bookings b
+                JOIN slots s ON b.slot_id = s.slot_id
+                WHERE s.slot_date < %s AND b.status IN %s
+                ORDER BY b.booking_id
+                LIMIT %s
+                FOR UPDATE OF b SKIP LOCKED
+            """, (horizon, ARCHIVABLE_STATUSES, batch_size))
+            booking_ids = [row[0] for row in cur.fetchall()]
+            if not booking_ids:
+                conn.rollback()
+                break
+
+            params = {'booking_ids': booking_ids}
+            cur.execute(ARCHIVE_CHECKINS_QUERY, params)
+            result['checkins'] += cur.rowcount
+            cur.execute(ARCHIVE_PAYMENTS_QUERY, params)
+            result['payments'] += cur.rowcount
+            cur.execute(ARCHIVE_BOOKINGS_QUERY, params)
+            result['bookings'] += cur.rowcount
+            conn.commit()
+
+            if len(booking_ids) < batch_size:
+                break
+
+        while True:
+            cur.execute(ARCHIVE_SLOTS_QUERY, {'horizon': horizon, 'batch_size': batch_size})
+            moved = cur.rowcount
+            conn.commit()
+            result['slots'] += moved
+            if moved < batch_size:
+                break
+        cur.close()
+    finally:
+        conn.close()
+
+    if result['bookings'] or result['slots']:
+        logger.info("Archived bookings older than %s: %s", horizon, result)
+    return result
@@ -1,7 +1,11 @@
 
 import streamlit as st
 from src.database import get_db_connection
+from src.metrics import instrumented
+from src.rows import fetch_rows
+from src.events import publish, REVIEW_ADDED
 
+@instrumented
 def add_review(user_id, game_id, booking_id, rating, feedback):
     """
     Adds a new review to the database.
@@ -28,12 +32,14 @@ def add_review(user_id, game_id, booking_id, rating, feedback):
         """, (user_id, game_id, booking_id, rating, feedback))
         
         conn.commit()
+        publish(REVIEW_ADDED, game_id=game_id, booking_id=booking_id, user_id=user_id)
         cur.close()
         conn.close()
         return True, "Review submitted successfully!"
     except Exception as e:
         return False, f"Error submitting review: {e}"
 
+@instrumented
 def get_user_reviews(user_id):
     """
     Fetches all reviews submitted by a specific user.
@@ -52,8 +58,7 @@ def get_user_reviews(user_id):
             ORDER BY r.created_at DESC
         """, (user_id,))
         
-        columns = [desc[0] for desc in cur.description]
-        reviews = [dict(zip(columns, row)) for row in cur.fetchall()]
+        reviews = fetch_rows(cur)
         
         cur.close()
         conn.close()
@@ -62,6 +67,7 @@ def get_user_reviews(user_id):
         st.error(f"Error fetching reviews: {e}")
         return []
 
+@instrumented
 def get_game_reviews(game_id, limit=None, offset=0):
     """
     Fetches reviews for a specific game with optional pagination.
@@ -87,8 +93,7 @@ def get_game_reviews(game_id, limit=None, offset=0):
             
         cur.execute(query, tuple(params))
         
-        columns = [desc[0] for desc in cur.description]
-        reviews = [dict(zip(columns, row)) for row in cur.fetchall()]
+        reviews = fetch_rows(cur)
         
         cur.close()
         conn.close()
@@ -97,6 +102,7 @@ def get_game_reviews(game_id, limit=None, offset=0):
         st.error(f"Error fetching game reviews: {e}")
         return []
 
+@instrumented
 def get_game_rating_stats(game_id):
     """
     Returns the average rating and total review count for a game.
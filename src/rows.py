@@ -0,0 +1,141 @@
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from src.metrics import current_function, record_stream
+
+# Rows fetched per round trip by stream_rows()
+STREAM_ITERSIZE = 2000
+
+# Row class per result shape (tuple of column names)
+_row_classes = {}
+_row_classes_lock = threading.Lock()
+
+
+class Row(Mapping):
+    """
+    Read-only mapping over a database row tuple.
+    Behaves like the dict(zip(columns, row)) it replaces (row['name'],
+    .get(), 'key' in row, dict(row)), but only wraps the tuple psycopg2
+    already returned: the column index is shared by every row of the
+    same shape instead of being rebuilt per row.
+    """
+    __slots__ = ('_values',)
+
+    _shape = ()
+    _columns = ()
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else self._values[index]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+    def __reduce__(self):
+        return (_make_row, (self._shape, self._values))
+
+
+def row_class(columns):
+    """
+    Returns the Row subclass for a tuple of column names, creating it once.
+    Duplicate names resolve to the last column, as with dict(zip(...)).
+    """
+    columns = tuple(columns)
+    cls = _row_classes.get(columns)
+    if cls is None:
+        with _row_classes_lock:
+            cls = _row_classes.get(columns)
+            if cls is None:
+                index = {name: i for i, name in enumerate(columns)}
+                cls = type("Row", (Row,), {
+                    '__slots__': (),
+                    '_shape': columns,
+                    '_columns': tuple(index),
+                    '_index': index,
+                })
+                _row_classes[columns] = cls
+    return cls
+
+def _make_row(columns, values):
+    return row_class(columns)(values)
+
+def _cursor_row_class(cur):
+    return row_class(desc[0] for desc in cur.description)
+
+def fetch_rows(cur):
+    """
+    Fetches the remaining rows of an executed cursor as Row mappings.
+    """
+    cls = _cursor_row_class(cur)
+    return [cls(values) for values in cur.fetchall()]
+
+def fetch_row(cur):
+    """
+    Fetches the next row as a Row mapping, or None.
+    """
+    values = cur.fetchone()
+    if values is None:
+        return None
+    return _cursor_row_class(cur)(values)
+
+def iter_rows(cur):
+    """
+    Lazily yields Row mappings from an executed cursor, one at a time.
+    """
+    cls = _cursor_row_class(cur)
+    for values in cur:
+        yield cls(values)
+
+def stream_rows(connect, query, params=None, itersize=STREAM_ITERSIZE):
+    """
+    Runs a query on a server-side (named) cursor and yields Row mappings,
+    pulling itersize rows per round trip, so memory stays constant
+    however large the result is. connect is called on the first next(),
+    not when the generator is created, and the connection it returns is
+    closed when the generator is exhausted or closed. Rows and the
+    execute and fetch time (not the caller's) are recorded under the
+    instrumented function that started the stream (see record_stream).
+    """
+    name = current_function()
+    elapsed_ms = 0.0
+    count = 0
+    conn = connect()
+    try:
+        t0 = time.perf_counter()
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cur.itersize = itersize
+        cur.execute(query, params)
+        rows = iter(cur)
+        cls = None
+        while True:
+            values = next(rows, None)
+            elapsed_ms += (time.perf_counter() - t0) * 1000
+            if values is None:
+                break
+            if cls is None:
+                # Named cursors only get a description after the first fetch
+                cls = _cursor_row_class(cur)
+            count += 1
+            yield cls(values)
+            t0 = time.perf_counter()
+    finally:
+        # Ends the transaction, which drops the server-side cursor
+        conn.close()
+        record_stream(name, elapsed_ms, count, query, params)
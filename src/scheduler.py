@@ -0,0 +1,315 @@
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import psycopg2
+from src.database import connect_db
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key held by the worker that runs the jobs
+SCHEDULER_LOCK_ID = 0x4D465A00
+SCHEDULER_TICK_SECONDS = 1.0
+LEADER_RETRY_SECONDS = 15
+JOB_HISTORY_LENGTH = 50
+JOB_WORKERS = 4
+
+
+class Job:
+    """
+    A registered periodic task. func() may return a row count or a
+    {label: count} dict, which is recorded with each run.
+    Jobs with leader_only=False (e.g. warming per-process caches) run in
+    every worker.
+    """
+
+    def __init__(self, name, func, interval, jitter=0.0, timeout=60.0, initial_delay=0.0, leader_only=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.next_run = time.monotonic() + initial_delay + random.uniform(0, jitter)
+        self.leader_only = leader_only
+        self.future = None
+        self.started = None
+        self.timed_out = False
+        self.history = deque(maxlen=JOB_HISTORY_LENGTH)
+
+    def schedule_next(self):
+        self.next_run = time.monotonic() + self.interval + random.uniform(0, self.jitter)
+
+
+class JobRun:
+    __slots__ = ('job', 'started_at', 'duration_ms', 'status', 'rows', 'result', 'error')
+
+    def __init__(self, job, started_at, duration_ms, status, result=None, error=None):
+        self.job = job
+        self.started_at = started_at
+        self.duration_ms = duration_ms
+        self.status = status
+        self.result = result
+        self.error = error
+        if isinstance(result, dict):
+            self.rows = sum(v for v in result.values() if isinstance(v, int))
+        elif isinstance(result, int):
+            self.rows = result
+        else:
+            self.rows = None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _call_job(job):
+    started_at = datetime.now()
+    t0 = time.perf_counter()
+    try:
+        result = job.func()
+        status, error = 'ok', None
+    except Exception as e:
+        logger.exception("Job %s failed", job.name)
+        result, status, error = None, 'error', str(e)
+    return JobRun(job.name, started_at, (time.perf_counter() - t0) * 1000, status, result, error)
+
+
+class Scheduler:
+    """
+    In-process scheduler for maintenance jobs.
+    Every worker runs one, but only the worker holding the PostgreSQL
+    advisory lock (the leader) executes leader-only jobs. The lock lives on a
+    dedicated connection, so it moves to another worker if this one dies.
+    """
+
+    def __init__(self, tick=SCHEDULER_TICK_SECONDS):
+        self.tick = tick
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        self._leader_conn = None
+        self._leader_lock = threading.RLock()
+        self._next_leader_attempt = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def register(self, name, func, interval, jitter=0.0, timeout=60.0, initial_delay=0.0, leader_only=True):
+        with self._jobs_lock:
+            self._jobs[name] = Job(name, func, interval, jitter, timeout, initial_delay, leader_only)
+
+    def jobs(self):
+        with self._jobs_lock:
+            return list(self._jobs.values())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.tick + 5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._release_leadership()
+
+    def has_leadership(self):
+        """
+        Whether this worker held the scheduler lock at the last check.
+        Read-only, for the admin view; the scheduler thread re-checks it.
+        """
+        return self._leader_conn is not None
+
+    def is_leader(self):
+        """
+        Returns whether this worker holds the scheduler lock, trying to
+        take it (at most every LEADER_RETRY_SECONDS) if not.
+        """
+        with self._leader_lock:
+            return self._check_leadership()
+
+    def _check_leadership(self):
+        if self._leader_conn is not None:
+            try:
+                cur = self._leader_conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                return True
+            except psycopg2.Error:
+                logger.warning("Scheduler lost its leader connection")
+                self._release_leadership()
+
+        now = time.monotonic()
+        if now < self._next_leader_attempt:
+            return False
+        self._next_leader_attempt = now + LEADER_RETRY_SECONDS
+
+        try:
+            conn = connect_db()
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (SCHEDULER_LOCK_ID,))
+            acquired = cur.fetchone()[0]
+            cur.close()
+        except psycopg2.Error:
+            return False
+        if not acquired:
+            conn.close()
+            return False
+
+        logger.info("Scheduler leadership acquired")
+        self._leader_conn = conn
+        return True
+
+    def _release_leadership(self):
+        with self._leader_lock:
+            conn, self._leader_conn = self._leader_conn, None
+            if conn is not None and not conn.closed:
+                # Closing the session releases the advisory lock
+                conn.close()
+
+    def run_now(self, name):
+        """
+        Runs a job synchronously in the calling thread, regardless of
+        leadership, and records it in the job history. Returns None
+        without running it if the job is already running.
+        """
+        with self._jobs_lock:
+            job = self._jobs[name]
+            if job.future is not None:
+                return None
+            # Placeholder so the scheduler doesn't start an overlapping run
+            job.future = Future()
+            job.started = time.monotonic()
+            job.timed_out = False
+        try:
+            run = _call_job(job)
+        finally:
+            with self._jobs_lock:
+                job.future = None
+        job.history.append(run)
+        return run
+
+    def _collect(self, job):
+        # Manual runs leave a placeholder that never completes
+        if job.future is None or not job.future.done():
+            return
+        run = job.future.result()
+        job.future = None
+        if not job.timed_out:
+            job.history.append(run)
+
+    def _run(self):
+        while not self._stopped.wait(self.tick):
+            is_leader = self.is_leader()
+            now = time.monotonic()
+            for job in self.jobs():
+                with self._jobs_lock:
+                    self._run_job(job, is_leader, now)
+
+    def _run_job(self, job, is_leader, now):
+        # Called with _jobs_lock held, so run_now can't start a run in between
+        self._collect(job)
+        if job.leader_only and not is_leader:
+            return
+        if job.future is not None:
+            # Still running: report a timeout once, never overlap runs
+            if job.started + job.timeout < now and not job.timed_out:
+                job.timed_out = True
+                job.history.append(JobRun(
+                    job.name, datetime.now(), (now - job.started) * 1000, 'timeout',
+                    error=f"Still running after {job.timeout:g}s",
+                ))
+            return
+        if job.next_run <= now:
+            job.started = now
+            job.timed_out = False
+            job.future = self._executor.submit(_call_job, job)
+            job.schedule_next()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    return _scheduler
+
+def start_scheduler():
+    """
+    Creates the process-wide scheduler with the default jobs and starts
+    it once. Safe to call on every Streamlit rerun.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            scheduler = Scheduler()
+            _register_default_jobs(scheduler)
+            scheduler.start()
+            _scheduler = scheduler
+    return _scheduler
+
+def get_job_summaries():
+    """
+    Per-job instrumentation: last run, status, duration and row counts.
+    """
+    if _scheduler is None:
+        return []
+    summaries = []
+    for job in _scheduler.jobs():
+        runs = list(job.history)
+        durations = [run.duration_ms for run in runs if run.status != 'timeout']
+        last = runs[-1] if runs else None
+        summaries.append({
+            'name': job.name,
+            'interval': job.interval,
+            'running': job.future is not None,
+            'runs': len(runs),
+            'failures': sum(1 for run in runs if run.status != 'ok'),
+            'avg_duration_ms': sum(durations) / len(durations) if durations else None,
+            'last_run': last.started_at if last else None,
+            'last_status': last.status if last else None,
+            'last_duration_ms': last.duration_ms if last else None,
+            'last_rows': last.rows if last else None,
+            'last_result': last.result if last else None,
+            'last_error': last.error if last else None,
+        })
+    return summaries
+
+def get_job_history(name):
+    """
+    Recent runs of a job, newest first, as dicts.
+    """
+    if _scheduler is None:
+        return []
+    for job in _scheduler.jobs():
+        if job.name == name:
+            return [run.as_dict() for run in reversed(job.history)]
+    return []
+
+
+def _warm_caches():
+    from src.announcements import get_active_announcements
+    from src.checkin_manifest import get_today_manifest
+
+    announcements = sum(len(get_active_announcements(role)) for role in ('admin', 'staff', 'user'))
+    return {'announcements': announcements, 'manifest': get_today_manifest().warm()}
+
+def _register_default_jobs(scheduler):
+    from src.maintenance import sweep_bookings, SWEEP_INTERVAL_SECONDS
+    from src.announcements import expire_announcements
+    from src.retention import archive_old_bookings
+    from src.occupancy import refresh_occupancy, OCCUPANCY_REFRESH_SECONDS
+    from src.forecasting import run_forecast, FORECAST_INTERVAL_SECONDS
+    from src.metrics import write_prometheus_file, METRICS_DIR
+
+    scheduler.register('booking_sweep', sweep_bookings, SWEEP_INTERVAL_SECONDS, jitter=30, timeout=120)
+    scheduler.register('announcement_expiry', expire_announcements, 3600, jitter=120, timeout=120)
+    scheduler.register('booking_retention', archive_old_bookings, 86400, jitter=600, timeout=1800, initial_delay=300)
+    scheduler.register('occupancy_rollup', refresh_occupancy, OCCUPANCY_REFRESH_SECONDS, jitter=60, timeout=900, initial_delay=60)
+    scheduler.register('demand_forecast', run_forecast, FORECAST_INTERVAL_SECONDS, jitter=600, timeout=1800, initial_delay=600)
+    scheduler.register('cache_warmup', _warm_caches, 600, jitter=60, timeout=60, leader_only=False)
+    if METRICS_DIR:
+        scheduler.register('metrics_export', write_prometheus_file, 15, timeout=10, leader_only=False)
@@ -1,4 +1,5 @@
 import streamlit as st
+from src.cache import clear_session_cache
 
 def init_session():
     """
@@ -30,6 +31,8 @@ def logout_user_session():
     """
     st.session_state.user = None
     st.session_state.page = 'login'
+    clear_session_cache()
+    st.session_state.pop('qr_sheet', None)
     st.rerun()
 
 def get_current_user():
@@ -1,7 +1,11 @@
-from src.database import get_db_connection
+from src.database import get_db_connection, get_pooled_connection, release_connection, prepared_statement, execute_prepared
+from src.metrics import instrumented
+from src.rows import fetch_rows
+from src.events import publish, SLOT_CHANGED
 import streamlit as st
-from datetime import datetime, date, timedelta
+from datetime import date
 
+@instrumented
 def create_slot(game_id, slot_date, start_time, end_time, max_players, price, is_active=True):
     conn = get_db_connection()
     if not conn:
@@ -14,12 +18,14 @@ def create_slot(game_id, slot_date, start_time, end_time, max_players, price, is
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """, (game_id, slot_date, start_time, end_time, max_players, price, is_active))
         conn.commit()
+        publish(SLOT_CHANGED, game_id=game_id, slot_date=slot_date)
         cur.close()
         conn.close()
         return True, "Slot created successfully"
     except Exception as e:
         return False, f"Error creating slot: {e}"
 
+@instrumented
 def create_slots_range(game_id, start_date, end_date, start_time, end_time, max_players, price, is_active=True):
     if start_date > end_date:
         return False, "Start date cannot be after end date"
@@ -31,19 +37,16 @@ def create_slots_range(game_id, start_date, end_date, start_time, end_time, max_
     try:
         cur = conn.cursor()
         
-        # Calculate number of days
-        delta = end_date - start_date
-        
-        created_count = 0
-        for i in range(delta.days + 1):
-            current_date = start_date + timedelta(days=i)
-            cur.execute("""
-                INSERT INTO slots (game_id, slot_date, start_time, end_time, max_players, price, is_active)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (game_id, current_date, start_time, end_time, max_players, price, is_active))
-            created_count += 1
+        # One slot per day in a single statement
+        cur.execute("""
+            INSERT INTO slots (game_id, slot_date, start_time, end_time, max_players, price, is_active)
+            SELECT %s, day::date, %s, %s, %s, %s, %s
+            FROM generate_series(%s::date, %s::date, INTERVAL '1 day') AS day
+        """, (game_id, start_time, end_time, max_players, price, is_active, start_date, end_date))
+        created_count = cur.rowcount
             
         conn.commit()
+        publish(SLOT_CHANGED, game_id=game_id, start_date=start_date, end_date=end_date)
         cur.close()
         conn.close()
         return True, f"Successfully created {created_count} slots from {start_date} to {end_date}"
@@ -52,7 +55,45 @@ def create_slots_range(game_id, start_date, end_date, start_time, end_time, max_
             conn.rollback()
         return False, f"Error creating slots: {e}"
 
-def get_slots_by_game(game_id, date_filter=None):
+@instrumented
+def create_slots_bulk(game_id, slots, price, is_active=True):
+    """
+    Creates a game's slots from (slot_date, start_time, end_time,
+    max_players) tuples in a single statement and transaction.
+    """
+    if not slots:
+        return False, "No slots to create"
+
+    conn = get_db_connection()
+    if not conn:
+        return False, "Database connection failed"
+
+    slot_dates, start_times, end_times, max_players = (list(column) for column in zip(*slots))
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO slots (game_id, slot_date, start_time, end_time, max_players, price, is_active)
+            SELECT %s, s.slot_date, s.start_time, s.end_time, s.max_players, %s, %s
+            FROM unnest(%s::date[], %s::time[], %s::time[], %s::int[]) AS s(slot_date, start_time, end_time, max_players)
+        """, (game_id, price, is_active, slot_dates, start_times, end_times, max_players))
+        created_count = cur.rowcount
+
+        conn.commit()
+        publish(SLOT_CHANGED, game_id=game_id, start_date=min(slot_dates), end_date=max(slot_dates))
+        cur.close()
+        conn.close()
+        return True, f"Successfully created {created_count} slots"
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        return False, f"Error creating slots: {e}"
+
+@instrumented
+def get_slots_by_game(game_id, date_filter=None, include_past=False, active_only=False):
+    """
+    Slots of a game, for one date if date_filter is given, otherwise from
+    today onwards (or every slot ever created with include_past=True).
+    """
     conn = get_db_connection()
     if not conn:
         return []
@@ -65,15 +106,17 @@ def get_slots_by_game(game_id, date_filter=None):
         if date_filter:
             query += " AND slot_date = %s"
             params.append(date_filter)
+        elif not include_past:
+            query += " AND slot_date >= CURRENT_DATE"
+
+        if active_only:
+            query += " AND is_active = TRUE"
             
         query += " ORDER BY slot_date, start_time"
         
         cur.execute(query, tuple(params))
         
-        slots = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            slots.append(dict(zip(columns, row)))
+        slots = fetch_rows(cur)
             
         cur.close()
         conn.close()
@@ -82,11 +125,28 @@ def get_slots_by_game(game_id, date_filter=None):
         st.error(f"Error fetching slots: {e}")
         return []
 
+# Active slots of a game on a date with their free spots ($3: include full slots).
+# Columns are listed explicitly: a prepared SELECT * breaks when the table changes.
+AVAILABLE_SLOTS_STATEMENT = prepared_statement('available_slots', """
+    SELECT s.slot_id, s.game_id, s.slot_date, s.start_time, s.end_time,
+           s.max_players, s.price, s.is_active, s.created_at,
+           (s.max_players - COALESCE(SUM(b.number_of_players), 0)) as available_spots
+    FROM slots s
+    LEFT JOIN bookings b ON s.slot_id = b.slot_id AND b.status IN ('booked', 'checked_in')
+    WHERE s.game_id = $1
+      AND s.slot_date = $2
+      AND s.is_active = TRUE
+    GROUP BY s.slot_id
+    HAVING $3 OR (s.max_players - COALESCE(SUM(b.number_of_players), 0)) > 0
+    ORDER BY s.start_time
+""")
+
+@instrumented
 def get_available_slots(game_id, target_date=None, include_full=False):
     if target_date is None:
         target_date = date.today()
         
-    conn = get_db_connection()
+    conn = get_pooled_connection()
     if not conn:
         return []
     
@@ -94,36 +154,20 @@ def get_available_slots(game_id, target_date=None, include_full=False):
         cur = conn.cursor()
         # Get slots that are active and have available space
         # Need to join with bookings to count current bookings
-        query = """
-            SELECT s.*, 
-                   (s.max_players - COALESCE(SUM(b.number_of_players), 0)) as available_spots
-            FROM slots s
-            LEFT JOIN bookings b ON s.slot_id = b.slot_id AND b.status IN ('booked', 'checked_in')
-            WHERE s.game_id = %s 
-              AND s.slot_date = %s 
-              AND s.is_active = TRUE
-            GROUP BY s.slot_id
-        """
+        execute_prepared(cur, AVAILABLE_SLOTS_STATEMENT, (game_id, target_date, include_full))
         
-        if not include_full:
-            query += " HAVING (s.max_players - COALESCE(SUM(b.number_of_players), 0)) > 0"
-            
-        query += " ORDER BY s.start_time"
-        
-        cur.execute(query, (game_id, target_date))
-        
-        slots = []
-        columns = [desc[0] for desc in cur.description]
-        for row in cur.fetchall():
-            slots.append(dict(zip(columns, row)))
+        slots = fetch_rows(cur)
             
         cur.close()
-        conn.close()
+        conn.commit()
         return slots
     except Exception as e:
         st.error(f"Error fetching available slots: {e}")
         return []
+    finally:
+        release_connection(conn)
 
+@instrumented
 def delete_slot(slot_id):
     conn = get_db_connection()
     if not conn:
@@ -133,12 +177,14 @@ def delete_slot(slot_id):
         cur = conn.cursor()
         cur.execute("DELETE FROM slots WHERE slot_id = %s", (slot_id,))
         conn.commit()
+        publish(SLOT_CHANGED, slot_id=slot_id)
         cur.close()
         conn.close()
         return True, "Slot deleted successfully"
     except Exception as e:
         return False, f"Error deleting slot: {e}"
 
+@instrumented
 def toggle_slot_active(slot_id, is_active):
     conn = get_db_connection()
     if not conn:
@@ -148,6 +194,7 @@ def toggle_slot_active(slot_id, is_active):
         cur = conn.cursor()
         cur.execute("UPDATE slots SET is_active = %s WHERE slot_id = %s", (is_active, slot_id))
         conn.commit()
+        publish(SLOT_CHANGED, slot_id=slot_id, is_active=is_active)
         cur.close()
         conn.close()
         return True, "Slot status updated successfully"
@@ -1,6 +1,7 @@
 import bcrypt
 import re
 import base64
+from src.profiler import profiled
 
 class LinkedListNode:
     def __init__(self, value, next_node=None):
@@ -103,6 +104,7 @@ class Queue:
         return len(self._items) - self._front_index
 
 
+@profiled("base64 encode")
 def get_base64_of_bin_file(bin_file):
     with open(bin_file, 'rb') as f:
         data = f.read()
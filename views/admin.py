@@ -1,14 +1,23 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import os
+import numpy as np
+import pandas as pd
+import altair as alt
 from src.games import add_game, get_all_games, update_game, deactivate_game, activate_game
 from src.slots import create_slot, create_slots_range, get_slots_by_game, delete_slot, toggle_slot_active, get_available_slots
-from src.bookings import get_all_bookings, cancel_booking, reschedule_booking, get_revenue_stats, get_cancellation_stats, get_active_users_count, get_peak_hour_insights
+from src.bookings import get_all_bookings, export_bookings_csv, cancel_booking, reschedule_booking
+from src.analytics import summarize, ROLLING_WINDOW_DAYS
+from src.occupancy import get_occupancy_matrix, utilization, WEEKDAYS
+from src.forecasting import suggest_slots, apply_suggestions, TARGET_UTILIZATION
 from src.session import logout_user_session
 from src.issues import get_issue_reports, update_issue_status
 from src.auth import add_staff_member
 from src.reviews import get_game_reviews, get_game_rating_stats
-from src.announcements import create_announcement, get_all_announcements, get_announcement_read_stats
+from src.announcements import create_announcement, get_all_announcements, get_active_user_counts, get_announcement_read_counts, get_announcement_readers, get_announcement_non_readers, get_archived_announcements, count_archived_announcements
+from src.scheduler import get_scheduler, get_job_summaries, get_job_history
+from src.profiler import profile_section, get_recent_profiles, render_waterfall, PROFILE_SESSION_KEY
+from src.metrics import get_function_metrics, get_slow_queries, reset_metrics, render_prometheus, SLOW_QUERY_MS
 from src.utils import get_base64_of_bin_file, parse_image_urls, render_footer
 from datetime import datetime, time, date, timedelta
 import random
@@ -27,6 +36,26 @@ def generate_temp_password(length=10):
     random.shuffle(password)
     return "".join(password)
 
+def page_offset(key, total, page_size=20):
+    """
+    Renders Prev/Next controls for a list of total rows and returns the
+    offset of the page kept under key in session state.
+    """
+    pages = max(1, -(-total // page_size))
+    page = min(st.session_state.get(key, 0), pages - 1)
+    if pages > 1:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("Prev", key=f"{key}_prev", disabled=page == 0):
+                page -= 1
+        with col_next:
+            if st.button("Next", key=f"{key}_next", disabled=page == pages - 1):
+                page += 1
+        with col_page:
+            st.caption(f"Page {page + 1} of {pages}")
+    st.session_state[key] = page
+    return page * page_size
+
 def show_admin_dashboard():
     col1, col2 = st.columns([5, 1])
     with col1:
@@ -35,9 +64,9 @@ def show_admin_dashboard():
         if st.button("Logout"):
             logout_user_session()
     
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Manage Games", "Manage Slots", "View Bookings", "Analytics", "Issue Reports", "Manage Staff", "Announcements"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs(["Manage Games", "Manage Slots", "View Bookings", "Analytics", "Issue Reports", "Manage Staff", "Announcements", "System", "Metrics"])
 
-    with tab7:
+    with tab7, profile_section("Announcements"):
         st.header("📢 Announcements Management")
         
         # Create Announcement
@@ -70,6 +99,7 @@ def show_admin_dashboard():
         
         announcements = get_all_announcements()
         if announcements:
+            active_user_counts = get_active_user_counts()
             for ann in announcements:
                 status_icon = "🟢" if ann['is_active'] else "🔴"
                 pinned_icon = "📌" if ann['is_pinned'] else ""
@@ -83,26 +113,48 @@ def show_admin_dashboard():
                     
                     
                     st.subheader("📊 Read Statistics")
-                    stats = get_announcement_read_stats(ann['announcement_id'])
+                    counts = get_announcement_read_counts(ann, active_user_counts)
                     
                     s_col1, s_col2 = st.columns(2)
                     with s_col1:
-                        st.metric("Read Count", len(stats['read']))
-                        if stats['read']:
-                            with st.popover("View Readers"):
-                                for reader in stats['read']:
-                                    st.write(f"✅ {reader['username']} ({reader['role']}) - {reader['read_at'].strftime('%Y-%m-%d %H:%M')}")
+                        st.metric("Read Count", counts['read'])
+                        if counts['read'] and st.checkbox("View Readers", key=f"show_readers_{ann['announcement_id']}"):
+                            offset = page_offset(f"readers_page_{ann['announcement_id']}", counts['read'])
+                            readers = get_announcement_readers(ann['announcement_id'], limit=20, offset=offset)
+                            for reader in readers:
+                                st.write(f"✅ {reader['username']} ({reader['role']}) - {reader['read_at'].strftime('%Y-%m-%d %H:%M')}")
                     
                     with s_col2:
-                        st.metric("Unread Count", len(stats['unread']))
-                        if stats['unread']:
-                            with st.popover("View Pending"):
-                                for unreader in stats['unread']:
-                                    st.write(f"⏳ {unreader['username']} ({unreader['role']})")
+                        st.metric("Unread Count", counts['unread'])
+                        if counts['unread'] and st.checkbox("View Pending", key=f"show_pending_{ann['announcement_id']}"):
+                            offset = page_offset(f"pending_page_{ann['announcement_id']}", counts['unread'])
+                            pending = get_announcement_non_readers(ann['announcement_id'], ann['target_role'], limit=20, offset=offset)
+                            for unreader in pending:
+                                st.write(f"⏳ {unreader['username']} ({unreader['role']})")
         else:
             st.info("No announcements created yet.")
 
-    with tab1:
+        st.divider()
+        if st.checkbox("View Archived Announcements", key="show_announcement_archive"):
+            archived_total = count_archived_announcements()
+            if archived_total:
+                if 'archive_limit' not in st.session_state:
+                    st.session_state.archive_limit = 20
+                for ann in get_archived_announcements(limit=st.session_state.archive_limit):
+                    with st.expander(f"🗄️ {ann['title']} (Target: {ann['target_role'].upper()})"):
+                        st.write(f"**Created:** {ann['created_at'].strftime('%Y-%m-%d %H:%M')}")
+                        if ann['expires_at']:
+                            st.write(f"**Expired:** {ann['expires_at']}")
+                        st.write(f"**Read Count:** {ann['read_count']}")
+                        st.info(ann['content'])
+                if archived_total > st.session_state.archive_limit:
+                    if st.button("Show More", key="more_archive"):
+                        st.session_state.archive_limit += 20
+                        st.rerun()
+            else:
+                st.info("No archived announcements.")
+
+    with tab1, profile_section("Manage Games"):
         st.header("Manage Games")
         
         with st.expander("Add New Game"):
@@ -301,7 +353,7 @@ def show_admin_dashboard():
                 else:
                     st.info("No reviews yet.")
 
-    with tab2:
+    with tab2, profile_section("Manage Slots"):
         st.header("Manage Slots")
         
         games = get_all_games(active_only=True)
@@ -348,16 +400,61 @@ def show_admin_dashboard():
                             st.success(msg)
                         else:
                             st.error(msg)
+
+            # Slots proposed from the nightly demand forecast
+            with st.expander("Suggested Slots (demand forecast)"):
+                col_s1, col_s2, col_s3 = st.columns(3)
+                with col_s1:
+                    suggest_from = st.date_input("From", value=date.today(), min_value=date.today(), key="suggest_from")
+                with col_s2:
+                    suggest_to = st.date_input("To", value=date.today() + timedelta(days=13), min_value=date.today(), key="suggest_to")
+                with col_s3:
+                    target = st.slider("Target Utilization %", 50, 100, int(TARGET_UTILIZATION * 100), step=5, key="suggest_target")
+
+                # Computed on request only and kept for the inputs they were made for
+                suggestion_key = (selected_game_id, suggest_from, suggest_to, target)
+                if st.button("Preview Suggestions", key="preview_suggestions"):
+                    st.session_state.slot_suggestions = (suggestion_key, suggest_slots(selected_game, suggest_from, suggest_to, target / 100))
+                previewed = st.session_state.get('slot_suggestions')
+                if previewed and previewed[0] == suggestion_key:
+                    suggestions, generated_at = previewed[1]
+                    if generated_at is None:
+                        st.info("No forecast for this game yet. It is generated nightly from the occupancy rollup.")
+                    elif not suggestions:
+                        st.info("No demand predicted in this range.")
+                    else:
+                        st.caption(f"Forecast generated {generated_at.strftime('%Y-%m-%d %H:%M')}")
+                        st.dataframe(pd.DataFrame([{
+                            'Date': s['slot_date'],
+                            'Time': f"{s['start_time'].strftime('%H:%M')} - {s['end_time'].strftime('%H:%M')}",
+                            'Predicted Players': s['predicted_players'],
+                            'Max Players': s['max_players'],
+                            'Status': "Exists" if s['exists'] else "New",
+                        } for s in suggestions]), hide_index=True, use_container_width=True)
+
+                        new_count = sum(1 for s in suggestions if not s['exists'])
+                        if st.button(f"Create {new_count} Suggested Slots", disabled=not new_count, key="create_suggested"):
+                            created, errors = apply_suggestions(selected_game, suggestions)
+                            for error in errors:
+                                st.error(error)
+                            if created:
+                                # The preview is outdated once its slots exist
+                                del st.session_state.slot_suggestions
+                                st.success(f"Created {created} slots")
+                                st.rerun()
             
             # List Existing Slots
             st.subheader("Existing Slots")
             
             use_date_filter = st.checkbox("Filter by Date", value=False, key="use_slot_filter")
             filter_date = None
+            include_past = False
             if use_date_filter:
                 filter_date = st.date_input("Select Date", value=date.today(), key="slot_filter_date")
+            else:
+                include_past = st.checkbox("Include past slots", value=False, key="include_past_slots")
             
-            slots = get_slots_by_game(selected_game_id, filter_date)
+            slots = get_slots_by_game(selected_game_id, filter_date, include_past=include_past)
             
             if slots:
                 for slot in slots:
@@ -381,7 +478,7 @@ def show_admin_dashboard():
             else:
                 st.info("No slots found.")
 
-    with tab3:
+    with tab3, profile_section("View Bookings"):
         st.header("All Bookings")
         
         use_booking_filter = st.checkbox("Filter by Date Range", value=False, key="use_booking_filter")
@@ -395,6 +492,26 @@ def show_admin_dashboard():
             with col_f2:
                 end_date_filter = st.date_input("End Date", value=date.today(), key="booking_filter_end")
             
+        if st.button("Prepare CSV Export", key="prepare_bookings_export"):
+            # Session state keeps only the temp file path; drop the previous file
+            previous_export = st.session_state.pop('bookings_export', None)
+            if previous_export and os.path.exists(previous_export[1]):
+                os.remove(previous_export[1])
+            export_path = export_bookings_csv(start_date_filter, end_date_filter)
+            if export_path:
+                st.session_state.bookings_export = ((start_date_filter, end_date_filter), export_path)
+        # Only offer an export prepared for the current filters
+        prepared_export = st.session_state.get('bookings_export')
+        if prepared_export and prepared_export[0] == (start_date_filter, end_date_filter) and os.path.exists(prepared_export[1]):
+            with open(prepared_export[1], "rb") as export_file:
+                st.download_button(
+                    label="Download Bookings CSV",
+                    data=export_file,
+                    file_name=f"bookings_{start_date_filter or 'all'}_{end_date_filter or 'all'}.csv",
+                    mime="text/csv",
+                    key="bookings_export_download"
+                )
+
         bookings = get_all_bookings(start_date_filter, end_date_filter)
         
         if bookings:
@@ -447,7 +564,7 @@ def show_admin_dashboard():
                             else:
                                 st.warning("No slots available on this date.") 
 
-    with tab4: 
+    with tab4, profile_section("Analytics"): 
         st.header("Analytics & Reports")
         
         col_a1, col_a2 = st.columns(2)
@@ -459,22 +576,21 @@ def show_admin_dashboard():
         if start_date_analytics > end_date_analytics:
             st.error("Start date must be before end date")
         else:
-            # Fetch Data
-            revenue_data = get_revenue_stats(start_date_analytics, end_date_analytics)
-            cancel_data = get_cancellation_stats(start_date_analytics, end_date_analytics)
-            active_users = get_active_users_count(start_date_analytics, end_date_analytics)
-            peak_hours = get_peak_hour_insights(start_date_analytics, end_date_analytics)
+            # Aggregated from the cached columnar facts (src/analytics.py)
+            analytics = summarize(start_date_analytics, end_date_analytics)
             
             # Key Metrics
-            m1, m2, m3, m4 = st.columns(4)
+            m1, m2, m3, m4, m5 = st.columns(5)
             with m1:
-                st.metric("Total Revenue", f"₹{revenue_data['total_revenue']:,.2f}")
+                st.metric("Total Revenue", f"₹{analytics['total_revenue']:,.2f}")
             with m2:
-                st.metric("Total Bookings", cancel_data['total_bookings'])
+                st.metric("Total Bookings", analytics['total_bookings'])
             with m3:
-                st.metric("Active Users", active_users)
+                st.metric("Active Users", analytics['active_users'])
             with m4:
-                st.metric("Cancellation Rate", f"{cancel_data['cancellation_rate']}%")
+                st.metric("Cancellation Rate", f"{analytics['cancellation_rate']}%")
+            with m5:
+                st.metric("Utilization", f"{analytics['utilization']}%")
                 
             st.markdown("---")
             
@@ -483,29 +599,83 @@ def show_admin_dashboard():
             with col_chart1:
                 # Revenue Chart
                 st.subheader("Revenue Over Time")
-                if revenue_data['daily_revenue']:
-                    chart_data = {item['date']: item['revenue'] for item in revenue_data['daily_revenue']}
-                    st.bar_chart(chart_data)
+                if analytics['total_revenue']:
+                    daily = analytics['daily_revenue']
+                    st.line_chart(pd.DataFrame(
+                        {'Revenue': daily['revenue'], f'{ROLLING_WINDOW_DAYS}-day average': daily['rolling']},
+                        index=pd.Index(daily['date'], name='date'),
+                    ))
                 else:
                     st.info("No revenue data for this period.")
             
             with col_chart2:
                 # Peak Hours Chart
                 st.subheader("Peak Booking Hours")
-                if peak_hours:
+                if analytics['peak_hours']:
                     # Format for chart: {Hour: Count}
-                    peak_data = {f"{item['hour']:02d}:00": item['count'] for item in peak_hours}
+                    peak_data = {f"{item['hour']:02d}:00": item['count'] for item in analytics['peak_hours']}
                     st.bar_chart(peak_data)
                 else:
                     st.info("No peak hour data available.")
+
+            col_chart3, col_chart4 = st.columns(2)
+
+            with col_chart3:
+                st.subheader("Revenue by Game")
+                if analytics['revenue_by_game']:
+                    st.bar_chart(analytics['revenue_by_game'])
+                else:
+                    st.info("No revenue data for this period.")
+
+            with col_chart4:
+                st.subheader("Utilization by Game (%)")
+                if analytics['utilization_by_game']:
+                    st.bar_chart(analytics['utilization_by_game'])
+                else:
+                    st.info("No slots in this period.")
                 
             # Cancellation Details
             st.markdown("---")
             st.subheader("Cancellation Summary")
-            st.write(f"**Cancelled Bookings:** {cancel_data['cancelled_bookings']}")
-            st.write(f"**Total Bookings:** {cancel_data['total_bookings']}")
+            st.write(f"**Cancelled Bookings:** {analytics['cancelled_bookings']}")
+            st.write(f"**Total Bookings:** {analytics['total_bookings']}")
 
-    with tab5:
+            # Occupancy Heatmap (from the slot_occupancy_daily rollup)
+            st.markdown("---")
+            st.subheader("Occupancy Heatmap")
+            occupancy = get_occupancy_matrix(start_date_analytics, end_date_analytics)
+            if occupancy['game_ids']:
+                heatmap_game = st.selectbox("Game", ["All Games"] + occupancy['game_names'], key="heatmap_game")
+                if heatmap_game == "All Games":
+                    booked, capacity = occupancy['booked'].sum(axis=0), occupancy['capacity'].sum(axis=0)
+                else:
+                    game_index = occupancy['game_names'].index(heatmap_game)
+                    booked, capacity = occupancy['booked'][game_index], occupancy['capacity'][game_index]
+
+                weekdays, hours = np.nonzero(capacity)
+                util = utilization(booked, capacity)
+                heatmap_data = pd.DataFrame({
+                    'Weekday': [WEEKDAYS[d] for d in weekdays],
+                    'Hour': [f"{h:02d}:00" for h in hours],
+                    'Utilization %': np.round(util[weekdays, hours], 1),
+                    'Booked': booked[weekdays, hours].astype(int),
+                    'Capacity': capacity[weekdays, hours].astype(int),
+                })
+                st.altair_chart(
+                    alt.Chart(heatmap_data).mark_rect().encode(
+                        x=alt.X('Hour:O', title="Start Hour"),
+                        y=alt.Y('Weekday:O', sort=list(WEEKDAYS), title=None),
+                        color=alt.Color('Utilization %:Q', scale=alt.Scale(scheme='redyellowgreen', domain=[0, 100])),
+                        tooltip=['Weekday', 'Hour', 'Utilization %', 'Booked', 'Capacity'],
+                    ),
+                    use_container_width=True,
+                )
+                if occupancy['refreshed_at']:
+                    st.caption(f"Booked players / max players per weekday and start hour. Rollup refreshed {occupancy['refreshed_at'].strftime('%Y-%m-%d %H:%M')}.")
+            else:
+                st.info("No occupancy data for this period yet. The occupancy_rollup job builds it (System tab).")
+
+    with tab5, profile_section("Issue Reports"):
         st.header("Issue Reports")
         filter_status = st.selectbox("Filter Status", ["All", "open", "in_progress", "resolved"])
         reports = get_issue_reports(None if filter_status == "All" else filter_status)
@@ -525,7 +695,7 @@ def show_admin_dashboard():
         else:
             st.info("No reports found.")
 
-    with tab6:
+    with tab6, profile_section("Manage Staff"):
         st.header("Manage Staff")
         
         st.subheader("Add New Staff Member")
@@ -551,4 +721,83 @@ def show_admin_dashboard():
                 else:
                     st.error("Please fill in all fields.")
 
+    with tab8, profile_section("System"):
+        st.header("Background Jobs")
+        scheduler = get_scheduler()
+        if scheduler is None:
+            st.info("The scheduler is not running in this worker.")
+        else:
+            st.caption("This worker is the job leader." if scheduler.has_leadership() else "Another worker is the job leader; only per-worker jobs run here.")
+            for job in get_job_summaries():
+                with st.expander(f"{job['name']} - every {job['interval']}s ({job['last_status'] or 'not run yet'})"):
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Runs", job['runs'])
+                    col2.metric("Failures", job['failures'])
+                    col3.metric("Avg Duration", f"{job['avg_duration_ms']:.0f} ms" if job['avg_duration_ms'] is not None else "-")
+                    col4.metric("Last Rows", job['last_rows'] if job['last_rows'] is not None else "-")
+                    if job['last_run']:
+                        st.write(f"**Last Run:** {job['last_run'].strftime('%Y-%m-%d %H:%M:%S')} - {job['last_result']}")
+                    if job['last_error']:
+                        st.error(job['last_error'])
+
+                    if st.button("Run Now", key=f"run_job_{job['name']}", disabled=job['running']):
+                        run = scheduler.run_now(job['name'])
+                        if run is None:
+                            st.warning("The job is already running; try again when it finishes.")
+                        elif run.status == 'ok':
+                            st.success(f"Finished in {run.duration_ms:.0f} ms: {run.result}")
+                        else:
+                            st.error(run.error)
+
+                    history = get_job_history(job['name'])
+                    if history:
+                        st.dataframe(
+                            [{k: h[k] for k in ('started_at', 'status', 'duration_ms', 'rows', 'error')} for h in history],
+                            use_container_width=True,
+                        )
+
+        st.header("Render Profiling")
+        st.checkbox("Profile my reruns", key=PROFILE_SESSION_KEY,
+                    help="Times each section and tab, counts DB round trips and HTML bytes, and shows a waterfall at the bottom of the page.")
+        recent_profiles = get_recent_profiles()
+        if recent_profiles:
+            labels = [f"{p.at.strftime('%H:%M:%S')} - {p.label} - {p.total_ms:.0f} ms" for p in recent_profiles]
+            selected = st.selectbox("Recent profiled reruns (this worker)", range(len(labels)), format_func=lambda i: labels[i])
+            render_waterfall(recent_profiles[selected])
+        else:
+            st.caption("No profiled reruns yet. Tick the box above or set MYFUNZONE_PROFILE=1 to profile every session.")
+
+    with tab9, profile_section("Metrics"):
+        st.header("Query Metrics")
+        st.caption(f"Data-access functions of this worker (PID {os.getpid()}) since start or last reset. "
+                   "Percentiles are histogram bucket upper bounds.")
+        function_metrics = get_function_metrics()
+        if function_metrics:
+            st.dataframe(function_metrics, use_container_width=True)
+        else:
+            st.info("No instrumented calls recorded yet.")
+
+        st.subheader(f"Slow Queries (over {SLOW_QUERY_MS} ms)")
+        slow_queries = get_slow_queries()
+        if slow_queries:
+            for query in slow_queries:
+                with st.expander(f"{query['duration_ms']} ms - {query['function']} at {query['at'].strftime('%H:%M:%S')}"):
+                    st.code(query['sql'], language="sql")
+                    st.write(f"**Parameters:** {query['params']}")
+        else:
+            st.info("No slow queries recorded.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Download Prometheus Metrics",
+                data=render_prometheus(),
+                file_name=f"myfunzone_{os.getpid()}.prom",
+                mime="text/plain",
+            )
+        with col2:
+            if st.button("Reset Metrics"):
+                reset_metrics()
+                st.rerun()
+
     render_footer()
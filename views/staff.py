@@ -1,13 +1,56 @@
 import streamlit as st
-from src.bookings import check_in_user, get_all_bookings, update_booking_status
+from src.bookings import get_all_bookings, update_booking_status
 from src.session import logout_user_session, get_current_user
 from src.games import get_all_games
 from src.slots import get_slots_by_game, toggle_slot_active
 from src.issues import create_issue_report, get_issue_reports, update_issue_status
-from src.announcements import get_announcements_for_role, mark_announcement_as_read
+from src.announcements import get_announcements_for_role, mark_announcements_as_read, queue_announcement_as_read
 from datetime import datetime, date
 import time
 from src.utils import Queue, render_footer
+from src.database import is_database_available
+from src.checkin_manifest import check_in_with_manifest
+from src.checkin_journal import download_manifest, get_manifest_info, manifest_is_stale, mark_manifest_checked_in, record_offline_scan, pending_scan_count, get_conflicts, retry_conflict, dismiss_conflict, replay_journal
+from src.maintenance import get_sweep_stats
+from src.profiler import profile_section
+
+def show_offline_checkin():
+    """
+    Minimal scanner shown while PostgreSQL is unreachable.
+    Scans are validated against the downloaded manifest and journaled locally.
+    """
+    current_user = get_current_user()
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        st.title("Offline Check-in")
+    with col2:
+        if st.button("Logout"):
+            logout_user_session()
+
+    st.error("The database is unreachable. Check-ins are being recorded locally and will sync automatically.")
+
+    manifest = get_manifest_info()
+    if manifest:
+        st.caption(f"Manifest: {manifest['bookings']} bookings for {manifest['slot_date']} (downloaded {manifest['downloaded_at']})")
+    else:
+        st.warning("No offline manifest available. Scans cannot be validated until the database is back.")
+
+    qr_input = st.text_input("Scan QR Code (Simulate by entering code)", key="offline_qr_input")
+    if st.button("Check-in", key="offline_checkin"):
+        if qr_input:
+            success, msg = record_offline_scan(qr_input, current_user['user_id'])
+            if success:
+                st.success(f"✅ {msg}")
+            else:
+                st.error(f"❌ {msg}")
+        else:
+            st.warning("Please scan/enter a QR code.")
+
+    st.write(f"**Pending offline scans:** {pending_scan_count()}")
+    if st.button("Retry Connection"):
+        st.rerun()
+
+    render_footer()
 
 def show_staff_dashboard():
     current_user = get_current_user()
@@ -32,6 +75,12 @@ def show_staff_dashboard():
         with st.expander(section_title, expanded=(unread_count > 0)):
             if unread_count > 0:
                 st.warning(f"You have {unread_count} unread announcement(s).")
+                if st.button("✅ Mark All as Read", key="read_all_announcements"):
+                    unread_ids = [a['announcement_id'] for a in announcements if not a['is_read']]
+                    if mark_announcements_as_read(unread_ids, current_user['user_id']):
+                        st.success("All announcements marked as read!")
+                        time.sleep(0.5)
+                        st.rerun()
                 
             for ann in announcements:
                 # Show unread or pinned ones 
@@ -52,7 +101,7 @@ def show_staff_dashboard():
                     
                     if not ann['is_read']:
                         if st.button("✅ Mark as Read", key=f"read_{ann['announcement_id']}"):
-                            if mark_announcement_as_read(ann['announcement_id'], current_user['user_id']):
+                            if queue_announcement_as_read(ann['announcement_id'], current_user['user_id']):
                                 st.success("Marked as read!")
                                 time.sleep(0.5)
                                 st.rerun()
@@ -63,16 +112,30 @@ def show_staff_dashboard():
     
     tab1, tab2, tab3 = st.tabs(["QR Check-in", "Today's Bookings", "Maintenance & Issues"])
     
-    with tab1:
+    with tab1, profile_section("QR Check-in"):
         st.header("QR Check-in Scanner")
         
+        # Sync scans journaled while offline and keep today's manifest fresh
+        if pending_scan_count() > 0:
+            summary = replay_journal()
+            if summary['applied'] or summary['conflicts']:
+                st.info(f"Synced {summary['applied']} offline check-in(s), {summary['conflicts']} conflict(s).")
+        manifest = get_manifest_info()
+        if manifest_is_stale(manifest):
+            download_manifest()
+            manifest = get_manifest_info()
        
         qr_input = st.text_input("Scan QR Code (Simulate by entering code)", help="In a real app, this would use the camera.")
         
         if st.button("Check-in"):
             if qr_input:
                 # assume qr string checks 
-                success, msg = check_in_user(qr_input, current_user['user_id'])
+                if is_database_available():
+                    success, msg = check_in_with_manifest(qr_input, current_user['user_id'])
+                    if success:
+                        mark_manifest_checked_in(qr_input)
+                else:
+                    success, msg = record_offline_scan(qr_input, current_user['user_id'])
                 if success:
                     st.success(f"✅ {msg}")
                 else:
@@ -80,11 +143,41 @@ def show_staff_dashboard():
             else:
                 st.warning("Please scan/enter a QR code.")
 
-    with tab2:
+        with st.expander("📴 Offline Check-in"):
+            if manifest:
+                st.caption(f"Manifest: {manifest['bookings']} bookings for {manifest['slot_date']} (downloaded {manifest['downloaded_at']})")
+            if st.button("Refresh Offline Manifest"):
+                count = download_manifest()
+                st.success(f"Saved {count} booking(s) for offline validation.")
+
+            st.write(f"**Pending offline scans:** {pending_scan_count()}")
+            conflicts = get_conflicts()
+            if conflicts:
+                st.warning(f"{len(conflicts)} offline scan(s) could not be applied:")
+                for conflict in conflicts:
+                    col_c1, col_c2, col_c3 = st.columns([4, 1, 1])
+                    with col_c1:
+                        st.write(f"⚠️ {conflict['qr_code']} at {conflict['scanned_at']} - {conflict['message']}")
+                    with col_c2:
+                        if st.button("Retry", key=f"retry_scan_{conflict['scan_ref']}"):
+                            retry_conflict(conflict['scan_ref'])
+                            st.rerun()
+                    with col_c3:
+                        if st.button("Dismiss", key=f"dismiss_scan_{conflict['scan_ref']}"):
+                            dismiss_conflict(conflict['scan_ref'])
+                            st.rerun()
+
+    with tab2, profile_section("Today's Bookings"):
         st.header("Today's Schedule")
         
         today = date.today()
         bookings = get_all_bookings(today)
+        sweep = get_sweep_stats()
+        if sweep['last_run']:
+            st.caption(
+                f"Past bookings are closed automatically (last sweep {sweep['last_run']:%H:%M}: "
+                f"{sweep['last_counts'].get('no_show', 0)} no-show, {sweep['last_counts'].get('completed', 0)} completed)"
+            )
         
         if bookings:
             for booking in bookings:
@@ -109,7 +202,7 @@ def show_staff_dashboard():
         else:
             st.info("No bookings scheduled for today.")
 
-    with tab3:
+    with tab3, profile_section("Maintenance & Issues"):
         st.header("Maintenance & Issues")
         
         if 'issue_queue' not in st.session_state:
@@ -168,10 +261,7 @@ def show_staff_dashboard():
         
         if selected_game_lock:
             game_id_lock = game_options[selected_game_lock]
-            slots = get_slots_by_game(game_id_lock)
-            
-            # Filter for today/future slots only
-            future_slots = [s for s in slots if s['slot_date'] >= date.today() and s['is_active']]
+            future_slots = get_slots_by_game(game_id_lock, active_only=True)
             
             if future_slots:
                 slot_opts = {f"{s['slot_date']} @ {s['start_time']}": s['slot_id'] for s in future_slots}
@@ -1,15 +1,16 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from src.games import get_all_games
 from src.slots import get_available_slots
-from src.bookings import create_booking, get_user_bookings, cancel_booking, reschedule_booking, generate_qr_code, update_booking_status
+from src.bookings import create_booking, cancel_booking, reschedule_booking, generate_qr_code, update_booking_status
 from src.session import logout_user_session, get_current_user
-from src.reviews import add_review, get_user_reviews
-from src.announcements import get_announcements_for_role
+from src.reviews import add_review
+from src.qr_sheet import build_qr_sheet, booking_qr_items
+from src.cache import cached_all_games, cached_announcements_for_role, cached_user_bookings, cached_user_profile, cached_user_reviews
 from datetime import datetime, date
 import time
 from src.utils import get_base64_of_bin_file, LinkedList, Stack, parse_image_urls, render_footer, validate_password
-from src.auth import update_password, get_user_profile, update_user_profile
+from src.auth import update_password, update_user_profile
+from src.profiler import profile_section
 
 
 def show_user_dashboard():
@@ -36,7 +37,7 @@ def show_user_dashboard():
                 if st.button("Logout", key="user_menu_logout"):
                     logout_user_session()
             else:
-                profile = get_user_profile(current_user['user_id']) or {}
+                profile = cached_user_profile(current_user['user_id']) or {}
                 email_value = profile.get('email') or ""
                 phone_value = profile.get('phone_number') or ""
                 email = st.text_input("Email Address (optional)", value=email_value)
@@ -84,95 +85,96 @@ def show_user_dashboard():
                 if cancel_clicked:
                     st.session_state.profile_menu_mode = 'menu'
             
-    announcements = get_announcements_for_role('user', current_user['user_id'])
+    with profile_section("Announcement carousel"):
+        announcements = cached_announcements_for_role('user', current_user['user_id'])
     
-    if announcements:
-        js_announcements = []
-        for ann in announcements:
-            title = ann['title'].replace("'", "\\'").replace('"', '\\"')
-            content = ann['content'].replace("'", "\\'").replace('"', '\\"')
-            js_announcements.append(f"{{title: '{title}', content: '{content}'}}")
+        if announcements:
+            js_announcements = []
+            for ann in announcements:
+                title = ann['title'].replace("'", "\\'").replace('"', '\\"')
+                content = ann['content'].replace("'", "\\'").replace('"', '\\"')
+                js_announcements.append(f"{{title: '{title}', content: '{content}'}}")
             
-        js_array = "[" + ",".join(js_announcements) + "]"
+            js_array = "[" + ",".join(js_announcements) + "]"
         
-        # Carousel 
-        carousel_html = f"""
-        <style>
-        .carousel-container {{
-            width: 100%;
-            background: linear-gradient(135deg, rgba(0,180,216,0.1), rgba(0,119,182,0.1));
-            border-left: 5px solid #00B4D8;
-            border-radius: 5px;
-            padding: 15px;
-            margin-bottom: 20px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-            font-family: sans-serif;
-            overflow: hidden;
-            position: relative;
-            height: 80px; /* Fixed height to prevent jumping */
-            display: flex;
-            align-items: center;
-        }}
-        .carousel-slide {{
-            position: absolute;
-            width: 100%;
-            opacity: 0;
-            transition: opacity 0.5s ease-in-out;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-        }}
-        .carousel-slide.active {{
-            opacity: 1;
-        }}
-        .ann-title {{
-            font-weight: bold;
-            color: #00B4D8;
-            font-size: 1.1em;
-            margin-bottom: 5px;
-        }}
-        .ann-content {{
-            color: #e0e0e0;
-            font-size: 0.9em;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-            max-width: 95%;
-        }}
-        </style>
+            # Carousel 
+            carousel_html = f"""
+            <style>
+            .carousel-container {{
+                width: 100%;
+                background: linear-gradient(135deg, rgba(0,180,216,0.1), rgba(0,119,182,0.1));
+                border-left: 5px solid #00B4D8;
+                border-radius: 5px;
+                padding: 15px;
+                margin-bottom: 20px;
+                box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+                font-family: sans-serif;
+                overflow: hidden;
+                position: relative;
+                height: 80px; /* Fixed height to prevent jumping */
+                display: flex;
+                align-items: center;
+            }}
+            .carousel-slide {{
+                position: absolute;
+                width: 100%;
+                opacity: 0;
+                transition: opacity 0.5s ease-in-out;
+                display: flex;
+                flex-direction: column;
+                justify-content: center;
+            }}
+            .carousel-slide.active {{
+                opacity: 1;
+            }}
+            .ann-title {{
+                font-weight: bold;
+                color: #00B4D8;
+                font-size: 1.1em;
+                margin-bottom: 5px;
+            }}
+            .ann-content {{
+                color: #e0e0e0;
+                font-size: 0.9em;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                max-width: 95%;
+            }}
+            </style>
         
-        <div id="carousel" class="carousel-container">
-            <!-- Slides injected via JS -->
-        </div>
+            <div id="carousel" class="carousel-container">
+                <!-- Slides injected via JS -->
+            </div>
         
-        <script>
-            const data = {js_array};
-            const container = document.getElementById('carousel');
+            <script>
+                const data = {js_array};
+                const container = document.getElementById('carousel');
             
-            // Create slides
-            data.forEach((item, index) => {{
-                const slide = document.createElement('div');
-                slide.className = 'carousel-slide' + (index === 0 ? ' active' : '');
-                slide.innerHTML = `
-                    <div class="ann-title">📢 ${{item.title}}</div>
-                    <div class="ann-content">${{item.content}}</div>
-                `;
-                container.appendChild(slide);
-            }});
+                // Create slides
+                data.forEach((item, index) => {{
+                    const slide = document.createElement('div');
+                    slide.className = 'carousel-slide' + (index === 0 ? ' active' : '');
+                    slide.innerHTML = `
+                        <div class="ann-title">📢 ${{item.title}}</div>
+                        <div class="ann-content">${{item.content}}</div>
+                    `;
+                    container.appendChild(slide);
+                }});
             
-            let currentIndex = 0;
-            const slides = document.querySelectorAll('.carousel-slide');
+                let currentIndex = 0;
+                const slides = document.querySelectorAll('.carousel-slide');
             
-            if (slides.length > 1) {{
-                setInterval(() => {{
-                    slides[currentIndex].classList.remove('active');
-                    currentIndex = (currentIndex + 1) % slides.length;
-                    slides[currentIndex].classList.add('active');
-                }}, 4000); // 2 second delay
-            }}
-        </script>
-        """
-        components.html(carousel_html, height=100)
+                if (slides.length > 1) {{
+                    setInterval(() => {{
+                        slides[currentIndex].classList.remove('active');
+                        currentIndex = (currentIndex + 1) % slides.length;
+                        slides[currentIndex].classList.add('active');
+                    }}, 4000); // 2 second delay
+                }}
+            </script>
+            """
+            components.html(carousel_html, height=100)
 
     #  Announcement & Offers Button 
     with st.expander("📢 Announcements & Offers", expanded=False):
@@ -188,7 +190,7 @@ def show_user_dashboard():
     
     tab1, tab2, tab3, tab4 = st.tabs(["Browse Games & Activity", "My Bookings", "My Feedback", "About Us"])
     bg_url = ""
-    with tab1:
+    with tab1, profile_section("Browse Games & Activity"):
         import os
         
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -252,7 +254,7 @@ def show_user_dashboard():
         
         st.header(f"Available Games: {st.session_state.selected_category}")
 
-        all_games_for_recent = get_all_games(active_only=True)
+        all_games_for_recent = cached_all_games(active_only=True)
         recent_ids = st.session_state.recent_games.to_list()
         if all_games_for_recent and recent_ids:
             st.subheader("Recently booked games & activities (LinkedList)")
@@ -339,7 +341,7 @@ def show_user_dashboard():
                     else:
                         st.warning("No slots scheduled for this date.")
 
-        games = get_all_games(active_only=True, category=st.session_state.selected_category)
+        games = cached_all_games(active_only=True, category=st.session_state.selected_category)
         
         if not games:
             st.info(f"No games found in category: {st.session_state.selected_category}")
@@ -484,11 +486,11 @@ def show_user_dashboard():
                             st.warning("No slots scheduled for this date.")
                 st.markdown("---")
 
-    with tab2:
+    with tab2, profile_section("My Bookings"):
         st.header("My Bookings")
         if 'undo_cancel_stack' not in st.session_state:
             st.session_state.undo_cancel_stack = Stack()
-        bookings = get_user_bookings(current_user['user_id'])
+        bookings = cached_user_bookings(current_user['user_id'])
         
         if bookings:
             if not st.session_state.undo_cancel_stack.is_empty():
@@ -504,6 +506,30 @@ def show_user_dashboard():
                             st.rerun()
                         else:
                             st.error(msg)
+
+            qr_items = booking_qr_items(bookings)
+            if len(qr_items) > 1:
+                sheet_col1, sheet_col2 = st.columns([1, 3])
+                with sheet_col1:
+                    sheet_format = st.selectbox("QR sheet format", ["PDF", "PNG"], key="qr_sheet_format")
+                with sheet_col2:
+                    if st.button(f"Prepare QR sheet ({len(qr_items)} codes)", key="qr_sheet_prepare"):
+                        with st.spinner("Rendering QR codes..."):
+                            st.session_state.qr_sheet = (qr_items, sheet_format, build_qr_sheet(qr_items, fmt=sheet_format))
+                    # A sheet prepared before a cancel or reschedule holds dead codes
+                    prepared = st.session_state.get('qr_sheet')
+                    if prepared and prepared[0] != qr_items:
+                        del st.session_state.qr_sheet
+                    elif prepared:
+                        _, prepared_format, sheet_data = prepared
+                        st.download_button(
+                            label=f"Download QR sheet ({prepared_format})",
+                            data=sheet_data,
+                            file_name=f"myfunzone_qr_codes.{prepared_format.lower()}",
+                            mime="application/pdf" if prepared_format == "PDF" else "image/png",
+                            key="qr_sheet_download"
+                        )
+
             for booking in bookings:
                 with st.expander(f"{booking['game_name']} - {booking['slot_date']} @ {booking['start_time']}"):
                     col1, col2 = st.columns([2, 1])
@@ -647,9 +673,9 @@ def show_user_dashboard():
         else:
             st.info("You haven't made any bookings yet.")
 
-    with tab3:
+    with tab3, profile_section("My Feedback"):
         st.header("My Feedback History")
-        reviews = get_user_reviews(current_user['user_id'])
+        reviews = cached_user_reviews(current_user['user_id'])
         
         if reviews:
             for review in reviews:
@@ -662,7 +688,7 @@ def show_user_dashboard():
         else:
             st.info("You haven't submitted any feedback yet.")
 
-    with tab4:
+    with tab4, profile_section("About Us"):
         st.header("About Us")
         st.markdown("""
         <style>